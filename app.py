@@ -1,18 +1,21 @@
 import os
 from flask import Flask, render_template
 from flask_cors import CORS
-from flask_caching import Cache
 from flasgger import Swagger
 from config import config
 from middleware.error_handler import register_error_handlers
 from middleware.rate_limiter import setup_rate_limiter
+from middleware.response_cache import setup_cache
 from utils.logger import setup_logger
 from utils.helpers import get_version
+from utils.serializers import setup_serializer
+from services import init_services
 
 from routes.auth import auth_bp
 from routes.migration import migration_bp
 from routes.analytics import analytics_bp
 from routes.health import health_bp
+from routes.admin import admin_bp
 
 def create_app(config_name='default'):
     app = Flask(__name__)
@@ -22,11 +25,12 @@ def create_app(config_name='default'):
     
     setup_logger()
     
+    setup_serializer(app)
+    
+    init_services(app)
+    
     CORS(app)
-    cache = Cache(app, config={
-        'CACHE_TYPE': app.config['CACHE_TYPE'],
-        'CACHE_DEFAULT_TIMEOUT': app.config['CACHE_DEFAULT_TIMEOUT']
-    })
+    cache = setup_cache(app)
     
     limiter = setup_rate_limiter(app)
     
@@ -36,6 +40,7 @@ def create_app(config_name='default'):
     app.register_blueprint(migration_bp)
     app.register_blueprint(analytics_bp)
     app.register_blueprint(health_bp)
+    app.register_blueprint(admin_bp)
     
     swagger_config = {
         "headers": [],
@@ -75,7 +80,8 @@ def create_app(config_name='default'):
         "tags": [
             {"name": "Migration Data", "description": "Migration data endpoints"},
             {"name": "Analytics", "description": "Analytics and aggregation endpoints"},
-            {"name": "Health", "description": "Health check endpoints"}
+            {"name": "Health", "description": "Health check endpoints"},
+            {"name": "Admin", "description": "Dataset administration endpoints"}
         ]
     }
     
@@ -94,6 +100,14 @@ def create_app(config_name='default'):
             }
         }
     
+    @app.cli.command('ingest')
+    def ingest():
+        """Merge new or changed rows from the raw Eurostat files"""
+        registry = app.extensions['services']
+        registry.reload(ingest=True)
+        summary = registry.last_reload['ingest']
+        print(f"{summary['upserted']} rows upserted, {summary['removed']} removed")
+    
     @app.route('/')
     def index():
         return render_template('index.html', version=get_version())
@@ -108,6 +122,9 @@ def create_app(config_name='default'):
 app = create_app(os.getenv('FLASK_ENV', 'development'))
 
 if __name__ == '__main__':
+    if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN'):
+        # with the debug reloader only the child serves
+        app.extensions['services'].start_watcher()
     app.run(
         host=app.config['HOST'],
         port=app.config['PORT'],
@@ -0,0 +1,13 @@
+#* ASGI entry point: uvicorn asgi:application
+from app import app
+from config import Config
+from middleware.wsgi_bridge import AsyncAuthMiddleware, WSGIBridge
+
+#* API keys and Firebase tokens are checked on the event loop (async Firestore client),
+#* the Flask app itself runs on a bounded pool of ASYNC_WORKER_THREADS threads
+application = AsyncAuthMiddleware(
+    WSGIBridge(app, max_workers=Config.ASYNC_WORKER_THREADS, max_pending=Config.ASYNC_MAX_PENDING)
+)
+
+# imported once per uvicorn worker process
+app.extensions['services'].start_watcher()
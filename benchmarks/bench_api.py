@@ -0,0 +1,403 @@
+"""End-to-end latency / throughput of every migration and analytics route, across dataset scales and concurrency:
+python -m benchmarks.bench_api                      compare against this machine's baseline, or against origin/main
+python -m benchmarks.bench_api --against HEAD~1     compare against a build of another revision in the same run
+python -m benchmarks.bench_api --save-baseline      record a new baseline on this machine
+python -m benchmarks.bench_api --scales 1 10 --concurrency 1 4 --seconds 1 --limiter on
+Every scale runs in its own process, so its peak RSS is not inflated by the scales before it."""
+import argparse
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+from benchmarks import generate_eurostat
+from benchmarks.common import print_table
+from benchmarks.fake_firestore import install
+from config import Config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#* baselines are machine-specific and never committed, CI keeps its own outside the workspace
+BASELINE = os.getenv('BENCH_API_BASELINE', os.path.join(os.path.dirname(__file__), 'baseline_api.json'))
+
+#* without a baseline recorded on this machine, the revision built and measured next to this tree
+AGAINST = os.getenv('BENCH_API_AGAINST', 'origin/main')
+
+#* copied over the reference checkout, so both builds run the same scenarios and differ only in the app
+HARNESS = ['__init__.py', 'bench_api.py', 'common.py', 'fake_firestore.py', 'generate_eurostat.py']
+
+API_KEY = 'benchmark-key'
+
+#* tier of the benchmark key when the limiter is on: every request is costed and counted, none is rejected
+BENCHMARK_TIER = 'benchmark'
+BENCHMARK_LIMITS = '1000000000 per hour;1000000000 per day'
+
+COUNTRIES = ['DEU', 'FRA', 'ITA', 'ESP', 'POL']
+COUNTRY_QUERY = '&'.join(f'country_codes={code}' for code in COUNTRIES)
+
+#* (name, method, targets) per route, GET routes rotate through several filters so the
+#* response cache can't turn the run into a dict lookup
+#* per-country endpoints are filtered like real clients use them, an unfiltered dump at 1000x is
+#* tens of MB of JSON per response and would measure serialization of the whole dataset
+SCENARIOS = [
+    ('data', 'GET', [
+        '/api/migration/data?per_page=100',
+        '/api/migration/data?per_page=1000&start_year=2015',
+        '/api/migration/data?country_codes=DEU&country_codes=FRA&pagination=cursor'
+    ]),
+    ('data csv', 'GET', ['/api/migration/data?format=csv&year=2020', '/api/migration/data?format=ndjson&country_codes=ITA']),
+    ('countries', 'GET', ['/api/migration/countries']),
+    ('years', 'GET', ['/api/migration/years']),
+    ('country', 'GET', [f'/api/migration/country/{code}' for code in COUNTRIES]),
+    ('year', 'GET', ['/api/migration/year/2015', '/api/migration/year/2020']),
+    ('statistics', 'GET', ['/api/migration/statistics']),
+    ('trends', 'GET', ['/api/analytics/trends', '/api/analytics/trends?country_codes=DEU&start_year=2014']),
+    ('comparison', 'GET', ['/api/analytics/comparison?country_codes=DEU&country_codes=FRA&country_codes=ITA']),
+    ('top', 'GET', ['/api/analytics/top?metric=net&limit=10', '/api/analytics/top?metric=immigration&year=2019&offset=10']),
+    ('balance', 'GET', ['/api/analytics/balance', '/api/analytics/balance?country_codes=ESP&country_codes=POL']),
+    ('growth', 'GET', [
+        '/api/analytics/growth',
+        '/api/analytics/growth?country_code=DEU',
+        f"/api/analytics/growth?by_country=true&{COUNTRY_QUERY}"
+    ]),
+    ('rolling', 'GET', [f'/api/analytics/rolling?window=3&{COUNTRY_QUERY}', '/api/analytics/rolling?window=5&country_codes=FRA']),
+    ('similarity', 'GET', [
+        f'/api/analytics/similarity?k=5&{COUNTRY_QUERY}',
+        '/api/analytics/similarity?method=euclidean&country_codes=DEU'
+    ]),
+    ('correlation', 'GET', ['/api/analytics/correlation', '/api/analytics/correlation?by_country=true&country_codes=ITA']),
+    ('distribution', 'GET', ['/api/analytics/distribution?bins=20', '/api/analytics/distribution?country_codes=DEU&start_year=2015']),
+    ('batch', 'POST', [{'queries': [
+        {'type': 'trends'}, {'type': 'top', 'limit': 5}, {'type': 'correlation', 'country_codes': COUNTRIES},
+        {'type': 'distribution', 'metric': 'immigration'}
+    ]}])
+]
+
+
+def scaled_dataset(scale, seed=0):
+    #* today's processed file plus (scale - 1) times as many synthetic countries over the same years,
+    #* written as raw Eurostat files by generate_eurostat and processed like the real ones
+    base = pd.read_csv(Config.DATASET_PROCESSED)
+    if scale == 1:
+        return base
+
+    with tempfile.TemporaryDirectory() as out:
+        generate_eurostat.main([
+            '--out', out, '--countries', '0', '--synthetic-countries', str(base['Country'].nunique() * (scale - 1)),
+            '--start-year', str(base['Year'].min()), '--end-year', str(base['Year'].max()),
+            '--no-aggregates', '--seed', str(seed)
+        ])
+        synthetic = pd.read_csv(os.path.join(out, generate_eurostat.PROCESSED_FILE))
+    return pd.concat([base, synthetic], ignore_index=True)
+
+
+def boot(df, cached, limiter_storage=None):
+    #* create_app('testing') on a prepared DataService, Firestore replaced by the in-process stand-in
+    #* the limiter is off unless limiter_storage is given, then requests are costed and counted there
+    from app import create_app
+    from config import config, TestingConfig
+    from middleware.response_cache import cache
+    from services import init_services
+    from services.data_service import DataService
+
+    class LimitedConfig(TestingConfig):
+        RATE_LIMIT_STORAGE_URI = limiter_storage
+        RATE_LIMIT_TIERS = {**TestingConfig.RATE_LIMIT_TIERS, BENCHMARK_TIER: BENCHMARK_LIMITS}
+
+    install().add_api_key(API_KEY, tier=BENCHMARK_TIER)
+    config['benchmark'] = LimitedConfig if limiter_storage else TestingConfig
+    app = create_app('benchmark')
+    init_services(app, DataService(df))
+    if not limiter_storage:
+        for limiter in app.extensions.get('limiter', ()):
+            limiter.enabled = False
+    if not cached:
+        cache.init_app(app, config={'CACHE_TYPE': 'NullCache'})
+    return app
+
+
+def run_scenario(app, method, targets, concurrency, seconds, max_requests):
+    #* threads share one request budget and deadline, each records its own latencies
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    issued = iter(range(max_requests))
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(slot):
+        client = app.test_client()
+        headers = {'X-API-KEY': API_KEY}
+        while time.perf_counter() < deadline:
+            with lock:
+                n = next(issued, None)
+            if n is None:
+                return
+            target = targets[n % len(targets)]
+            start = time.perf_counter()
+            if method == 'POST':
+                response = client.post('/api/analytics/batch', json=target, headers=headers)
+            else:
+                response = client.get(target, headers=headers)
+            response.get_data()
+            latencies[slot].append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors[slot] += 1
+
+    threads = [threading.Thread(target=worker, args=(slot,)) for slot in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    samples = np.concatenate([np.array(slot) for slot in latencies])
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        'requests': len(samples),
+        'errors': sum(errors),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'rps': round(len(samples) / elapsed, 1)
+    }
+
+
+def peak_rss_mb():
+    #* ru_maxrss is the high-water mark of the whole process, only meaningful in a process per scale
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def machine():
+    #* what a baseline was recorded on, latencies from other hardware are not comparable
+    return {
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version()
+    }
+
+
+def run_scale(scale, concurrency_levels, seconds, max_requests, cached, limiter_modes):
+    #* limiter 'off' measures the routes alone, 'on' adds request costing and SQLite counters to every request
+    logging.getLogger('eu_migration_api').setLevel(logging.WARNING)
+    df = scaled_dataset(scale)
+    results = {}
+
+    for mode in limiter_modes:
+        with tempfile.TemporaryDirectory() as storage:
+            limiter_storage = 'sqlite:///' + os.path.join(storage, 'ratelimit.db') if mode == 'on' else None
+            start = time.perf_counter()
+            app = boot(df, cached, limiter_storage)
+            boot_ms = (time.perf_counter() - start) * 1000
+            label = f'{scale}x' if mode == 'off' else f'{scale}x+limiter'
+
+            rows = []
+            for name, method, targets in SCENARIOS:
+                # first call of every variant builds the per-version indexes it relies on,
+                # so timed threads never race to build the same index
+                cold_ms = max(run_scenario(app, method, [target], 1, float('inf'), 1)['p50_ms'] for target in targets)
+                for concurrency in concurrency_levels:
+                    stats = run_scenario(app, method, targets, concurrency, seconds, max_requests)
+                    stats['cold_ms'] = cold_ms
+                    results[f'{label}/{concurrency}/{name}'] = stats
+                    rows.append([name, concurrency, stats['requests'], stats['errors'], f"{stats['cold_ms']:.2f}",
+                                 f"{stats['p50_ms']:.2f}", f"{stats['p95_ms']:.2f}", f"{stats['p99_ms']:.2f}",
+                                 f"{stats['rps']:.0f}"])
+
+        print(f'\n{scale}x dataset: {len(df)} rows, limiter {mode}, boot {boot_ms:.0f} ms')
+        print_table(['route', 'threads', 'requests', 'errors', 'cold ms', 'p50 ms', 'p95 ms', 'p99 ms', 'req/s'], rows)
+        sys.stdout.flush()
+
+    results[f'{scale}x/peak_rss_mb'] = round(peak_rss_mb(), 1)
+    print(f'\n{scale}x dataset: peak RSS {peak_rss_mb():.0f} MB')
+    return results
+
+
+@contextlib.contextmanager
+def reference_tree(ref):
+    #* `ref` checked out in a temporary git worktree, with this tree's harness copied over its benchmarks/
+    with tempfile.TemporaryDirectory() as parent:
+        path = os.path.join(parent, 'reference')
+        subprocess.run(['git', 'worktree', 'add', '--detach', '--quiet', path, ref], cwd=ROOT, check=True)
+        try:
+            os.makedirs(os.path.join(path, 'benchmarks'), exist_ok=True)
+            for name in HARNESS:
+                shutil.copy(os.path.join(ROOT, 'benchmarks', name), os.path.join(path, 'benchmarks', name))
+            yield path
+        finally:
+            subprocess.run(['git', 'worktree', 'remove', '--force', path], cwd=ROOT, check=False)
+
+
+def run_reference(tree, scale, concurrency_levels, seconds, max_requests, cached, limiter_modes):
+    #* one scale of the same run on the reference build, over this tree's dataset
+    with tempfile.TemporaryDirectory() as out:
+        output = os.path.join(out, 'results.json')
+        command = [
+            sys.executable, '-m', 'benchmarks.bench_api', '--no-compare', '--output', output, '--rounds', '1',
+            '--scales', str(scale), '--concurrency', *map(str, concurrency_levels),
+            '--seconds', str(seconds), '--requests', str(max_requests), '--limiter', *limiter_modes
+        ]
+        env = {**os.environ, 'DATASET_PROCESSED': os.path.abspath(Config.DATASET_PROCESSED)}
+        subprocess.run(command + (['--cached'] if cached else []), cwd=tree, env=env, check=True)
+        with open(output) as f:
+            return json.load(f)
+
+
+def best_of(results, more):
+    #* per scenario, the best of several rounds: background load only ever makes a round slower
+    for key, stats in more.items():
+        current = results.get(key)
+        if current is None:
+            results[key] = stats
+        elif key.endswith('peak_rss_mb'):
+            results[key] = min(current, stats)
+        else:
+            results[key] = {
+                **current,
+                'errors': min(current['errors'], stats['errors']),
+                'p50_ms': min(current['p50_ms'], stats['p50_ms']),
+                'p95_ms': min(current['p95_ms'], stats['p95_ms']),
+                'p99_ms': min(current['p99_ms'], stats['p99_ms']),
+                'rps': max(current['rps'], stats['rps'])
+            }
+    return results
+
+
+def run(scales, concurrency_levels, seconds, max_requests, cached, limiter_modes, rounds=1, reference=None):
+    #* a fresh spawned process per scale and round, so peak RSS and warm caches belong to that scale alone
+    #* with a reference tree, the two builds take turns round by round, so both see the same host load
+    context = multiprocessing.get_context('spawn')
+    results, reference_results = {}, {}
+    for scale in scales:
+        for _ in range(rounds):
+            with context.Pool(1) as pool:
+                best_of(results, pool.apply(
+                    run_scale, (scale, concurrency_levels, seconds, max_requests, cached, limiter_modes)
+                ))
+            if reference:
+                print(f'\n--- reference build, {scale}x ---')
+                sys.stdout.flush()
+                best_of(reference_results, run_reference(
+                    reference, scale, concurrency_levels, seconds, max_requests, cached, limiter_modes
+                ))
+    return results, reference_results
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    #* regressions: p95 slower or throughput lower than the baseline (recorded or in-run) by more than `tolerance`
+    #* sub-millisecond routes jitter by more than that, so a change must also cost min_delta_ms per request
+    regressions = []
+    for key, stats in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        if key.endswith('peak_rss_mb'):
+            if stats > reference * (1 + tolerance):
+                regressions.append([key, 'peak RSS MB', reference, stats])
+            continue
+        p95, reference_p95 = stats['p95_ms'], reference['p95_ms']
+        if p95 > reference_p95 * (1 + tolerance) and p95 - reference_p95 > min_delta_ms:
+            regressions.append([key, 'p95 ms', reference_p95, p95])
+        rps, reference_rps = stats['rps'], reference['rps']
+        if rps < reference_rps * (1 - tolerance) and 1000 / rps - 1000 / reference_rps > min_delta_ms:
+            regressions.append([key, 'req/s', reference_rps, rps])
+        if stats['errors'] > reference['errors']:
+            regressions.append([key, 'errors', reference['errors'], stats['errors']])
+    return regressions
+
+
+def comparison(args):
+    #* (label, baseline results or None, reference revision or None)
+    #* a baseline recorded on this machine is used as is, anything else is measured against a reference build
+    if args.no_compare or args.save_baseline:
+        return None, None, None
+    if args.against:
+        return args.against, None, args.against
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('machine') == machine():
+            return args.baseline, baseline['results'], None
+        print(f"baseline at {args.baseline} was recorded on {baseline.get('machine')}, not on {machine()}")
+    else:
+        print(f'no baseline at {args.baseline}')
+    print(f'comparing against a build of {AGAINST} in the same run')
+    return AGAINST, None, AGAINST
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 1000])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--seconds', type=float, default=2.0, help='time budget per route and concurrency level')
+    parser.add_argument('--requests', type=int, default=500, help='request budget per route and concurrency level')
+    parser.add_argument('--rounds', type=int, default=2, help='runs per scale, the best of them is kept')
+    parser.add_argument('--cached', action='store_true', help='keep the response cache on')
+    parser.add_argument('--limiter', nargs='+', choices=['off', 'on'], default=['off', 'on'],
+                        help='on: cost-weighted limiter with SQLite counters')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--against', help=f'git revision to build and measure in the same run (default without '
+                                           f'a baseline for this machine: {AGAINST})')
+    parser.add_argument('--no-compare', action='store_true')
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--min-delta-ms', type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    label, baseline, against = comparison(args)
+    reference = None
+    with contextlib.ExitStack() as stack:
+        if against:
+            try:
+                reference = stack.enter_context(reference_tree(against))
+            except subprocess.CalledProcessError:
+                print(f'\ncannot check out {against}; pass --against REV or record a baseline with --save-baseline')
+                return 2
+        try:
+            results, reference_results = run(
+                args.scales, args.concurrency, args.seconds, args.requests, args.cached, args.limiter,
+                args.rounds, reference
+            )
+        except subprocess.CalledProcessError:
+            print(f'\nthe build of {against} failed to run the benchmark')
+            return 2
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'machine': machine(), 'results': results}, f, indent=1, sort_keys=True)
+        print(f'\nbaseline written to {args.baseline}')
+        return 0
+
+    if label is None:
+        return 0
+
+    regressions = compare(results, baseline if baseline is not None else reference_results,
+                          args.tolerance, args.min_delta_ms)
+    if not regressions:
+        print(f'\nno regressions against {label} (tolerance {args.tolerance:.0%})')
+        return 0
+
+    print(f'\n{len(regressions)} regressions against {label} (tolerance {args.tolerance:.0%})')
+    print_table(['scenario', 'metric', 'baseline', 'now'], regressions)
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
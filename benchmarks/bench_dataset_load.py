@@ -0,0 +1,33 @@
+"""Startup load benchmark, CSV vs binary store: python -m benchmarks.bench_dataset_load"""
+import os
+import tempfile
+import pandas as pd
+from benchmarks.common import make_panel, timeit, print_table
+from config import Config
+from services import dataset_store
+
+SCALES = [(37, 11), (1000, 1000), (3000, 1000)]
+
+
+def main():
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        datasets = [('current', pd.read_csv(Config.DATASET_PROCESSED))]
+        datasets += [(f'{c}x{y}', make_panel(c, y)) for c, y in SCALES[1:]]
+        
+        for label, df in datasets:
+            df = df.sort_values(['Country', 'Year']).reset_index(drop=True)
+            csv_path = os.path.join(tmp, f'{label}.csv')
+            store_path = os.path.join(tmp, label)
+            df.to_csv(csv_path, index=False)
+            dataset_store.write_columns(df, store_path, csv_path)
+            
+            csv_ms = timeit(lambda: pd.read_csv(csv_path), repeat=5)
+            store_ms = timeit(lambda: dataset_store.read_columns(store_path), repeat=5)
+            rows.append([label, len(df), f'{csv_ms:.1f}', f'{store_ms:.1f}', f'{csv_ms / store_ms:.0f}x'])
+    
+    print_table(['dataset', 'rows', 'read_csv ms', 'binary ms', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
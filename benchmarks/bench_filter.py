@@ -0,0 +1,43 @@
+"""Filter engine benchmark: python -m benchmarks.bench_filter"""
+from benchmarks.common import make_panel, timeit, print_table
+from services.data_service import DataService
+
+SCALES = [(37, 11), (370, 110), (1000, 1000), (3000, 1000)]
+
+
+def legacy_filter(df, countries=None, start_year=None, end_year=None, year=None):
+    #* previous filter_data: full copy plus one boolean mask per filter
+    df = df.copy()
+    if year:
+        df = df[df['Year'] == year]
+    else:
+        if start_year:
+            df = df[df['Year'] >= start_year]
+        if end_year:
+            df = df[df['Year'] <= end_year]
+    if countries:
+        df = df[df['Country'].isin(countries)]
+    return df
+
+
+def main():
+    rows = []
+    for n_countries, n_years in SCALES:
+        service = DataService(make_panel(n_countries, n_years))
+        countries = service.get_available_countries()[:3]
+        start_year = int(service.df['Year'].min()) + 2
+        query = {'countries': countries, 'start_year': start_year, 'end_year': start_year + 5}
+        
+        rows.append([
+            len(service.df),
+            f"{timeit(lambda: legacy_filter(service.df, **query), repeat=10):.3f}",
+            f"{timeit(lambda: service.filter_data(**query)):.3f}",
+            f"{timeit(lambda: service.filter_data(countries=countries[:1])):.3f}",
+            f"{timeit(lambda: service.filter_positions(year=start_year)):.3f}"
+        ])
+    
+    print_table(['rows', 'legacy ms', '3 countries ms', '1 country ms', 'year positions ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""Year-range aggregation benchmark: python -m benchmarks.bench_range_index"""
+from benchmarks.common import make_panel, timeit, print_table
+from services.data_service import DataService
+from services.analytics_service import AnalyticsService
+
+
+def main(n_countries=1000, n_years=100):
+    panel = make_panel(n_countries, n_years)
+    
+    indexed = AnalyticsService(DataService(panel))
+    fallback_service = DataService(panel)
+    fallback_service.ranges = None
+    fallback = AnalyticsService(fallback_service)
+    
+    countries = indexed.data_service.get_available_countries()
+    start_year = int(panel['Year'].min()) + 10
+    end_year = start_year + 50
+    queries = {
+        'trends (all)': ('get_trend_analysis', (None, start_year, end_year)),
+        'trends (20)': ('get_trend_analysis', (countries[:20], start_year, end_year)),
+        'comparison (20)': ('get_country_comparison', (countries[:20], start_year, end_year)),
+        'comparison (all)': ('get_country_comparison', (None, start_year, end_year)),
+        'balance (all)': ('get_migration_balance', (None, start_year, end_year))
+    }
+    
+    rows = []
+    for label, (method, args) in queries.items():
+        pandas_ms = timeit(lambda: getattr(fallback, method)(*args), repeat=10)
+        index_ms = timeit(lambda: getattr(indexed, method)(*args), repeat=10)
+        rows.append([label, f'{pandas_ms:.2f}', f'{index_ms:.2f}', f'{pandas_ms / index_ms:.1f}x'])
+    
+    print(f'{n_countries} countries x {n_years} years')
+    print_table(['query', 'pandas ms', 'index ms', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Rate limiter overhead per request and quota enforcement across worker processes:
+python -m benchmarks.bench_rate_limiter"""
+import os
+import tempfile
+import threading
+import time
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import STRATEGIES
+from benchmarks.common import print_table
+import middleware.rate_limit_storage  # noqa: F401
+
+HITS = 20000
+KEYS = 1000
+WORKERS = 4
+
+
+def hit_rate(uri, strategy, threads):
+    #* microseconds per limiter check with `threads` threads hitting KEYS distinct api keys
+    limiter = STRATEGIES[strategy](storage_from_string(uri))
+    limit = parse('1000000 per hour')
+    per_thread = HITS // threads
+
+    def run(offset):
+        for i in range(per_thread):
+            limiter.hit(limit, f'key{(offset + i) % KEYS}')
+
+    workers = [threading.Thread(target=run, args=(t * per_thread,)) for t in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) * 1e6 / (per_thread * threads)
+
+
+def allowed_across_workers(uri, strategy, quota=1000):
+    #* WORKERS forked processes share one key, each tries `quota` hits: how many get through in total
+    limit = parse(f'{quota} per hour')
+    read_fds = []
+    for _ in range(WORKERS):
+        read_fd, write_fd = os.pipe()
+        if os.fork() == 0:
+            os.close(read_fd)
+            limiter = STRATEGIES[strategy](storage_from_string(uri))
+            allowed = sum(limiter.hit(limit, 'shared-key') for _ in range(quota))
+            os.write(write_fd, str(allowed).encode())
+            os._exit(0)
+        os.close(write_fd)
+        read_fds.append(read_fd)
+
+    total = 0
+    for read_fd in read_fds:
+        total += int(os.read(read_fd, 32).decode())
+        os.close(read_fd)
+        os.wait()
+    return total
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = []
+        for strategy in ('fixed-window', 'sliding-window-counter'):
+            for name, uri in (('memory', 'memory://'), ('sqlite', f'sqlite:///{tmp}/{strategy}.db')):
+                rates = [f'{hit_rate(uri, strategy, threads):.1f}' for threads in (1, 4, 16)]
+                fresh = f'sqlite:///{tmp}/{strategy}-shared.db' if name == 'sqlite' else uri
+                rows.append([strategy, name, *rates, f'{allowed_across_workers(fresh, strategy)} / 1000'])
+
+    print(f'{HITS} hits over {KEYS} keys, {WORKERS} worker processes sharing one key')
+    print_table(['strategy', 'storage', 'us/hit 1 thr', 'us/hit 4 thr', 'us/hit 16 thr', 'allowed across workers'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""Response serialization benchmark: python -m benchmarks.bench_serialization"""
+from flask import Flask
+from benchmarks.common import make_panel, timeit, print_table
+from services.analytics_service import AnalyticsService
+from services.data_service import DataService
+from utils.serializers import SERIALIZERS
+
+
+def main():
+    service = DataService(make_panel(1000, 100))
+    growth = AnalyticsService(service).yearly_growth_frame(service.get_available_countries()[0])
+    payloads = {
+        'data page (100 rows)': {'data': {'items': service.df.iloc[:100]}},
+        'data page (1000 rows)': {'data': {'items': service.df.iloc[:1000]}},
+        'growth (with NaN)': {'data': {'growth': growth}},
+        'full frame (100k rows)': {'data': {'items': service.df}}
+    }
+    
+    app = Flask(__name__)
+    providers = {name: cls(app) for name, cls in SERIALIZERS.items()}
+    
+    rows = []
+    for label, payload in payloads.items():
+        outputs = {name: p.dumps(payload, separators=(',', ':')) for name, p in providers.items()}
+        assert len(set(outputs.values())) == 1, f'{label}: serializers disagree'
+        
+        timings = {
+            name: timeit(lambda: p.dumps(payload, separators=(',', ':')), repeat=5 if 'full' in label else 50)
+            for name, p in providers.items()
+        }
+        rows.append([label, f"{timings['default']:.2f}", f"{timings['columnar']:.2f}",
+                     f"{timings['default'] / timings['columnar']:.1f}x"])
+    
+    print_table(['payload', 'to_dict + json ms', 'columnar ms', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""Country similarity benchmark: python -m benchmarks.bench_similarity"""
+import time
+import numpy as np
+from benchmarks.common import make_panel, timeit, print_table
+from services.data_service import DataService
+from services.analytics_service import AnalyticsService
+
+
+def pair_loop(z, k):
+    #* per-pair Python loop, how the neighbours were found before
+    n = len(z)
+    result = []
+    for i in range(n):
+        scores = [(float(np.dot(z[i], z[j])), j) for j in range(n) if j != i]
+        result.append(sorted(scores, reverse=True)[:k])
+    return result
+
+
+def main(n_years=100):
+    rows = []
+    for n_countries in (500, 2000, 5000):
+        service = AnalyticsService(DataService(make_panel(n_countries, n_years)))
+        
+        start = time.perf_counter()
+        service.get_similar_countries('net', 'pearson', 5)
+        build_ms = (time.perf_counter() - start) * 1000
+        cached_ms = timeit(lambda: service.get_similar_countries('net', 'pearson', 5, ['C00001']), repeat=20)
+        
+        loop = ''
+        if n_countries <= 500:
+            z = np.random.default_rng(0).standard_normal((n_countries, n_years))
+            loop = f'{timeit(lambda: pair_loop(z, 5), repeat=1):.0f}'
+        rows.append([n_countries, f'{build_ms:.0f}', f'{cached_ms:.2f}', loop])
+    
+    print(f'{n_years} years per series, k=5')
+    print_table(['countries', 'build ms', 'cached lookup ms', 'pair loop ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
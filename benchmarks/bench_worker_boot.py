@@ -0,0 +1,73 @@
+"""Worker boot time and private memory, per-worker load vs preload in master (Linux only):
+python -m benchmarks.bench_worker_boot"""
+import gc
+import os
+import tempfile
+import time
+from benchmarks.common import make_panel, print_table
+from services import dataset_store
+from services.analytics_service import AnalyticsService
+from services.data_service import DataService
+
+WORKERS = 4
+
+
+def private_mb(pid):
+    #* memory not shared with any other process (USS)
+    total = 0
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            if line.startswith(('Private_Clean', 'Private_Dirty')):
+                total += int(line.split()[1])
+    return total / 1024
+
+
+def spawn_workers(boot):
+    #* each child boots, answers one query, reports boot ms and waits to be measured
+    children = []
+    for _ in range(WORKERS):
+        read_fd, write_fd = os.pipe()
+        start = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            service = boot()
+            AnalyticsService(service).get_trend_analysis(start_year=1960, end_year=1990)
+            os.write(write_fd, f'{(time.perf_counter() - start) * 1000:.1f}'.encode())
+            os.close(write_fd)
+            time.sleep(60)
+            os._exit(0)
+        os.close(write_fd)
+        children.append((pid, read_fd))
+    
+    boot_ms, rss = [], []
+    for pid, read_fd in children:
+        boot_ms.append(float(os.read(read_fd, 64).decode()))
+        os.close(read_fd)
+        rss.append(private_mb(pid))
+        os.kill(pid, 9)
+        os.waitpid(pid, 0)
+    return sum(boot_ms) / WORKERS, sum(rss) / WORKERS
+
+
+def main(n_countries=1000, n_years=500):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, 'store')
+        dataset_store.write_columns(make_panel(n_countries, n_years), store)
+        
+        per_worker = spawn_workers(lambda: DataService(dataset_store.read_columns(store)))
+        
+        preloaded = DataService(dataset_store.read_columns(store))
+        gc.collect()
+        gc.freeze()
+        shared = spawn_workers(lambda: preloaded)
+    
+    print(f'{n_countries * n_years} rows, {WORKERS} workers')
+    print_table(['mode', 'boot ms', 'private MB / worker'], [
+        ['load per worker', f'{per_worker[0]:.1f}', f'{per_worker[1]:.1f}'],
+        ['preload in master', f'{shared[0]:.1f}', f'{shared[1]:.1f}']
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+import time
+import numpy as np
+import pandas as pd
+
+
+def make_panel(n_countries, n_years, start_year=1950, seed=0):
+    #* synthetic processed frame with the same columns as estat_migration.csv
+    rng = np.random.default_rng(seed)
+    countries = np.array([f'C{i:05d}' for i in range(n_countries)])
+    
+    df = pd.DataFrame({
+        'Country': np.repeat(countries, n_years),
+        'Year': np.tile(np.arange(start_year, start_year + n_years), n_countries),
+        'Im_Value': rng.integers(100, 1_000_000, n_countries * n_years),
+        'Em_Value': rng.integers(100, 1_000_000, n_countries * n_years)
+    })
+    df['Net_Migration'] = df['Im_Value'] - df['Em_Value']
+    
+    # shuffled like a freshly merged file, so load-time sorting is exercised
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def timeit(fn, repeat=50):
+    #* median wall time in milliseconds
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print('  '.join(str(h).rjust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print('  '.join(str(v).rjust(w) for v, w in zip(row, widths)))
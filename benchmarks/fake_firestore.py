@@ -0,0 +1,126 @@
+"""In-process stand-in for the sync and async Firestore clients, enough for API key validation and user documents"""
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+from db import firebase_config
+
+
+class FakeSnapshot:
+
+    def __init__(self, data):
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data or {})
+
+
+class FakeDocument:
+
+    def __init__(self, store, key):
+        self._store = store
+        self._key = key
+
+    def get(self):
+        if self._store.latency:
+            time.sleep(self._store.latency)
+        return self._store.read(self._key)
+
+    def set(self, data):
+        with self._store.lock:
+            self._store.documents[self._key] = dict(data)
+
+    def update(self, data):
+        with self._store.lock:
+            self._store.documents.setdefault(self._key, {}).update(data)
+
+    def delete(self):
+        with self._store.lock:
+            self._store.documents.pop(self._key, None)
+
+
+class FakeCollection:
+
+    def __init__(self, store, name):
+        self._store = store
+        self._name = name
+
+    def document(self, key):
+        return FakeDocument(self._store, (self._name, key))
+
+
+class FakeAsyncDocument:
+    #* same documents as FakeDocument, latency awaited on the event loop like grpc.aio calls
+
+    def __init__(self, store, key):
+        self._document = FakeDocument(store, key)
+        self._store = store
+
+    async def get(self):
+        if self._store.latency:
+            await asyncio.sleep(self._store.latency)
+        return self._store.read(self._document._key)
+
+    async def set(self, data):
+        self._document.set(data)
+
+    async def update(self, data):
+        self._document.update(data)
+
+    async def delete(self):
+        self._document.delete()
+
+
+class FakeAsyncCollection:
+
+    def __init__(self, store, name):
+        self._store = store
+        self._name = name
+
+    def document(self, key):
+        return FakeAsyncDocument(self._store, (self._name, key))
+
+
+class FakeAsyncFirestore:
+    #* the async client view of a FakeFirestore, what get_async_firestore_client() returns
+
+    def __init__(self, store):
+        self._store = store
+
+    def collection(self, name):
+        return FakeAsyncCollection(self._store, name)
+
+
+class FakeFirestore:
+    #* dict-backed documents keyed by (collection, id), counts reads so cache hit rates can be checked
+    #* latency (seconds) is added to every read, slept by the sync client and awaited by the async one
+
+    def __init__(self, latency=0.0):
+        self.documents = {}
+        self.reads = 0
+        self.latency = latency
+        self.lock = threading.Lock()
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def read(self, key):
+        with self.lock:
+            self.reads += 1
+            return FakeSnapshot(self.documents.get(key))
+
+    def add_api_key(self, api_key, user_id='benchmark', tier=None, days=30):
+        data = {'user_id': user_id, 'expires_at': datetime.now() + timedelta(days=days)}
+        if tier:
+            data['tier'] = tier
+        self.collection('api_keys').document(api_key).set(data)
+
+
+def install(store=None):
+    #* make get_firestore_client() and get_async_firestore_client() return the stand-in,
+    #* no credentials or network needed
+    store = store or FakeFirestore()
+    firebase_config._db = store
+    firebase_config._async_db = FakeAsyncFirestore(store)
+    return store
@@ -0,0 +1,228 @@
+"""Synthetic raw Eurostat files (tps00176 immigration / tps00177 emigration layout) for scale testing:
+python -m benchmarks.generate_eurostat --out /tmp/eurostat --regions 50 --start-year 1960 --end-year 2023
+python -m benchmarks.generate_eurostat --out /tmp/eurostat --dimension sex=T,M,F --dimension age=TOTAL,Y_LT15,Y15-64,Y_GE65
+python -m benchmarks.generate_eurostat --out /tmp/eurostat --synthetic-countries 36963    processed rows at 1000x today's
+Rows are written block by block, memory stays bounded however many rows the options add up to.
+With synthetic countries the processed estat_migration.csv is written too (this step reads both raw files),
+the app loads it as is and keeps them."""
+import argparse
+import itertools
+import os
+import time
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from services.ingest_service import COUNTRY_MAPPING, merge_sources
+
+COLUMNS = [
+    'DATAFLOW', 'LAST UPDATE', 'freq', 'citizen', 'agedef', 'age', 'unit', 'sex',
+    'geo', 'TIME_PERIOD', 'OBS_VALUE', 'OBS_FLAG', 'CONF_STATUS'
+]
+
+# dimension columns between freq and geo, with the values the real files carry
+DIMENSIONS = {
+    'citizen': ['TOTAL'],
+    'agedef': ['COMPLET', 'REACH'],
+    'age': ['TOTAL'],
+    'unit': ['NR'],
+    'sex': ['T']
+}
+
+SOURCES = {
+    'estat_tps00176_en.csv': ('ESTAT:TPS00176(1.0)', 'immigration'),
+    'estat_tps00177_en.csv': ('ESTAT:TPS00177(1.0)', 'emigration')
+}
+KINDS = ['immigration', 'emigration']
+
+PROCESSED_FILE = 'estat_migration.csv'
+
+# extra countries beyond COUNTRY_MAPPING, mapped to themselves while the generated files are processed
+SYNTHETIC_PREFIX = 'X'
+
+EU_AGGREGATE = 'EU27_2020'
+EU_MEMBERS = {
+    'AT', 'BE', 'BG', 'CY', 'CZ', 'DE', 'DK', 'EE', 'EL', 'ES', 'FI', 'FR', 'HR', 'HU',
+    'IE', 'IT', 'LT', 'LU', 'LV', 'MT', 'NL', 'PL', 'PT', 'RO', 'SE', 'SI', 'SK'
+}
+
+# observation flags and their share of rows in the real files
+FLAGS = ['', 'p', 'e', 'b', 'ep', 'bep', 'bp']
+FLAG_WEIGHTS = [0.86, 0.042, 0.037, 0.021, 0.025, 0.011, 0.004]
+
+# rows formatted per block, bounds memory whatever the total size
+BLOCK_ROWS = 500_000
+
+
+def synthetic_countries(n):
+    #* geo codes of the synthetic countries, used unchanged as their processed country code
+    return [f'{SYNTHETIC_PREFIX}{i:05d}' for i in range(1, n + 1)]
+
+
+def geo_codes(n_countries, n_synthetic, regions_per_country):
+    #* (codes, is_region): Eurostat and synthetic country codes, each followed by NUTS-style
+    #* region codes (AT, AT001, AT002, ...)
+    countries = sorted(COUNTRY_MAPPING)[:n_countries] + synthetic_countries(n_synthetic)
+    codes = []
+    is_region = []
+    for country in countries:
+        codes.append(country)
+        codes.extend(f'{country}{i:03X}' for i in range(1, regions_per_country + 1))
+        is_region.extend([False] + [True] * regions_per_country)
+    return np.array(codes), np.array(is_region)
+
+
+@contextmanager
+def synthetic_mapping(n_synthetic):
+    #* COUNTRY_MAPPING extended in place with the synthetic codes, for harnesses that process generated files
+    #* (merge_sources, IngestService); the app itself never knows about them
+    codes = [code for code in synthetic_countries(n_synthetic) if code not in COUNTRY_MAPPING]
+    COUNTRY_MAPPING.update(zip(codes, codes))
+    try:
+        yield
+    finally:
+        for code in codes:
+            COUNTRY_MAPPING.pop(code, None)
+
+
+def write_processed(out, n_synthetic):
+    #* the processed file the app loads as is, so synthetic countries need no mapping at load time
+    sources = [pd.read_csv(os.path.join(out, filename)) for filename in SOURCES]
+    with synthetic_mapping(n_synthetic):
+        processed = merge_sources(*sources)
+    path = os.path.join(out, PROCESSED_FILE)
+    processed.to_csv(path, index=False)
+    return path, len(processed)
+
+
+class GeoProfiles:
+    #* per-geo level, trend and first year, shared by both files so immigration and emigration line up
+
+    def __init__(self, geos, is_region, years, seed):
+        rng = np.random.default_rng([seed, 0])
+        n = len(geos)
+        self.level = rng.lognormal(10.5, 1.2, n) * np.where(is_region, 0.05, 1.0)
+        self.trend = rng.normal(0.01, 0.03, n)
+        self.emigration_ratio = rng.uniform(0.4, 1.1, n)
+        # a fifth of the series start late, like countries joining the collection
+        late = rng.random(n) < 0.2
+        self.first_year = years[0] + np.where(late, rng.integers(0, max(len(years) * 2 // 5, 1), n), 0)
+
+
+def _block(geos, profiles, rows, years, kind, combo_factor, rng, gap_rate):
+    #* (geo, year, value, kept) for one block of geos, values as int64
+    n_years = len(years)
+    geo_index = np.repeat(rows, n_years)
+    year = np.tile(years, len(rows))
+
+    t = year - years[0]
+    level = profiles.level[geo_index]
+    if kind == 'emigration':
+        level = level * profiles.emigration_ratio[geo_index]
+    noise = rng.normal(0, 0.08, len(geo_index))
+    value = np.rint(level * combo_factor * np.exp(profiles.trend[geo_index] * t + noise)).astype(np.int64)
+
+    kept = (year >= profiles.first_year[geo_index]) & (rng.random(len(geo_index)) >= gap_rate)
+    return geos[geo_index], year, value, kept
+
+
+def _lines(dataflow, last_update, combo, geo, year, value, rng):
+    #* CSV text for one block, formatted directly; pandas.to_csv is several times slower here
+    prefix = ','.join([dataflow, last_update, 'A', *combo]).replace('{', '{{').replace('}', '}}')
+    flags = rng.choice(FLAGS, len(geo), p=FLAG_WEIGHTS)
+    row = prefix + ',{},{},{},{},\n'
+    return ''.join(map(row.format, geo.tolist(), year.tolist(), value.tolist(), flags.tolist()))
+
+
+def write_source(path, dataflow, kind, geos, profiles, years, dimensions, options):
+    #* one raw file, streamed combo by combo and block by block; returns rows written
+    #* rows are sorted by dimensions, geo and year, EU27_2020 closes each dimension block
+    last_update = time.strftime('%d/%m/%y %H:%M:%S')
+    combos = list(itertools.product(*dimensions.values()))
+    geos_per_block = max(BLOCK_ROWS // len(years), 1)
+    members = np.isin(geos, list(EU_MEMBERS))
+    written = 0
+
+    with open(path, 'w', newline='') as f:
+        f.write(','.join(COLUMNS) + '\n')
+
+        for combo_id, combo in enumerate(combos):
+            # every extra dimension value splits the totals, the first value is the total itself
+            combo_factor = 1.0 if combo_id == 0 else np.random.default_rng([options.seed, 1, combo_id]).uniform(0.1, 0.6)
+            eu_total = np.zeros(len(years), dtype=np.int64)
+
+            for start in range(0, len(geos), geos_per_block):
+                rows = np.arange(start, min(start + geos_per_block, len(geos)))
+                rng = np.random.default_rng([options.seed, 2, KINDS.index(kind), combo_id, start])
+                geo, year, value, kept = _block(geos, profiles, rows, years, kind, combo_factor, rng, options.gap_rate)
+
+                # like Eurostat's estimates, the EU aggregate covers members in years they did not report
+                in_eu = members[np.repeat(rows, len(years))]
+                np.add.at(eu_total, year[in_eu] - years[0], value[in_eu])
+
+                geo, year, value = geo[kept], year[kept], value[kept]
+                duplicated = rng.random(len(geo)) < options.duplicate_rate
+                order = np.repeat(np.arange(len(geo)), np.where(duplicated, 2, 1))
+                f.write(_lines(dataflow, last_update, combo, geo[order], year[order], value[order], rng))
+                written += len(order)
+
+            if options.aggregates:
+                rng = np.random.default_rng([options.seed, 3, KINDS.index(kind), combo_id])
+                f.write(_lines(dataflow, last_update, combo, np.full(len(years), EU_AGGREGATE), years, eu_total, rng))
+                written += len(years)
+
+    return written
+
+
+def parse_dimension(text):
+    name, _, values = text.partition('=')
+    if name not in DIMENSIONS or not values:
+        raise argparse.ArgumentTypeError(f"expected one of {', '.join(DIMENSIONS)} as name=value,value")
+    return name, values.split(',')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', required=True, help='directory for estat_tps00176_en.csv / estat_tps00177_en.csv')
+    parser.add_argument('--countries', type=int, default=len(COUNTRY_MAPPING),
+                        help=f'Eurostat countries to include (max {len(COUNTRY_MAPPING)})')
+    parser.add_argument('--synthetic-countries', type=int, default=0,
+                        help=f'extra countries ({SYNTHETIC_PREFIX}00001, ...), kept in {PROCESSED_FILE}')
+    parser.add_argument('--regions', type=int, default=0, help='NUTS-style regions per country')
+    parser.add_argument('--start-year', type=int, default=2011)
+    parser.add_argument('--end-year', type=int, default=2022)
+    parser.add_argument('--dimension', type=parse_dimension, action='append', default=[],
+                        help='replace the values of a dimension column, e.g. sex=T,M,F')
+    parser.add_argument('--gap-rate', type=float, default=0.02, help='share of observations left out')
+    parser.add_argument('--duplicate-rate', type=float, default=0.001, help='share of rows written twice')
+    parser.add_argument('--no-aggregates', dest='aggregates', action='store_false', help=f'leave out {EU_AGGREGATE}')
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args(argv)
+
+    if not 0 <= options.countries <= len(COUNTRY_MAPPING):
+        parser.error(f'--countries must be between 0 and {len(COUNTRY_MAPPING)}')
+    if options.synthetic_countries < 0 or options.countries + options.synthetic_countries < 1:
+        parser.error('at least one country is needed')
+    if options.end_year < options.start_year:
+        parser.error('--end-year is before --start-year')
+
+    dimensions = {**DIMENSIONS, **dict(options.dimension)}
+    geos, is_region = geo_codes(options.countries, options.synthetic_countries, options.regions)
+    years = np.arange(options.start_year, options.end_year + 1)
+    profiles = GeoProfiles(geos, is_region, years, options.seed)
+    os.makedirs(options.out, exist_ok=True)
+
+
+    for filename, (dataflow, kind) in SOURCES.items():
+        path = os.path.join(options.out, filename)
+        start = time.perf_counter()
+        rows = write_source(path, dataflow, kind, geos, profiles, years, dimensions, options)
+        print(f'{path}: {rows} rows in {time.perf_counter() - start:.1f} s')
+
+    if options.synthetic_countries:
+        start = time.perf_counter()
+        path, rows = write_processed(options.out, options.synthetic_countries)
+        print(f'{path}: {rows} rows in {time.perf_counter() - start:.1f} s')
+
+
+if __name__ == '__main__':
+    main()
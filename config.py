@@ -15,25 +15,54 @@ class Config:
     DATABASE_PATH = os.getenv('DATABASE_PATH', 'db/apikeys.db')
     
     API_KEY_EXPIRY_DAYS = int(os.getenv('API_KEY_EXPIRY_DAYS', 30))
+    API_KEY_CACHE_SIZE = int(os.getenv('API_KEY_CACHE_SIZE', 10000))
+    API_KEY_CACHE_TTL = int(os.getenv('API_KEY_CACHE_TTL', 300))
+    API_KEY_NEGATIVE_CACHE_TTL = int(os.getenv('API_KEY_NEGATIVE_CACHE_TTL', 30))
     
     RATE_LIMIT_PER_HOUR = int(os.getenv('RATE_LIMIT_PER_HOUR', 100))
     RATE_LIMIT_PER_DAY = int(os.getenv('RATE_LIMIT_PER_DAY', 1000))
+    RATE_LIMIT_STORAGE_URI = os.getenv('RATE_LIMIT_STORAGE_URI', 'sqlite:///db/ratelimit.db')
+    RATE_LIMIT_STRATEGY = os.getenv('RATE_LIMIT_STRATEGY', 'sliding-window-counter')
+    RATE_LIMIT_ROWS_PER_UNIT = int(os.getenv('RATE_LIMIT_ROWS_PER_UNIT', 250))
+    #* RATE_LIMIT_PER_HOUR / PER_DAY still count requests; the default tier's unit budget is them times this,
+    #* the cost of the costliest unfiltered query over today's dataset
+    RATE_LIMIT_UNITS_PER_REQUEST = int(os.getenv('RATE_LIMIT_UNITS_PER_REQUEST', 5))
+    #* cost units per API key by tier (the 'tier' field of the key's Firestore document)
+    RATE_LIMIT_TIERS = {
+        'default': (
+            f"{RATE_LIMIT_PER_HOUR * RATE_LIMIT_UNITS_PER_REQUEST} per hour;"
+            f"{RATE_LIMIT_PER_DAY * RATE_LIMIT_UNITS_PER_REQUEST} per day"
+        ),
+        'premium': os.getenv('RATE_LIMIT_PREMIUM', '2000 per hour;20000 per day')
+    }
+    
+    JSON_SERIALIZER = os.getenv('JSON_SERIALIZER', 'columnar')
     
     CACHE_TYPE = os.getenv('CACHE_TYPE', 'simple')
     CACHE_DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 3600))
+    HTTP_CACHE_MAX_AGE = int(os.getenv('HTTP_CACHE_MAX_AGE', 300))
+    
+    ASYNC_WORKER_THREADS = int(os.getenv('ASYNC_WORKER_THREADS', 8))
+    ASYNC_MAX_PENDING = int(os.getenv('ASYNC_MAX_PENDING', 1024))
     
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     LOG_FILE = os.getenv('LOG_FILE', 'logs/app.log')
     
     ADMIN_USERNAME = os.getenv('ADMIN_USERNAME', 'admin')
-    ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', 'admin123')
+    ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', '')
     
-    DATASET_IMMIGRATION = 'dataset/estat_tps00176_en.csv'
-    DATASET_EMIGRATION = 'dataset/estat_tps00177_en.csv'
-    DATASET_PROCESSED = 'dataset/estat_migration.csv'
+    DATASET_IMMIGRATION = os.getenv('DATASET_IMMIGRATION', 'dataset/estat_tps00176_en.csv')
+    DATASET_EMIGRATION = os.getenv('DATASET_EMIGRATION', 'dataset/estat_tps00177_en.csv')
+    DATASET_PROCESSED = os.getenv('DATASET_PROCESSED', 'dataset/estat_migration.csv')
+    DATASET_BINARY = os.getenv('DATASET_BINARY', 'dataset/estat_migration')
+    DATASET_MANIFEST = os.getenv('DATASET_MANIFEST', 'dataset/ingest_manifest.npz')
+    PRELOAD_DATASET = os.getenv('PRELOAD_DATASET', 'True').lower() == 'true'
+    DATASET_WATCH_INTERVAL = float(os.getenv('DATASET_WATCH_INTERVAL', 10))
+    DATASET_RELOAD_STAMP = os.getenv('DATASET_RELOAD_STAMP', 'dataset/reload.stamp')
     
     DEFAULT_PAGE_SIZE = 100
     MAX_PAGE_SIZE = 1000
+    STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 5000))
     
     FIREBASE_WEB_API_KEY = os.getenv('FIREBASE_WEB_API_KEY', '')
     FIREBASE_AUTH_DOMAIN = os.getenv('FIREBASE_AUTH_DOMAIN', '')
@@ -54,6 +83,9 @@ class TestingConfig(Config):
     TESTING = True
     DEBUG = True
     DATABASE_PATH = 'db/test_apikeys.db'
+    PRELOAD_DATASET = False
+    DATASET_WATCH_INTERVAL = 0
+    RATE_LIMIT_STORAGE_URI = 'memory://'
 
 class ProductionConfig(Config):
     DEBUG = False
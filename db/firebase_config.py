@@ -1,26 +1,63 @@
 import firebase_admin
 from firebase_admin import credentials, auth, firestore
+from google.cloud.firestore import AsyncClient
 import os
+import threading
 
-# for render 
-if os.path.exists('/etc/secrets/firebase-credentials.json'):
-    cred = credentials.Certificate('/etc/secrets/firebase-credentials.json')
-else:
-    # my local
-    cred = credentials.Certificate(
-        os.getenv('FIREBASE_CREDENTIALS_PATH', 'firebase-credentials.json')
-    )
+#* firebase app and firestore client are created on first use, never at import
+#* gRPC channels are not fork-safe, so each forked worker opens its own
+
+_lock = threading.Lock()
+_firebase_app = None
+_db = None
+_async_db = None
 
-firebase_admin.initialize_app(cred)
+def _credentials_path():
+    # for render 
+    if os.path.exists('/etc/secrets/firebase-credentials.json'):
+        return '/etc/secrets/firebase-credentials.json'
+    # my local
+    return os.getenv('FIREBASE_CREDENTIALS_PATH', 'firebase-credentials.json')
 
-db = firestore.client()
+def get_firebase_app():
+    global _firebase_app
+    if _firebase_app is None:
+        with _lock:
+            if _firebase_app is None:
+                cred = credentials.Certificate(_credentials_path())
+                _firebase_app = firebase_admin.initialize_app(cred)
+    return _firebase_app
 
 def get_firestore_client():
-    return db
+    global _db
+    if _db is None:
+        app = get_firebase_app()
+        with _lock:
+            if _db is None:
+                _db = firestore.client(app=app)
+    return _db
+
+def get_async_firestore_client():
+    #* grpc.aio client for the ASGI entry point, used from its single event loop
+    global _async_db
+    if _async_db is None:
+        app = get_firebase_app()
+        with _lock:
+            if _async_db is None:
+                _async_db = AsyncClient(project=app.project_id, credentials=app.credential.get_credential())
+    return _async_db
+
+def _reset_after_fork():
+    global _db, _async_db, _lock
+    _lock = threading.Lock()
+    _db = None
+    _async_db = None
+
+os.register_at_fork(after_in_child=_reset_after_fork)
 
 def verify_firebase_token(id_token):
     try:
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = auth.verify_id_token(id_token, app=get_firebase_app())
         return decoded_token
     except Exception as e:
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,18 @@
+import gc
+import os
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 8080)}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+#* import app.py (and load the dataset) once in the master, workers inherit it copy-on-write
+preload_app = True
+
+def when_ready(server):
+    #* move preloaded objects out of gc tracking so collections in workers don't dirty shared pages
+    gc.collect()
+    gc.freeze()
+
+def post_worker_init(worker):
+    #* only workers serve a snapshot, so only they watch for reloads from other processes
+    worker.wsgi.extensions['services'].start_watcher()
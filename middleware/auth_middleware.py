@@ -1,6 +1,15 @@
+import hmac
 from functools import wraps
-from flask import request, jsonify
+from flask import request, jsonify, current_app
 from services.auth_service import AuthService
+from utils.helpers import request_memos
+
+#* WSGI environ keys set by the ASGI entry point (middleware/wsgi_bridge.py) after async validation
+API_KEY_VALIDATED = 'eu_migration.api_key_validated'
+FIREBASE_TOKEN = 'eu_migration.firebase_token'
+
+#* the old config default and the README example, admin endpoints stay off until ADMIN_PASSWORD is something else
+WELL_KNOWN_ADMIN_PASSWORDS = {'', 'admin123', 'secure-password'}
 
 def require_api_key(f):
     @wraps(f)
@@ -10,8 +19,47 @@ def require_api_key(f):
         if not api_key:
             return jsonify({'error': 'API key missing'}), 401
         
-        if not AuthService.validate_api_key(api_key):
+        validated = request.environ.get(API_KEY_VALIDATED) == api_key
+        if not validated and not AuthService.validate_api_key(api_key):
             return jsonify({'error': 'Invalid or expired API key'}), 401
         
         return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
+    decorated_function.requires_api_key = True
+    return decorated_function
+
+def authenticated_api_key():
+    #* the request's API key once validated, None for endpoints that take no key and for invalid keys
+    #* the rate limiter runs before require_api_key; validating here is the same cached lookup it makes next
+    memos = request_memos()
+    if 'authenticated_api_key' not in memos:
+        api_key = request.headers.get('X-API-KEY')
+        view = current_app.view_functions.get(request.endpoint)
+        valid = bool(api_key) and getattr(view, 'requires_api_key', False) and (
+            request.environ.get(API_KEY_VALIDATED) == api_key or AuthService.validate_api_key(api_key)
+        )
+        memos['authenticated_api_key'] = api_key if valid else None
+    return memos['authenticated_api_key']
+
+def require_admin(f):
+    #* HTTP basic auth against ADMIN_USERNAME / ADMIN_PASSWORD, 503 while no real password is configured
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if current_app.config['ADMIN_PASSWORD'] in WELL_KNOWN_ADMIN_PASSWORDS:
+            return jsonify({'error': 'Admin endpoints are disabled, set ADMIN_PASSWORD'}), 503
+        
+        credentials = request.authorization
+        
+        if not credentials or credentials.type != 'basic':
+            return jsonify({'error': 'Admin credentials missing'}), 401
+        
+        valid_user = hmac.compare_digest(
+            (credentials.username or '').encode(), current_app.config['ADMIN_USERNAME'].encode()
+        )
+        valid_password = hmac.compare_digest(
+            (credentials.password or '').encode(), current_app.config['ADMIN_PASSWORD'].encode()
+        )
+        if not (valid_user and valid_password):
+            return jsonify({'error': 'Invalid admin credentials'}), 401
+        
+        return f(*args, **kwargs)
+    return decorated_function
@@ -42,6 +42,14 @@ def register_error_handlers(app):
             'message': 'The requested resource does not exist'
         }), 404
     
+    @app.errorhandler(429)
+    def handle_rate_limit(error):
+        #* X-RateLimit-* and Retry-After headers are added by the limiter
+        return jsonify({
+            'error': 'Rate limit exceeded',
+            'message': f'Limit of {error.description} reached'
+        }), 429
+    
     @app.errorhandler(500)
     def handle_internal_error(error):
         logger.error(f"Internal Server Error: {str(error)}")
@@ -0,0 +1,172 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from math import floor
+from limits.storage import Storage, SlidingWindowCounterSupport
+from limits.storage.base import TimestampedSlidingWindow
+
+# seconds between sweeps of expired counters
+COMPACT_INTERVAL = 60
+
+# seconds a worker waits for another worker's write lock
+BUSY_TIMEOUT = 5
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL,
+    expires REAL NOT NULL
+) WITHOUT ROWID
+'''
+
+INCREMENT = '''
+INSERT INTO counters (key, value, expires) VALUES (:key, :amount, :expires)
+ON CONFLICT (key) DO UPDATE SET
+    value = CASE WHEN expires > :now THEN value + :amount ELSE :amount END,
+    expires = CASE WHEN expires > :now THEN expires ELSE :expires END
+RETURNING value
+'''
+
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    #* rate limit counters in one SQLite file (WAL mode) shared by every worker process on the node
+    #* supports the fixed-window and sliding-window-counter strategies, two counters per key and limit
+    #* storage_uri: sqlite:///db/ratelimit.db (relative) or sqlite:////var/run/ratelimit.db (absolute)
+
+    STORAGE_SCHEME = ['sqlite']
+
+    def __init__(self, uri, wrap_exceptions=False, compact_interval=COMPACT_INTERVAL, **options):
+        self.path = uri[len('sqlite:///'):]
+        if not self.path:
+            raise ValueError('sqlite storage needs a file path, e.g. sqlite:///db/ratelimit.db')
+
+        self.compact_interval = float(compact_interval)
+        self._next_compaction = 0.0
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        connection = self._connection()
+        # WAL is a property of the file, readers never block the single writer
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(SCHEMA)
+
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self):
+        #* one connection per thread, reopened in forked workers
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        #* BEGIN IMMEDIATE takes the write lock up front, so read-check-increment is atomic across workers
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+        self._compact(connection)
+
+    def _compact(self, connection):
+        #* drop expired counters, whichever worker gets here first does the sweep
+        now = time.time()
+        if now < self._next_compaction:
+            return
+        self._next_compaction = now + self.compact_interval
+        connection.execute('DELETE FROM counters WHERE expires <= ?', (now,))
+
+    @staticmethod
+    def _get(connection, key, now):
+        row = connection.execute(
+            'SELECT value FROM counters WHERE key = ? AND expires > ?', (key, now)
+        ).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _increment(connection, key, expiry, amount, now):
+        return connection.execute(
+            INCREMENT, {'key': key, 'amount': amount, 'expires': now + expiry, 'now': now}
+        ).fetchone()[0]
+
+    def incr(self, key, expiry, amount=1):
+        with self._transaction() as connection:
+            return self._increment(connection, key, expiry, amount, time.time())
+
+    def get(self, key):
+        return self._get(self._connection(), key, time.time())
+
+    def get_expiry(self, key):
+        now = time.time()
+        row = self._connection().execute(
+            'SELECT expires FROM counters WHERE key = ? AND expires > ?', (key, now)
+        ).fetchone()
+        return row[0] if row else now
+
+    def check(self):
+        try:
+            self._connection().execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        with self._transaction() as connection:
+            return connection.execute('DELETE FROM counters').rowcount
+
+    def clear(self, key):
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM counters WHERE key = ?', (key,))
+
+    @staticmethod
+    def _window(previous_count, current_count, expiry, now):
+        #* (previous, previous ttl, current, current ttl) as limits' sliding window counter expects
+        previous_ttl = (1 - (((now - expiry) / expiry) % 1)) * expiry if previous_count else 0.0
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(self, key, limit, expiry, amount=1):
+        if amount > limit:
+            return False
+
+        now = time.time()
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        with self._transaction() as connection:
+            previous, previous_ttl, current, _ = self._window(
+                self._get(connection, previous_key, now), self._get(connection, current_key, now), expiry, now
+            )
+            if floor(previous * previous_ttl / expiry + current) + amount > limit:
+                return False
+            # the current window still weighs into the next one, so it lives for two windows
+            self._increment(connection, current_key, 2 * expiry, amount, now)
+            return True
+
+    def get_sliding_window(self, key, expiry):
+        now = time.time()
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        connection = self._connection()
+        return self._window(
+            self._get(connection, previous_key, now), self._get(connection, current_key, now), expiry, now
+        )
+
+    def clear_sliding_window(self, key, expiry):
+        previous_key, current_key = self.sliding_window_keys(key, expiry, time.time())
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM counters WHERE key IN (?, ?)', (previous_key, current_key))
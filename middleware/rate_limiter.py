@@ -1,23 +1,49 @@
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from flask import request
-from config import Config
+from flask import current_app
+from middleware.auth_middleware import authenticated_api_key
+from middleware.request_cost import request_cost
+from services.auth_service import AuthService, DEFAULT_TIER
+from utils.helpers import request_memos
+#* registers the sqlite:// storage scheme with limits
+import middleware.rate_limit_storage  # noqa: F401
 
 def get_api_key():
-    #* extract apikey from request for rate limiting
-    return request.headers.get('X-API-KEY', get_remote_address())
+    #* validated API key, anything else (no key, invalid key, endpoints without auth) by client address
+    return authenticated_api_key() or get_remote_address()
+
+def tier_limits():
+    #* limit string for the caller's tier, unknown tiers and anonymous callers get the default
+    #* only validated keys have a tier, so an arbitrary X-API-KEY costs no extra lookup here
+    tiers = current_app.config['RATE_LIMIT_TIERS']
+    api_key = authenticated_api_key()
+    tier = AuthService.get_api_key_tier(api_key) if api_key else None
+    return tiers.get(tier) or tiers[DEFAULT_TIER]
 
 def setup_rate_limiter(app):
     #* rate limiter 
+    #* one budget per API key across all endpoints, each request charged by its estimated cost
+    
+    #* registered before the limiter so it runs after the limiter has injected its headers
+    @app.after_request
+    def add_cost_header(response):
+        cost = request_memos().get('request_cost')
+        if cost is not None:
+            response.headers['X-RateLimit-Cost'] = str(cost)
+        # flask-limiter sends Retry-After on every response, keep it to rejections
+        if response.status_code not in (429, 503):
+            response.headers.pop('Retry-After', None)
+        return response
+    
     limiter = Limiter(
         app=app,
         key_func=get_api_key,
-        default_limits=[
-            f"{Config.RATE_LIMIT_PER_HOUR} per hour",
-            f"{Config.RATE_LIMIT_PER_DAY} per day"
-        ],
-        storage_uri="memory://",
-        strategy="fixed-window"
+        application_limits=[tier_limits],
+        application_limits_cost=request_cost,
+        headers_enabled=True,
+        #* counters shared by all gunicorn workers on the node, see middleware/rate_limit_storage.py
+        storage_uri=app.config['RATE_LIMIT_STORAGE_URI'],
+        strategy=app.config['RATE_LIMIT_STRATEGY']
     )
     
     return limiter
@@ -0,0 +1,104 @@
+import math
+from flask import request, current_app
+from marshmallow import ValidationError
+from services import get_data_service
+from middleware.auth_middleware import authenticated_api_key
+from middleware.response_cache import served_from_cache
+from utils.helpers import request_memos
+from utils.validators import BatchSubQuerySchema
+
+#* work per selected row relative to a plain scan, endpoints not listed cost a flat 1
+ENDPOINT_WEIGHTS = {
+    'migration.get_migration_data': 1,
+    'analytics.get_trends': 1,
+    'analytics.get_comparison': 1,
+    'analytics.get_balance': 1,
+    'analytics.get_growth': 1,
+    'analytics.get_rolling': 2,
+    'analytics.get_distribution': 2,
+    'analytics.get_correlation': 2,
+    'analytics.get_similarity': 2
+}
+
+BATCH_ENDPOINT = 'analytics.run_batch'
+
+
+def cost_for_rows(rows, weight):
+    #* 1 unit for the request itself plus 1 per RATE_LIMIT_ROWS_PER_UNIT weighted rows
+    return 1 + math.ceil(rows * weight / current_app.config['RATE_LIMIT_ROWS_PER_UNIT'])
+
+
+def selected_rows(data_service, countries=None, start_year=None, end_year=None, year=None):
+    return data_service.count(countries or None, start_year, end_year, year)
+
+
+def _query_cost(endpoint, args, data_service):
+    weight = ENDPOINT_WEIGHTS.get(endpoint)
+    if not weight:
+        return 1
+
+    if endpoint == 'migration.get_migration_data' and args.get('format', 'json') == 'json':
+        # a JSON page never returns more than per_page rows
+        return cost_for_rows(min(max(args.get('per_page', 100, type=int) or 0, 0), 1000), weight)
+
+    if endpoint == 'analytics.get_growth' and not args.get('country_codes') and args.get('country_code'):
+        countries = [args.get('country_code')]
+    else:
+        countries = args.getlist('country_codes')
+
+    rows = selected_rows(
+        data_service, countries, args.get('start_year', type=int), args.get('end_year', type=int),
+        args.get('year', type=int)
+    )
+    return cost_for_rows(rows, weight)
+
+
+def _batch_cost(data_service):
+    #* sum of the sub-queries, each priced like its GET endpoint; malformed ones cost 1
+    payload = request.get_json(silent=True) or {}
+    queries = payload.get('queries') if isinstance(payload, dict) else None
+    if not isinstance(queries, list):
+        return 1
+
+    total = 0
+    for query in queries[:20]:
+        try:
+            params = BatchSubQuerySchema().load(query)
+        except (ValidationError, TypeError):
+            total += 1
+            continue
+
+        weight = ENDPOINT_WEIGHTS.get(f"analytics.get_{params['type']}")
+        if not weight:
+            total += 1
+            continue
+
+        countries = params['country_codes']
+        if params['type'] == 'growth' and not params['by_country']:
+            countries = [params['country_code']] if params['country_code'] else None
+        rows = selected_rows(data_service, countries, params['start_year'], params['end_year'], params['year'])
+        total += cost_for_rows(rows, weight)
+    return max(total, 1)
+
+
+def request_cost():
+    #* cost units charged to the caller's rate limit, estimated once per request from the query
+    #* a 304 or a response cache hit costs 1, revalidating clients are not charged for the computation
+    #* unauthenticated requests and unweighted endpoints cost 1 without touching the dataset
+    memos = request_memos()
+    cost = memos.get('request_cost')
+    if cost is None:
+        try:
+            if (authenticated_api_key() is None
+                    or request.endpoint != BATCH_ENDPOINT and request.endpoint not in ENDPOINT_WEIGHTS):
+                cost = 1
+            elif served_from_cache():
+                cost = 1
+            elif request.endpoint == BATCH_ENDPOINT:
+                cost = _batch_cost(get_data_service())
+            else:
+                cost = _query_cost(request.endpoint, request.args, get_data_service())
+        except Exception:
+            cost = 1
+        memos['request_cost'] = cost
+    return cost
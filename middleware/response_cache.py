@@ -0,0 +1,86 @@
+import hashlib
+from functools import wraps
+from flask import request, current_app
+from flask_caching import Cache
+from services import get_data_service
+from utils.helpers import request_memos
+from utils.query import normalize_query
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+cache = Cache()
+
+def setup_cache(app):
+    cache.init_app(app, config={
+        'CACHE_TYPE': app.config['CACHE_TYPE'],
+        'CACHE_DEFAULT_TIMEOUT': app.config['CACHE_DEFAULT_TIMEOUT']
+    })
+    return cache
+
+def response_fingerprint(spec):
+    #* endpoint + dataset content hash + normalized query, the api key is deliberately left out
+    #* doubles as the strong ETag, so equal fingerprints must mean byte-identical bodies
+    #* computed once per request, the rate limiter asks for it before the view does
+    memos = request_memos()
+    if 'response_fingerprint' not in memos:
+        data_service = get_data_service()
+        query = normalize_query(spec, request.args, data_service)
+        view_args = tuple(sorted((request.view_args or {}).items()))
+        raw = repr((request.endpoint, data_service.version, view_args, query))
+        memos['response_fingerprint'] = hashlib.sha1(raw.encode()).hexdigest()
+    return memos['response_fingerprint']
+
+def served_from_cache():
+    #* True when the current request will be answered with a 304 or a cached body, the view never runs
+    view = current_app.view_functions.get(request.endpoint)
+    spec = getattr(view, 'response_cache_spec', None)
+    if spec is None:
+        return False
+    
+    etag = response_fingerprint(spec)
+    return request.if_none_match.contains_weak(etag) or cache.has('response:' + etag)
+
+def add_http_cache_headers(response, etag):
+    response.set_etag(etag)
+    #* shared caches may store the body, but only replay it for the same api key
+    response.headers['Cache-Control'] = (
+        f"public, max-age={current_app.config['HTTP_CACHE_MAX_AGE']}, must-revalidate"
+    )
+    response.vary.add('X-API-KEY')
+    return response
+
+def cached_response(**spec):
+    #! place below require_api_key so authentication runs before a cached body or 304 is served
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            etag = response_fingerprint(spec)
+            
+            if request.if_none_match.contains_weak(etag):
+                return add_http_cache_headers(current_app.response_class(status=304), etag)
+            
+            key = 'response:' + etag
+            cached = cache.get(key)
+            if cached is not None:
+                body, status_code, mimetype = cached
+                response = current_app.response_class(body, status=status_code, mimetype=mimetype)
+                return add_http_cache_headers(response, etag)
+            
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            
+            #! streamed bodies are never buffered into the cache
+            if not response.is_streamed:
+                try:
+                    cache.set(key, (response.get_data(), response.status_code, response.mimetype))
+                except Exception as e:
+                    logger.warning(f"Response cache unavailable: {str(e)}")
+            
+            return add_http_cache_headers(response, etag)
+        
+        #* functools.wraps in the outer decorators carries it to the registered view
+        decorated_function.response_cache_spec = spec
+        return decorated_function
+    return decorator
@@ -0,0 +1,216 @@
+import asyncio
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from db.firebase_config import verify_firebase_token
+from middleware.auth_middleware import API_KEY_VALIDATED, FIREBASE_TOKEN
+from services.auth_service import AuthService
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+#* ASGI scope key carrying extra WSGI environ entries from the async layer to the Flask app
+ENVIRON_EXTRAS = 'eu_migration.environ'
+
+API_KEY_PREFIXES = ('/api/migration', '/api/analytics')
+FIREBASE_AUTH_PREFIX = '/api/auth/'
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+_DONE = object()
+
+
+async def send_json(send, status, payload, headers=()):
+    body = (json.dumps(payload, separators=(',', ':')) + '\n').encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'access-control-allow-origin', b'*'),
+            *headers
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _close(app_iter):
+    close = getattr(app_iter, 'close', None)
+    if close is not None:
+        close()
+
+
+def _pull(app_iter, iterator):
+    #* next chunk, the app iterable is closed on the same pool hop once it is exhausted
+    try:
+        return next(iterator)
+    except StopIteration:
+        _close(app_iter)
+        return _DONE
+
+
+class WSGIBridge:
+    #* ASGI -> WSGI on a bounded thread pool
+    #* idle and keep-alive connections wait on the event loop, only running requests hold a thread
+
+    def __init__(self, wsgi_app, max_workers=8, max_pending=1024):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='wsgi')
+        self.max_pending = max_pending
+        self.pending = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+
+        # beyond max_pending, queued requests are shed instead of piling up behind the pool
+        if self.pending >= self.max_pending:
+            return await send_json(send, 503, {'error': 'Server busy'}, [(b'retry-after', b'1')])
+
+        self.pending += 1
+        try:
+            body = await self._read_body(receive)
+            if body is None:
+                return await send_json(send, 413, {'error': 'Request body too large'})
+            await self._respond(self._environ(scope, body), send)
+        finally:
+            self.pending -= 1
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def _read_body(receive):
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    @staticmethod
+    def _environ(scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+            'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False
+        }
+
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin1').upper().replace('-', '_')
+            value = value.decode('latin1')
+            if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+                environ[name] = value
+                continue
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+
+        environ.update(scope.get(ENVIRON_EXTRAS, {}))
+        return environ
+
+    def _start(self, environ):
+        #* runs on the pool: call the app and pull up to two chunks, so buffered responses need one hop
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(k.lower().encode('latin1'), v.encode('latin1')) for k, v in headers]
+            return lambda data: started.setdefault('written', []).append(data)
+
+        app_iter = self.wsgi_app(environ, start_response)
+        iterator = iter(app_iter)
+        first = _pull(app_iter, iterator)
+        second = _pull(app_iter, iterator) if first is not _DONE else _DONE
+        if started.get('written'):
+            first = b''.join(started['written']) + (first if first is not _DONE else b'')
+        return started, app_iter, iterator, first, second
+
+    async def _respond(self, environ, send):
+        loop = asyncio.get_running_loop()
+        started, app_iter, iterator, chunk, following = await loop.run_in_executor(
+            self.executor, self._start, environ
+        )
+
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': started['status'],
+                'headers': started['headers']
+            })
+            if chunk is _DONE:
+                await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+            # streamed exports hop back to the pool once per chunk
+            while chunk is not _DONE:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': following is not _DONE})
+                chunk = following
+                if chunk is not _DONE:
+                    following = await loop.run_in_executor(self.executor, _pull, app_iter, iterator)
+        finally:
+            # only a response cut short (client gone) still has an open iterable here
+            if following is not _DONE:
+                await loop.run_in_executor(self.executor, _close, app_iter)
+
+
+class AsyncAuthMiddleware:
+    #* resolves API keys and Firebase ID tokens on the event loop before a pool thread is taken
+    #* invalid keys are rejected here, valid ones are passed down so require_api_key skips Firestore
+
+    def __init__(self, app, token_workers=4):
+        self.app = app
+        # ID token checks are CPU-bound JWT verification, kept off the request pool
+        self.token_executor = ThreadPoolExecutor(max_workers=token_workers, thread_name_prefix='firebase-auth')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get('headers', []))
+        path = scope['path']
+        extras = {}
+
+        api_key = headers.get(b'x-api-key')
+        if api_key and path.startswith(API_KEY_PREFIXES) and scope['method'] != 'OPTIONS':
+            api_key = api_key.decode('latin1')
+            if not await AuthService.validate_api_key_async(api_key):
+                return await send_json(send, 401, {'error': 'Invalid or expired API key'})
+            extras[API_KEY_VALIDATED] = api_key
+
+        authorization = headers.get(b'authorization', b'')
+        if path.startswith(FIREBASE_AUTH_PREFIX) and authorization.startswith(b'Bearer '):
+            token = authorization[len(b'Bearer '):].decode('latin1')
+            loop = asyncio.get_running_loop()
+            extras[FIREBASE_TOKEN] = await loop.run_in_executor(self.token_executor, verify_firebase_token, token)
+
+        if extras:
+            scope = {**scope, ENVIRON_EXTRAS: {**scope.get(ENVIRON_EXTRAS, {}), **extras}}
+        return await self.app(scope, receive, send)
@@ -0,0 +1,84 @@
+from flask import Blueprint, request, current_app
+from flasgger import swag_from
+from middleware.auth_middleware import require_admin
+from services.auth_service import AuthService
+from utils.helpers import format_response
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+def dataset_status(registry):
+    snapshot = registry.snapshot
+    return {
+        'snapshot': snapshot.describe(),
+        'reloading': registry.reloading,
+        'last_reload': registry.last_reload,
+        'watch_interval': registry.watch_interval,
+        # operational internals, the invalid-key counts reveal probing, so admin only
+        'api_key_cache': AuthService.api_key_cache_stats()
+    }
+
+@admin_bp.route('/dataset', methods=['GET'])
+@swag_from({
+    'tags': ['Admin'],
+    'description': 'Current dataset snapshot and last reload (HTTP basic auth)',
+    'responses': {
+        200: {'description': 'Snapshot version, load duration, reload status and API key cache stats'},
+        401: {'description': 'Missing or invalid admin credentials'},
+        503: {'description': 'ADMIN_PASSWORD is not configured'}
+    }
+})
+@require_admin
+def get_dataset_status():
+    try:
+        return format_response(data=dataset_status(current_app.extensions['services']))
+    except Exception as e:
+        logger.error(f"Error fetching dataset status: {str(e)}")
+        return format_response(error='Failed to fetch dataset status', status_code=500)
+
+@admin_bp.route('/reload', methods=['POST'])
+@swag_from({
+    'tags': ['Admin'],
+    'description': 'Rebuild the dataset snapshot in the background and swap it in (HTTP basic auth)',
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': False,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'ingest': {'type': 'boolean', 'description': 'Merge new rows from the raw Eurostat files first'},
+                    'wait': {'type': 'boolean', 'description': 'Respond after the swap instead of immediately'}
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {'description': 'Reload finished (wait=true)'},
+        202: {'description': 'Reload started'},
+        401: {'description': 'Missing or invalid admin credentials'},
+        409: {'description': 'A reload is already running'},
+        503: {'description': 'ADMIN_PASSWORD is not configured'}
+    }
+})
+@require_admin
+def reload_dataset():
+    try:
+        registry = current_app.extensions['services']
+        payload = request.get_json(silent=True) or {}
+        ingest = bool(payload.get('ingest', False))
+        
+        if payload.get('wait'):
+            registry.reload(ingest=ingest)
+            return format_response(data=dataset_status(registry))
+        
+        if not registry.reload_async(ingest=ingest):
+            return format_response(error='Reload already running', status_code=409)
+        
+        return format_response(data={'reloading': True}, message='Reload started', status_code=202)
+    except Exception as e:
+        logger.error(f"Error reloading dataset: {str(e)}")
+        return format_response(error='Failed to reload dataset', status_code=500)
@@ -1,8 +1,16 @@
 from flask import Blueprint, request
 from flasgger import swag_from
-from services.analytics_service import analytics_service
+from marshmallow import ValidationError
+from services import get_analytics_service
+from services.batch_service import BatchService
+from services.rolling_window import MAX_WINDOW
+from services.distribution import MAX_BINS
+from services.similarity import MAX_K, METHODS as SIMILARITY_METHODS
 from middleware.auth_middleware import require_api_key
+from middleware.response_cache import cached_response
 from utils.helpers import format_response
+from utils import query
+from utils.validators import BatchRequestSchema, BATCH_QUERY_TYPES
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -24,13 +32,18 @@ analytics_bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
     }
 })
 @require_api_key
+@cached_response(
+    country_codes=query.country_list,
+    start_year=query.start_year,
+    end_year=query.end_year
+)
 def get_trends():
     try:
         countries = request.args.getlist('country_codes')
         start_year = request.args.get('start_year', type=int)
         end_year = request.args.get('end_year', type=int)
         
-        trends = analytics_service.get_trend_analysis(
+        trends = get_analytics_service().get_trend_analysis(
             countries if countries else None,
             start_year,
             end_year
@@ -60,6 +73,11 @@ def get_trends():
     }
 })
 @require_api_key
+@cached_response(
+    country_codes=query.country_list,
+    start_year=query.start_year,
+    end_year=query.end_year
+)
 def get_comparison():
     try:
         countries = request.args.getlist('country_codes')
@@ -70,7 +88,7 @@ def get_comparison():
         start_year = request.args.get('start_year', type=int)
         end_year = request.args.get('end_year', type=int)
         
-        comparison = analytics_service.get_country_comparison(
+        comparison = get_analytics_service().get_country_comparison(
             countries,
             start_year,
             end_year
@@ -92,22 +110,44 @@ def get_comparison():
     'parameters': [
         {'name': 'metric', 'in': 'query', 'type': 'string', 'enum': ['immigration', 'emigration', 'net'], 'default': 'net'},
         {'name': 'limit', 'in': 'query', 'type': 'integer', 'default': 10},
-        {'name': 'year', 'in': 'query', 'type': 'integer'}
+        {'name': 'year', 'in': 'query', 'type': 'integer'},
+        {'name': 'order', 'in': 'query', 'type': 'string', 'enum': ['desc', 'asc'], 'default': 'desc',
+         'description': 'asc returns the bottom countries'},
+        {'name': 'offset', 'in': 'query', 'type': 'integer', 'default': 0, 'description': 'Number of ranks to skip'}
     ],
     'responses': {
-        200: {'description': 'Top countries data'}
+        200: {'description': 'Top countries data'},
+        400: {'description': 'Invalid order'}
     }
 })
 @require_api_key
+@cached_response(
+    metric=query.string('net'),
+    limit=query.clamped_int(10, 50),
+    year=query.integer(),
+    order=query.string('desc'),
+    offset=query.bounded_int(0, 0, 2 ** 31)
+)
 def get_top_countries():
     try:
         metric = request.args.get('metric', 'net')
         limit = min(request.args.get('limit', 10, type=int), 50)
         year = request.args.get('year', type=int)
+        order = request.args.get('order', 'desc')
+        offset = max(request.args.get('offset', 0, type=int), 0)
         
-        top = analytics_service.get_top_countries(metric, limit, year)
+        if order not in ('desc', 'asc'):
+            return format_response(error="order must be 'desc' or 'asc'", status_code=400)
         
-        return format_response(data={'top_countries': top, 'metric': metric, 'limit': limit})
+        top = get_analytics_service().top_countries_frame(metric, limit, year, order, offset)
+        
+        return format_response(data={
+            'top_countries': top,
+            'metric': metric,
+            'limit': limit,
+            'order': order,
+            'offset': offset
+        })
     except Exception as e:
         logger.error(f"Error fetching top countries: {str(e)}")
         return format_response(error='Failed to fetch top countries', status_code=500)
@@ -127,13 +167,18 @@ def get_top_countries():
     }
 })
 @require_api_key
+@cached_response(
+    country_codes=query.country_list,
+    start_year=query.start_year,
+    end_year=query.end_year
+)
 def get_balance():
     try:
         countries = request.args.getlist('country_codes')
         start_year = request.args.get('start_year', type=int)
         end_year = request.args.get('end_year', type=int)
         
-        balance = analytics_service.get_migration_balance(
+        balance = get_analytics_service().get_migration_balance(
             countries if countries else None,
             start_year,
             end_year
@@ -153,37 +198,185 @@ def get_balance():
     'security': [{'ApiKeyAuth': []}],
     'description': 'Get year-over-year growth rates',
     'parameters': [
-        {'name': 'country_code', 'in': 'query', 'type': 'string'}
+        {'name': 'country_code', 'in': 'query', 'type': 'string'},
+        {'name': 'by_country', 'in': 'query', 'type': 'boolean', 'default': False,
+         'description': 'One series per country (all countries unless country_codes is given)'},
+        {'name': 'country_codes', 'in': 'query', 'type': 'array', 'items': {'type': 'string'}}
     ],
     'responses': {
         200: {'description': 'Growth rate data'}
     }
 })
 @require_api_key
+@cached_response(
+    country_code=query.string(),
+    by_country=query.boolean(),
+    country_codes=query.country_list
+)
 def get_growth():
     try:
+        if request.args.get('by_country', False, type=query.parse_bool):
+            countries = request.args.getlist('country_codes')
+            growth = get_analytics_service().get_growth_by_country(countries if countries else None)
+            return format_response(data={'growth': growth})
+        
         country = request.args.get('country_code')
         
-        growth = analytics_service.get_yearly_growth(country)
+        growth = get_analytics_service().yearly_growth_frame(country)
         
         return format_response(data={'growth': growth})
     except Exception as e:
         logger.error(f"Error fetching growth: {str(e)}")
         return format_response(error='Failed to fetch growth', status_code=500)
 
+@analytics_bp.route('/rolling', methods=['GET'])
+@swag_from({
+    'tags': ['Analytics'],
+    'security': [{'ApiKeyAuth': []}],
+    'description': 'Rolling sum, mean, std and exponentially weighted mean per country',
+    'parameters': [
+        {'name': 'country_codes', 'in': 'query', 'type': 'array', 'items': {'type': 'string'}},
+        {'name': 'start_year', 'in': 'query', 'type': 'integer'},
+        {'name': 'end_year', 'in': 'query', 'type': 'integer'},
+        {'name': 'metric', 'in': 'query', 'type': 'string', 'enum': ['immigration', 'emigration', 'net'], 'default': 'net'},
+        {'name': 'window', 'in': 'query', 'type': 'integer', 'default': 3, 'description': 'Window length in years (max 50)'},
+        {'name': 'span', 'in': 'query', 'type': 'integer', 'description': 'EWMA span in years, defaults to window'}
+    ],
+    'responses': {
+        200: {'description': 'One columnar series per country'},
+        404: {'description': 'No data found'}
+    }
+})
+@require_api_key
+@cached_response(
+    country_codes=query.country_list,
+    start_year=query.start_year,
+    end_year=query.end_year,
+    metric=query.string('net'),
+    window=query.bounded_int(3, 1, MAX_WINDOW),
+    span=query.integer()
+)
+def get_rolling():
+    try:
+        countries = request.args.getlist('country_codes')
+        start_year = request.args.get('start_year', type=int)
+        end_year = request.args.get('end_year', type=int)
+        metric = request.args.get('metric', 'net')
+        window = min(max(request.args.get('window', 3, type=int), 1), MAX_WINDOW)
+        span = request.args.get('span', type=int)
+        
+        if span is not None and span < 1:
+            return format_response(error='span must be at least 1', status_code=400)
+        
+        rolling = get_analytics_service().get_rolling_stats(
+            countries if countries else None,
+            start_year,
+            end_year,
+            metric,
+            window,
+            span
+        )
+        
+        if not rolling:
+            return format_response(error='No data found', status_code=404)
+        
+        return format_response(data={'rolling': rolling, 'metric': metric, 'window': window, 'span': span or window})
+    except Exception as e:
+        logger.error(f"Error fetching rolling stats: {str(e)}")
+        return format_response(error='Failed to fetch rolling stats', status_code=500)
+
+@analytics_bp.route('/similarity', methods=['GET'])
+@swag_from({
+    'tags': ['Analytics'],
+    'security': [{'ApiKeyAuth': []}],
+    'description': 'Countries with the most similar migration trajectories',
+    'parameters': [
+        {'name': 'metric', 'in': 'query', 'type': 'string', 'enum': ['immigration', 'emigration', 'net'], 'default': 'net'},
+        {'name': 'method', 'in': 'query', 'type': 'string', 'enum': list(SIMILARITY_METHODS), 'default': 'pearson',
+         'description': 'pearson: correlation of the year series, euclidean: distance between z-scored series'},
+        {'name': 'k', 'in': 'query', 'type': 'integer', 'default': 5, 'description': f'Neighbours per country (max {MAX_K})'},
+        {'name': 'country_codes', 'in': 'query', 'type': 'array', 'items': {'type': 'string'},
+         'description': 'Only return neighbours for these countries'}
+    ],
+    'responses': {
+        200: {'description': 'k nearest countries per country, best first'},
+        400: {'description': 'Invalid method'},
+        404: {'description': 'No data found'}
+    }
+})
+@require_api_key
+@cached_response(
+    metric=query.string('net'),
+    method=query.string('pearson'),
+    k=query.bounded_int(5, 1, MAX_K),
+    country_codes=query.country_list
+)
+def get_similarity():
+    try:
+        metric = request.args.get('metric', 'net')
+        method = request.args.get('method', 'pearson')
+        k = min(max(request.args.get('k', 5, type=int), 1), MAX_K)
+        countries = request.args.getlist('country_codes')
+        
+        if method not in SIMILARITY_METHODS:
+            return format_response(error=f"method must be one of {', '.join(SIMILARITY_METHODS)}", status_code=400)
+        
+        similarity = get_analytics_service().get_similar_countries(
+            metric,
+            method,
+            k,
+            countries if countries else None
+        )
+        
+        if not similarity:
+            return format_response(error='No data found', status_code=404)
+        
+        return format_response(data={'similarity': similarity, 'metric': metric, 'method': method, 'k': k})
+    except Exception as e:
+        logger.error(f"Error fetching similarity: {str(e)}")
+        return format_response(error='Failed to fetch similarity', status_code=500)
+
 @analytics_bp.route('/correlation', methods=['GET'])
 @swag_from({
     'tags': ['Analytics'],
     'security': [{'ApiKeyAuth': []}],
     'description': 'Get correlation analysis',
+    'parameters': [
+        {'name': 'country_codes', 'in': 'query', 'type': 'array', 'items': {'type': 'string'}},
+        {'name': 'start_year', 'in': 'query', 'type': 'integer'},
+        {'name': 'end_year', 'in': 'query', 'type': 'integer'},
+        {'name': 'by_country', 'in': 'query', 'type': 'boolean', 'default': False,
+         'description': 'One matrix per country instead of one for the whole selection'}
+    ],
     'responses': {
-        200: {'description': 'Correlation data'}
+        200: {'description': 'Correlation data'},
+        404: {'description': 'No data found'}
     }
 })
 @require_api_key
+@cached_response(
+    country_codes=query.country_list,
+    start_year=query.start_year,
+    end_year=query.end_year,
+    by_country=query.boolean()
+)
 def get_correlation():
     try:
-        correlation = analytics_service.get_correlation_analysis()
+        countries = request.args.getlist('country_codes')
+        start_year = request.args.get('start_year', type=int)
+        end_year = request.args.get('end_year', type=int)
+        by_country = request.args.get('by_country', False, type=query.parse_bool)
+        
+        correlation = get_analytics_service().get_correlation_analysis(
+            countries if countries else None,
+            start_year,
+            end_year,
+            by_country
+        )
+        
+        if not correlation:
+            return format_response(error='No data found', status_code=404)
+        
         return format_response(data={'correlation': correlation})
     except Exception as e:
         logger.error(f"Error fetching correlation: {str(e)}")
@@ -195,18 +388,105 @@ def get_correlation():
     'security': [{'ApiKeyAuth': []}],
     'description': 'Get distribution statistics',
     'parameters': [
-        {'name': 'metric', 'in': 'query', 'type': 'string', 'enum': ['immigration', 'emigration', 'net'], 'default': 'net'}
+        {'name': 'metric', 'in': 'query', 'type': 'string', 'enum': ['immigration', 'emigration', 'net'], 'default': 'net'},
+        {'name': 'country_codes', 'in': 'query', 'type': 'array', 'items': {'type': 'string'}},
+        {'name': 'start_year', 'in': 'query', 'type': 'integer'},
+        {'name': 'end_year', 'in': 'query', 'type': 'integer'},
+        {'name': 'bins', 'in': 'query', 'type': 'integer', 'description': f'Histogram bins (max {MAX_BINS})'}
     ],
     'responses': {
-        200: {'description': 'Distribution statistics'}
+        200: {'description': 'Distribution statistics'},
+        404: {'description': 'No data found'}
     }
 })
 @require_api_key
+@cached_response(
+    metric=query.string('net'),
+    country_codes=query.country_list,
+    start_year=query.start_year,
+    end_year=query.end_year,
+    bins=query.bounded_int(0, 0, MAX_BINS)
+)
 def get_distribution():
     try:
         metric = request.args.get('metric', 'net')
-        stats = analytics_service.get_distribution_stats(metric)
+        countries = request.args.getlist('country_codes')
+        start_year = request.args.get('start_year', type=int)
+        end_year = request.args.get('end_year', type=int)
+        bins = min(max(request.args.get('bins', 0, type=int), 0), MAX_BINS)
+        
+        stats = get_analytics_service().get_distribution_stats(
+            metric,
+            countries if countries else None,
+            start_year,
+            end_year,
+            bins or None
+        )
+        
+        if not stats:
+            return format_response(error='No data found', status_code=404)
+        
         return format_response(data={'distribution': stats, 'metric': metric})
     except Exception as e:
         logger.error(f"Error fetching distribution: {str(e)}")
-        return format_response(error='Failed to fetch distribution', status_code=500)
\ No newline at end of file
+        return format_response(error='Failed to fetch distribution', status_code=500)
+
+@analytics_bp.route('/batch', methods=['POST'])
+@swag_from({
+    'tags': ['Analytics'],
+    'security': [{'ApiKeyAuth': []}],
+    'description': 'Run several analytics queries in one request. Each query takes a type and the '
+                   'parameters of the matching GET endpoint; sub-queries sharing a filter reuse it.',
+    'parameters': [
+        {
+            'name': 'body', 'in': 'body', 'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'queries': {
+                        'type': 'array',
+                        'maxItems': 20,
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'id': {'type': 'string'},
+                                'type': {'type': 'string', 'enum': BATCH_QUERY_TYPES},
+                                'country_codes': {'type': 'array', 'items': {'type': 'string'}},
+                                'country_code': {'type': 'string'},
+                                'start_year': {'type': 'integer'},
+                                'end_year': {'type': 'integer'},
+                                'year': {'type': 'integer'},
+                                'metric': {'type': 'string', 'enum': ['immigration', 'emigration', 'net']},
+                                'limit': {'type': 'integer', 'description': 'top only, max 50'},
+                                'order': {'type': 'string', 'enum': ['desc', 'asc'], 'description': 'top only'},
+                                'offset': {'type': 'integer', 'description': 'top only'},
+                                'bins': {'type': 'integer', 'description': f'distribution only, max {MAX_BINS}'},
+                                'by_country': {'type': 'boolean', 'description': 'growth and correlation'},
+                                'window': {'type': 'integer', 'description': f'rolling only, max {MAX_WINDOW}'},
+                                'span': {'type': 'integer', 'description': 'rolling only, defaults to window'},
+                                'method': {'type': 'string', 'enum': list(SIMILARITY_METHODS),
+                                           'description': 'similarity only'},
+                                'k': {'type': 'integer', 'description': f'similarity only, max {MAX_K}'}
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {'description': 'One result per query, each with its own status'},
+        400: {'description': 'Malformed batch'}
+    }
+})
+@require_api_key
+def run_batch():
+    try:
+        payload = BatchRequestSchema().load(request.get_json(silent=True) or {})
+        results = BatchService(get_analytics_service()).run(payload['queries'])
+        return format_response(data={'results': results})
+    except ValidationError:
+        raise
+    except Exception as e:
+        logger.error(f"Error running batch: {str(e)}")
+        return format_response(error='Failed to run batch', status_code=500)
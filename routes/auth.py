@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, render_template
 from services.auth_service import AuthService
 from db.firebase_config import verify_firebase_token
+from middleware.auth_middleware import FIREBASE_TOKEN
 from functools import wraps
 
 auth_bp = Blueprint('auth', __name__)
@@ -12,8 +13,12 @@ def require_firebase_auth(f):
         if not auth_header or not auth_header.startswith('Bearer '):
             return jsonify({'error': 'Missing or invalid authorization header'}), 401
         
-        id_token = auth_header.split('Bearer ')[1]
-        decoded_token = verify_firebase_token(id_token)
+        if FIREBASE_TOKEN in request.environ:
+            # already verified off the request pool by the ASGI entry point
+            decoded_token = request.environ[FIREBASE_TOKEN]
+        else:
+            id_token = auth_header.split('Bearer ')[1]
+            decoded_token = verify_firebase_token(id_token)
         
         if not decoded_token:
             return jsonify({'error': 'Invalid token'}), 401
@@ -1,6 +1,6 @@
 from flask import Blueprint
 from flasgger import swag_from
-from services.data_service import data_service
+from services import get_snapshot
 from utils.helpers import format_response, get_version
 from utils.logger import get_logger
 
@@ -20,7 +20,8 @@ health_bp = Blueprint('health', __name__)
                 'properties': {
                     'status': {'type': 'string'},
                     'version': {'type': 'string'},
-                    'dataset': {'type': 'boolean'}
+                    'dataset': {'type': 'boolean'},
+                    'snapshot': {'type': 'object'}
                 }
             }
         }
@@ -29,9 +30,11 @@ health_bp = Blueprint('health', __name__)
 def health_check():
     try:
         dataset_healthy = False
+        snapshot = None
         try:
-            df = data_service.get_all_data()
+            df = get_snapshot().data.get_all_data()
             dataset_healthy = df is not None and not df.empty
+            snapshot = get_snapshot().describe()
         except Exception:
             pass
         
@@ -40,7 +43,8 @@ def health_check():
         return format_response(data={
             'status': status,
             'version': get_version(),
-            'dataset': dataset_healthy
+            'dataset': dataset_healthy,
+            'snapshot': snapshot
         })
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
@@ -1,8 +1,12 @@
-from flask import Blueprint, request
+from flask import Blueprint, request, current_app
 from flasgger import swag_from
-from services.data_service import data_service
+from services import get_data_service
 from middleware.auth_middleware import require_api_key
-from utils.helpers import paginate_data, format_response
+from middleware.response_cache import cached_response
+from utils.helpers import (
+    paginate_data, format_response, stream_records, encode_cursor, decode_cursor, STREAM_MIMETYPES
+)
+from utils import query
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -21,14 +25,35 @@ migration_bp = Blueprint('migration', __name__, url_prefix='/api/migration')
         {'name': 'end_year', 'in': 'query', 'type': 'integer', 'description': 'End year'},
         {'name': 'year', 'in': 'query', 'type': 'integer', 'description': 'Specific year'},
         {'name': 'page', 'in': 'query', 'type': 'integer', 'default': 1, 'description': 'Page number'},
-        {'name': 'per_page', 'in': 'query', 'type': 'integer', 'default': 100, 'description': 'Items per page'}
+        {'name': 'per_page', 'in': 'query', 'type': 'integer', 'default': 100, 'description': 'Items per page'},
+        {'name': 'format', 'in': 'query', 'type': 'string', 'enum': ['json', 'ndjson', 'csv'], 'default': 'json',
+         'description': 'ndjson and csv stream the full filtered result, ignoring pagination'},
+        {'name': 'pagination', 'in': 'query', 'type': 'string', 'enum': ['offset', 'cursor'], 'default': 'offset',
+         'description': 'cursor starts keyset pagination, follow next_cursor for further pages'},
+        {'name': 'cursor', 'in': 'query', 'type': 'string',
+         'description': 'Opaque next_cursor from the previous page, it carries the original filters'},
+        {'name': 'include_total', 'in': 'query', 'type': 'boolean', 'default': False,
+         'description': 'Add total and pages to cursor pagination'}
     ],
     'responses': {
         200: {'description': 'Successful response with migration data'},
+        400: {'description': 'Unsupported format, per_page below 1 or invalid cursor'},
         401: {'description': 'Unauthorized'}
     }
 })
 @require_api_key
+@cached_response(
+    country_codes=query.country_list,
+    start_year=query.start_year,
+    end_year=query.end_year,
+    year=query.integer(),
+    page=query.integer(1),
+    per_page=query.clamped_int(100, 1000),
+    format=query.string('json'),
+    pagination=query.string('offset'),
+    cursor=query.string(),
+    include_total=query.string('false')
+)
 def get_migration_data():
     try:
         country_codes = request.args.getlist('country_codes')
@@ -37,8 +62,36 @@ def get_migration_data():
         year = request.args.get('year', type=int)
         page = request.args.get('page', 1, type=int)
         per_page = min(request.args.get('per_page', 100, type=int), 1000)
+        export_format = request.args.get('format', 'json')
         
-        filtered_df = data_service.filter_data(
+        if export_format != 'json':
+            if export_format not in STREAM_MIMETYPES:
+                return format_response(error='Unsupported format', status_code=400)
+            
+            data_service = get_data_service()
+            positions = data_service.filter_positions(
+                countries=country_codes if country_codes else None,
+                start_year=start_year,
+                end_year=end_year,
+                year=year
+            )
+            chunks = data_service.iter_chunks(positions, current_app.config['STREAM_CHUNK_SIZE'])
+            return stream_records(chunks, export_format)
+        
+        if per_page < 1:
+            return format_response(error='per_page must be at least 1', status_code=400)
+        
+        cursor = request.args.get('cursor')
+        if cursor or request.args.get('pagination') == 'cursor':
+            filters = {
+                'countries': sorted(set(country_codes)) or None,
+                'start_year': start_year,
+                'end_year': end_year,
+                'year': year
+            }
+            return get_keyset_page(filters, cursor, per_page)
+        
+        filtered_df = get_data_service().filter_data(
             countries=country_codes if country_codes else None,
             start_year=start_year,
             end_year=end_year,
@@ -59,6 +112,30 @@ def get_migration_data():
         logger.error(f"Error fetching migration data: {str(e)}")
         return format_response(error='Failed to fetch data', status_code=500)
 
+def get_keyset_page(filters, cursor, per_page):
+    after_key = None
+    if cursor:
+        try:
+            state = decode_cursor(cursor)
+        except ValueError as e:
+            return format_response(error=str(e), status_code=400)
+        filters, after_key = state['filters'], state['after']
+    
+    data_service = get_data_service()
+    page, next_key = data_service.get_page_after(after_key, per_page, **filters)
+    
+    pagination = {
+        'per_page': per_page,
+        'next_cursor': encode_cursor({'filters': filters, 'after': next_key}) if next_key else None
+    }
+    
+    if request.args.get('include_total', 'false').lower() == 'true':
+        total = data_service.count(**filters)
+        pagination['total'] = total
+        pagination['pages'] = (total + per_page - 1) // per_page
+    
+    return format_response(data={'items': page, 'pagination': pagination})
+
 @migration_bp.route('/countries', methods=['GET'])
 @swag_from({
     'tags': ['Migration Data'],
@@ -77,9 +154,10 @@ def get_migration_data():
     }
 })
 @require_api_key
+@cached_response()
 def get_countries():
     try:
-        countries = data_service.get_available_countries()
+        countries = get_data_service().get_available_countries()
         return format_response(data={'countries': countries, 'count': len(countries)})
     except Exception as e:
         logger.error(f"Error fetching countries: {str(e)}")
@@ -103,9 +181,10 @@ def get_countries():
     }
 })
 @require_api_key
+@cached_response()
 def get_years():
     try:
-        years = data_service.get_available_years()
+        years = get_data_service().get_available_years()
         return format_response(data={'years': years, 'count': len(years)})
     except Exception as e:
         logger.error(f"Error fetching years: {str(e)}")
@@ -125,9 +204,10 @@ def get_years():
     }
 })
 @require_api_key
+@cached_response()
 def get_country_summary(country_code):
     try:
-        summary = data_service.get_country_summary(country_code.upper())
+        summary = get_data_service().get_country_summary(country_code.upper())
         
         if not summary:
             return format_response(error='Country not found', status_code=404)
@@ -151,9 +231,10 @@ def get_country_summary(country_code):
     }
 })
 @require_api_key
+@cached_response()
 def get_year_summary(year):
     try:
-        summary = data_service.get_year_summary(year)
+        summary = get_data_service().get_year_summary(year)
         
         if not summary:
             return format_response(error='Year not found', status_code=404)
@@ -173,9 +254,10 @@ def get_year_summary(year):
     }
 })
 @require_api_key
+@cached_response()
 def get_statistics():
     try:
-        stats = data_service.get_statistics()
+        stats = get_data_service().get_statistics()
         return format_response(data=stats)
     except Exception as e:
         logger.error(f"Error fetching statistics: {str(e)}")
@@ -1 +1,241 @@
 """Services module initialization"""
+import copy
+import os
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+from flask import current_app
+from config import Config
+from utils.helpers import request_memos
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+#* every live registry, so one fork hook can reset them all without keeping any alive
+_registries = weakref.WeakSet()
+
+
+class ServiceSnapshot:
+    #* one dataset generation with its derived services, never modified after creation
+    
+    def __init__(self, data_service, load_seconds):
+        from services.analytics_service import AnalyticsService
+        self.data = data_service
+        self.analytics = AnalyticsService(data_service)
+        self.load_seconds = load_seconds
+        self.loaded_at = datetime.now(timezone.utc)
+    
+    @property
+    def version(self):
+        return self.data.version
+    
+    def describe(self):
+        return {
+            'version': self.version,
+            'loaded_at': self.loaded_at.isoformat(),
+            'load_seconds': round(self.load_seconds, 3),
+            'records': len(self.data.df)
+        }
+
+
+class ServiceRegistry:
+    #* per-app service container, nothing is loaded until first use or preload()
+    #* reloads build a new snapshot off to the side and swap a single reference,
+    #* readers never lock once the first snapshot exists
+    
+    def __init__(self, data_service=None, watch_interval=0):
+        self._snapshot = ServiceSnapshot(data_service, 0.0) if data_service is not None else None
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+        self._source_stamp = self._stamp()
+        self.watch_interval = watch_interval
+        self.last_reload = None
+        self._watcher = None
+        self._stop = threading.Event()
+    
+    @property
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._build(self._load)
+                snapshot = self._snapshot
+        return snapshot
+    
+    @property
+    def data(self):
+        return self.snapshot.data
+    
+    @property
+    def analytics(self):
+        return self.snapshot.analytics
+    
+    @property
+    def reloading(self):
+        return self._reload_lock.locked()
+    
+    def preload(self):
+        #* run in the gunicorn master so forked workers share the dataset copy-on-write
+        return self.snapshot
+    
+    @staticmethod
+    def _load():
+        from services.data_service import DataService
+        return DataService()
+    
+    def _build(self, load):
+        stamp = self._stamp()
+        started = time.perf_counter()
+        data_service = load()
+        snapshot = ServiceSnapshot(data_service, time.perf_counter() - started)
+        self._source_stamp = stamp
+        return snapshot
+    
+    def reload(self, ingest=False, broadcast=True):
+        #* in-flight requests keep the snapshot they started with
+        #* broadcast bumps DATASET_RELOAD_STAMP so the watchers of every other process reload too
+        with self._reload_lock:
+            previous = self._snapshot
+            summary = None
+            
+            if ingest:
+                # the delta is against the files on disk, so a snapshot older than them is reloaded first
+                current = previous is not None and self._stamp() == self._source_stamp
+                
+                def load():
+                    nonlocal summary
+                    # shallow copy, ingest replaces attributes instead of mutating them
+                    data_service = copy.copy(previous.data) if current else self._load()
+                    summary = data_service.ingest()
+                    return data_service
+            else:
+                load = self._load
+            
+            try:
+                snapshot = self._build(load)
+            except Exception as e:
+                logger.error(f"Dataset reload failed: {str(e)}")
+                self.last_reload = {'status': 'failed', 'error': str(e)}
+                raise
+            
+            if broadcast:
+                self._broadcast(snapshot.version)
+            if summary is not None or broadcast:
+                # our own writes to the processed CSV and the stamp are not changes to pick up
+                self._source_stamp = self._stamp()
+            self._snapshot = snapshot
+            self.last_reload = {'status': 'ok', **snapshot.describe()}
+            if summary is not None:
+                self.last_reload['ingest'] = summary
+            
+            logger.info(
+                f"Dataset snapshot {previous.version if previous else None} -> {snapshot.version} "
+                f"loaded in {snapshot.load_seconds:.3f}s"
+            )
+            return snapshot
+    
+    def reload_async(self, ingest=False):
+        #* False when a reload is already running
+        if self.reloading:
+            return False
+        
+        def run():
+            try:
+                self.reload(ingest=ingest)
+            except Exception:
+                pass
+        
+        threading.Thread(target=run, name='dataset-reload', daemon=True).start()
+        return True
+    
+    @staticmethod
+    def _stamp():
+        #* processed CSV and reload stamp, a change in either means another process has new data
+        stamps = []
+        for path in (Config.DATASET_PROCESSED, Config.DATASET_RELOAD_STAMP):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stamps.append(None)
+                continue
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(stamps)
+    
+    @staticmethod
+    def _broadcast(version):
+        try:
+            tmp_path = f'{Config.DATASET_RELOAD_STAMP}.tmp-{os.getpid()}'
+            with open(tmp_path, 'w') as f:
+                f.write(f'{version} {os.getpid()} {time.time_ns()}\n')
+            os.replace(tmp_path, Config.DATASET_RELOAD_STAMP)
+        except OSError as e:
+            logger.warning(f"Could not broadcast dataset reload: {str(e)}")
+    
+    def start_watcher(self):
+        #* poll the processed CSV and the reload stamp, a change triggers a background reload
+        #* without a watcher, reloads and ingests in other processes are only seen after a restart
+        if self.watch_interval <= 0 or (self._watcher and self._watcher.is_alive()):
+            return
+        
+        self._stop = threading.Event()
+        self._watcher = threading.Thread(target=self._watch, name='dataset-watcher', daemon=True)
+        self._watcher.start()
+    
+    def stop_watcher(self):
+        self._stop.set()
+    
+    def _watch(self):
+        while not self._stop.wait(self.watch_interval):
+            if self._snapshot is None or self.reloading or self._stamp() == self._source_stamp:
+                continue
+            logger.info(f"{Config.DATASET_PROCESSED} or {Config.DATASET_RELOAD_STAMP} changed, reloading dataset")
+            try:
+                self.reload(broadcast=False)
+            except Exception:
+                # keep serving the old snapshot, retry on the next change
+                self._source_stamp = self._stamp()
+    
+    def _after_fork(self):
+        # threads and held locks do not survive fork, the serving process restarts the watcher itself
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+
+
+def _reset_after_fork():
+    for registry in list(_registries):
+        registry._after_fork()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def init_services(app, data_service=None):
+    #* the watcher is not started here: the gunicorn master, the CLI and tests never serve requests,
+    #* serving processes call start_watcher() (gunicorn.conf.py post_worker_init, app.py, asgi.py)
+    registry = ServiceRegistry(data_service, app.config.get('DATASET_WATCH_INTERVAL', 0))
+    _registries.add(registry)
+    app.extensions['services'] = registry
+    
+    if app.config.get('PRELOAD_DATASET'):
+        registry.preload()
+    
+    return registry
+
+
+def get_snapshot():
+    #* pinned per request so one request never mixes two dataset generations
+    memos = request_memos()
+    if 'services_snapshot' not in memos:
+        memos['services_snapshot'] = current_app.extensions['services'].snapshot
+    return memos['services_snapshot']
+
+
+def get_data_service():
+    return get_snapshot().data
+
+
+def get_analytics_service():
+    return get_snapshot().analytics
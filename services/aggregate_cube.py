@@ -0,0 +1,120 @@
+TOP_N = 5
+
+
+class AggregateCube:
+    #* country and year aggregates computed once per loaded dataset
+    
+    def __init__(self, df, top_n=TOP_N):
+        self.top_n = top_n
+        self.country_summaries = self._build_country_summaries(df)
+        self.year_summaries = self._build_year_summaries(df)
+        self.statistics = self._build_statistics(df)
+    
+    def updated(self, countries, years, country_rows, year_rows, total_records):
+        #* copy with only the given countries and years re-aggregated, readers of self are untouched
+        #* country_rows / year_rows hold every current row of those countries / years
+        cube = AggregateCube.__new__(AggregateCube)
+        cube.top_n = self.top_n
+        
+        countries, years = set(countries), set(years)
+        cube.country_summaries = {c: s for c, s in self.country_summaries.items() if c not in countries}
+        cube.country_summaries.update(self._build_country_summaries(country_rows))
+        cube.country_summaries = dict(sorted(cube.country_summaries.items()))
+        
+        cube.year_summaries = {y: s for y, s in self.year_summaries.items() if y not in years}
+        cube.year_summaries.update(self._build_year_summaries(year_rows))
+        cube.year_summaries = dict(sorted(cube.year_summaries.items()))
+        
+        cube.statistics = cube._statistics_from_summaries(total_records)
+        return cube
+    
+    def _build_country_summaries(self, df):
+        grouped = df.groupby('Country', sort=True).agg(
+            year_min=('Year', 'min'),
+            year_max=('Year', 'max'),
+            im_sum=('Im_Value', 'sum'),
+            em_sum=('Em_Value', 'sum'),
+            net_sum=('Net_Migration', 'sum'),
+            im_mean=('Im_Value', 'mean'),
+            em_mean=('Em_Value', 'mean'),
+            net_mean=('Net_Migration', 'mean')
+        )
+        
+        return {
+            country: {
+                'country': country,
+                'years_available': [year_min, year_max],
+                'total_immigration': im_sum,
+                'total_emigration': em_sum,
+                'total_net_migration': net_sum,
+                'avg_immigration': im_mean,
+                'avg_emigration': em_mean,
+                'avg_net_migration': net_mean
+            }
+            for country, year_min, year_max, im_sum, em_sum, net_sum, im_mean, em_mean, net_mean in zip(
+                grouped.index.tolist(), *(grouped[c].tolist() for c in grouped.columns)
+            )
+        }
+    
+    def _build_year_summaries(self, df):
+        grouped = df.groupby('Year', sort=True).agg(
+            count=('Country', 'size'),
+            im_sum=('Im_Value', 'sum'),
+            em_sum=('Em_Value', 'sum'),
+            net_sum=('Net_Migration', 'sum')
+        )
+        top_immigration = self._top_by_year(df, 'Im_Value')
+        top_emigration = self._top_by_year(df, 'Em_Value')
+        
+        return {
+            year: {
+                'year': year,
+                'countries_count': count,
+                'total_immigration': im_sum,
+                'total_emigration': em_sum,
+                'total_net_migration': net_sum,
+                'top_immigration': top_immigration.get(year, []),
+                'top_emigration': top_emigration.get(year, [])
+            }
+            for year, count, im_sum, em_sum, net_sum in zip(
+                grouped.index.tolist(), *(grouped[c].tolist() for c in grouped.columns)
+            )
+        }
+    
+    def _top_by_year(self, df, column):
+        #* stable sort keeps nlargest(keep='first') tie order
+        ranked = df.sort_values(['Year', column], ascending=[True, False], kind='mergesort')
+        top = ranked.groupby('Year', sort=True).head(self.top_n)
+        
+        result = {}
+        for year, country, value in zip(top['Year'].tolist(), top['Country'].tolist(), top[column].tolist()):
+            result.setdefault(year, []).append({'Country': country, column: value})
+        return result
+    
+    def _statistics_from_summaries(self, total_records):
+        #* same figures as _build_statistics, summed over the per-year totals instead of the rows
+        if not total_records:
+            return None
+        
+        years = self.year_summaries.values()
+        return {
+            'total_records': total_records,
+            'countries_count': len(self.country_summaries),
+            'years_range': [int(min(self.year_summaries)), int(max(self.year_summaries))],
+            'total_immigration': int(sum(s['total_immigration'] for s in years)),
+            'total_emigration': int(sum(s['total_emigration'] for s in years)),
+            'total_net_migration': int(sum(s['total_net_migration'] for s in years))
+        }
+    
+    def _build_statistics(self, df):
+        if df.empty:
+            return None
+        
+        return {
+            'total_records': len(df),
+            'countries_count': int(df['Country'].nunique()),
+            'years_range': [int(df['Year'].min()), int(df['Year'].max())],
+            'total_immigration': int(df['Im_Value'].sum()),
+            'total_emigration': int(df['Em_Value'].sum()),
+            'total_net_migration': int(df['Net_Migration'].sum())
+        }
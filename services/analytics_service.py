@@ -1,15 +1,61 @@
+import copy
+import numpy as np
 import pandas as pd
-from services.data_service import data_service
+from services.distribution import GroupSketches, SKETCH_MIN_ROWS, describe
+from services.filter_index import YEAR_BITS, YEAR_MASK
+from services.range_index import METRICS, PAIRS
+from services.rank_table import RankTable
+from services.rolling_window import RollingWindow
+from services.similarity import SimilarityIndex
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+METRIC_COLUMNS = {
+    'immigration': 'Im_Value',
+    'emigration': 'Em_Value',
+    'net': 'Net_Migration'
+}
+
+GROWTH_COLUMNS = {
+    'Im_Value': 'Im_Growth',
+    'Em_Value': 'Em_Growth',
+    'Net_Migration': 'Net_Growth'
+}
+
 class AnalyticsService:
     
-    def __init__(self):
+    def __init__(self, data_service):
         self.data_service = data_service
+        self._precomputed = {}
+    
+    def _per_version(self, name, build):
+        #* unfiltered results computed once per dataset version
+        key = (name, self.data_service.version)
+        result = self._precomputed.get(key)
+        if result is None:
+            result = build()
+            # entries of earlier versions are dropped
+            precomputed = {k: v for k, v in self._precomputed.items() if k[1] == key[1]}
+            precomputed[key] = result
+            self._precomputed = precomputed
+        return result
+    
+    def with_data_service(self, data_service):
+        #* same analytics over a wrapper of our dataset version (e.g. per-batch filter memoization)
+        #* per-version tables are looked up in and built into this instance, not rebuilt per view
+        if data_service.version != self.data_service.version:
+            raise ValueError('data service wraps a different dataset version')
+        view = copy.copy(self)
+        view.data_service = data_service
+        view._per_version = self._per_version
+        return view
     
     def get_trend_analysis(self, countries=None, start_year=None, end_year=None):
+        ranges = self.data_service.ranges
+        if ranges is not None:
+            return self._trend_from_ranges(ranges, countries, start_year, end_year)
+        
         df = self.data_service.filter_data(countries, start_year, end_year)
         
         if df.empty:
@@ -23,7 +69,29 @@ class AnalyticsService:
         
         return yearly.to_dict('records')
     
+    def _trend_from_ranges(self, ranges, countries, start_year, end_year):
+        ids = ranges.country_ids(countries)
+        if ids is not None and len(ids) == 0:
+            return None
+        
+        lo, hi = ranges.year_bounds(start_year, end_year)
+        has_rows = ranges.per_year_sums('count', ids, lo, hi) > 0
+        if not has_rows.any():
+            return None
+        
+        columns = {
+            'Year': ranges.years(lo, hi)[has_rows],
+            'Im_Value': ranges.per_year_sums('Im_Value', ids, lo, hi)[has_rows],
+            'Em_Value': ranges.per_year_sums('Em_Value', ids, lo, hi)[has_rows],
+            'Net_Migration': ranges.per_year_sums('Net_Migration', ids, lo, hi)[has_rows]
+        }
+        return [dict(zip(columns, row)) for row in zip(*(c.tolist() for c in columns.values()))]
+    
     def get_country_comparison(self, countries, start_year=None, end_year=None):
+        ranges = self.data_service.ranges
+        if ranges is not None:
+            return self._comparison_from_ranges(ranges, countries, start_year, end_year)
+        
         df = self.data_service.filter_data(countries, start_year, end_year)
         
         if df.empty:
@@ -41,30 +109,78 @@ class AnalyticsService:
         
         return comparison.to_dict('records')
     
-    def get_top_countries(self, metric='net', limit=10, year=None):
-        if year:
-            df = self.data_service.filter_data(year=year)
-        else:
-            df = self.data_service.get_all_data()
-            df = df.groupby('Country').agg({
-                'Im_Value': 'sum',
-                'Em_Value': 'sum',
-                'Net_Migration': 'sum'
-            }).reset_index()
+    def _comparison_from_ranges(self, ranges, countries, start_year, end_year):
+        ids = ranges.country_ids(countries)
+        if ids is None:
+            ids = np.arange(len(ranges.countries))
+        
+        lo, hi = ranges.year_bounds(start_year, end_year)
+        counts = ranges.range_sums('count', ids, lo, hi)
+        present = counts > 0
+        if not present.any():
+            return None
         
-        metric_map = {
-            'immigration': 'Im_Value',
-            'emigration': 'Em_Value',
-            'net': 'Net_Migration'
+        ids, counts = ids[present], counts[present]
+        totals = {
+            column: ranges.range_sums(column, ids, lo, hi)
+            for column in ('Im_Value', 'Em_Value', 'Net_Migration')
         }
         
-        sort_column = metric_map.get(metric, 'Net_Migration')
-        top = df.nlargest(limit, sort_column)
+        return [
+            {
+                'Country': country,
+                'Total_Immigration': im,
+                'Avg_Immigration': im / count,
+                'Total_Emigration': em,
+                'Avg_Emigration': em / count,
+                'Total_Net_Migration': net,
+                'Avg_Net_Migration': net / count
+            }
+            for country, count, im, em, net in zip(
+                ranges.countries[ids].tolist(), counts.tolist(),
+                totals['Im_Value'].tolist(), totals['Em_Value'].tolist(),
+                totals['Net_Migration'].tolist()
+            )
+        ]
+    
+    def get_top_countries(self, metric='net', limit=10, year=None, order='desc', offset=0):
+        return self.top_countries_frame(metric, limit, year, order, offset).to_dict('records')
+    
+    def top_countries_frame(self, metric='net', limit=10, year=None, order='desc', offset=0):
+        #* get_top_countries as a DataFrame, routes hand it to format_response to be encoded column-wise
+        #* rank windows are slices of tables built once per dataset version
+        sort_column = METRIC_COLUMNS.get(metric, 'Net_Migration')
+        ascending = order == 'asc'
         
-        return top.to_dict('records')
+        if year:
+            df = self.data_service.get_all_data()
+            table = self._per_version(
+                ('rank_by_year', sort_column, ascending),
+                lambda: RankTable(df[sort_column].to_numpy(), df['Year'].to_numpy(dtype=np.int64), ascending)
+            )
+            return df.iloc[table.window(year, offset, limit)]
+        
+        totals = self._per_version('country_totals', self._country_totals)
+        table = self._per_version(
+            ('rank_total', sort_column, ascending),
+            lambda: RankTable(totals[sort_column].to_numpy(), ascending=ascending)
+        )
+        return totals.iloc[table.window(None, offset, limit)]
+    
+    def _country_totals(self):
+        df = self.data_service.get_all_data()
+        return df.groupby('Country').agg({
+            'Im_Value': 'sum',
+            'Em_Value': 'sum',
+            'Net_Migration': 'sum'
+        }).reset_index()
     
     def get_migration_balance(self, countries=None, start_year=None, end_year=None):
         #! positive/negative net migration
+        ranges = self.data_service.ranges
+        if ranges is not None:
+            return self._balance_from_ranges(ranges, countries, start_year, end_year)
+        
         df = self.data_service.filter_data(countries, start_year, end_year)
         
         if df.empty:
@@ -86,8 +202,33 @@ class AnalyticsService:
             }
         }
     
+    def _balance_from_ranges(self, ranges, countries, start_year, end_year):
+        ids = ranges.country_ids(countries)
+        if ids is None:
+            ids = np.arange(len(ranges.countries))
+        
+        lo, hi = ranges.year_bounds(start_year, end_year)
+        if ranges.range_sums('count', ids, lo, hi).sum() == 0:
+            return None
+        
+        result = {}
+        for key, prefix in (('positive_net_migration', 'pos'), ('negative_net_migration', 'neg')):
+            counts = ranges.range_sums(f'{prefix}_count', ids, lo, hi)
+            totals = ranges.range_sums(f'{prefix}_net', ids, lo, hi)
+            present = counts > 0
+            result[key] = {
+                'count': int(counts.sum()),
+                'total': int(totals.sum()),
+                'countries': dict(zip(ranges.countries[ids[present]].tolist(), totals[present].tolist()))
+            }
+        
+        return result
+    
     def get_yearly_growth(self, country=None):
-        #* calculate year-over-year growth
+        return self.yearly_growth_frame(country).to_dict('records')
+    
+    def yearly_growth_frame(self, country=None):
+        #* get_yearly_growth as a DataFrame, routes hand it to format_response to be encoded column-wise
         if country:
             df = self.data_service.filter_data(countries=[country])
         else:
@@ -101,38 +242,230 @@ class AnalyticsService:
         df = df.sort_values('Year')
         
         #  growth rates
-        df['Im_Growth'] = df['Im_Value'].pct_change() * 100
-        df['Em_Growth'] = df['Em_Value'].pct_change() * 100
-        df['Net_Growth'] = df['Net_Migration'].pct_change() * 100
+        df = df.assign(
+            Im_Growth=df['Im_Value'].pct_change() * 100,
+            Em_Growth=df['Em_Value'].pct_change() * 100,
+            Net_Growth=df['Net_Migration'].pct_change() * 100
+        )
         
-        return df.to_dict('records')
+        return df
     
-    def get_correlation_analysis(self):
-        df = self.data_service.get_all_data()
+    def get_growth_by_country(self, countries=None):
+        #* per-country year-over-year growth, same values as get_yearly_growth(country) for each country
+        if not countries:
+            return self._per_version('growth_by_country', lambda: self._growth_series(self.data_service.get_all_data()))
+        return self._growth_series(self.data_service.filter_data(countries=countries))
+    
+    @staticmethod
+    def _growth_series(df):
+        #* one grouped pct_change over the (Country, Year)-sorted frame, columnar lists per country
+        countries = df['Country'].to_numpy()
+        if len(countries) == 0:
+            return {}
         
-        correlation = df[['Im_Value', 'Em_Value', 'Net_Migration']].corr()
+        starts = np.flatnonzero(np.r_[True, countries[1:] != countries[:-1]])
+        stops = np.append(starts[1:], len(countries))
         
-        return correlation.to_dict()
-    
-    def get_distribution_stats(self, metric='net'):
-        df = self.data_service.get_all_data()
+        columns = {'Year': df['Year'].tolist()}
+        for value_column, growth_column in GROWTH_COLUMNS.items():
+            values = df[value_column].to_numpy(dtype=np.float64)
+            previous = np.empty_like(values)
+            previous[0] = np.nan
+            previous[1:] = values[:-1]
+            previous[starts] = np.nan
+            
+            # same arithmetic as Series.pct_change, x/0 -> inf and 0/0 -> NaN
+            with np.errstate(divide='ignore', invalid='ignore'):
+                growth = (values / previous - 1) * 100
+            
+            columns[value_column] = df[value_column].tolist()
+            columns[growth_column] = growth.tolist()
         
-        metric_map = {
-            'immigration': 'Im_Value',
-            'emigration': 'Em_Value',
-            'net': 'Net_Migration'
+        return {
+            countries[start]: {name: column[start:stop] for name, column in columns.items()}
+            for start, stop in zip(starts.tolist(), stops.tolist())
         }
+    
+    def get_rolling_stats(self, countries=None, start_year=None, end_year=None, metric='net', window=3, span=None):
+        #* rolling sum/mean/std and EWMA per country, years before start_year still warm up the windows
+        column = METRIC_COLUMNS.get(metric, 'Net_Migration')
+        panel = self._dense_panel(column, countries)
+        if panel is None:
+            return None
+        
+        names, years, values, present = panel
+        stats = RollingWindow(values, present, window, span=span).compute()
         
-        column = metric_map.get(metric, 'Net_Migration')
+        lo = int(np.searchsorted(years, start_year)) if start_year else 0
+        hi = int(np.searchsorted(years, end_year, side='right')) if end_year else len(years)
+        mask = present[:, lo:hi]
+        counts = mask.sum(axis=1)
+        if not counts.any():
+            return None
+        
+        # flatten the observed cells once, then cut per country
+        columns = {'Year': np.broadcast_to(years[lo:hi], mask.shape)[mask].tolist()}
+        columns['value'] = values[:, lo:hi][mask].tolist()
+        for name, matrix in stats.items():
+            columns[name] = matrix[:, lo:hi][mask].tolist()
         
+        stops = np.cumsum(counts).tolist()
+        starts = [0] + stops[:-1]
         return {
-            'mean': float(df[column].mean()),
-            'median': float(df[column].median()),
-            'std': float(df[column].std()),
-            'min': float(df[column].min()),
-            'max': float(df[column].max()),
-            'q25': float(df[column].quantile(0.25)),
-            'q75': float(df[column].quantile(0.75))
+            name: {key: column[start:stop] for key, column in columns.items()}
+            for name, start, stop, count in zip(names.tolist(), starts, stops, counts.tolist())
+            if count
         }
-
-analytics_service = AnalyticsService()
+    
+    def _dense_panel(self, column, countries):
+        #* (countries, years, values, present) over the full year axis
+        ranges = self.data_service.ranges
+        if ranges is not None:
+            ids = ranges.country_ids(countries)
+            if ids is None:
+                ids = np.arange(len(ranges.countries))
+            if len(ids) == 0:
+                return None
+            return (
+                ranges.countries[ids],
+                ranges.years(0, ranges.span),
+                ranges.values[column][ids],
+                ranges.values['count'][ids] > 0
+            )
+        
+        df = self.data_service.filter_data(countries=countries)
+        if df.empty:
+            return None
+        
+        years = np.arange(int(df['Year'].min()), int(df['Year'].max()) + 1)
+        pivot = df.pivot_table(index='Country', columns='Year', values=column, aggfunc='sum').reindex(columns=years)
+        present = pivot.notna().to_numpy()
+        return pivot.index.to_numpy(), years, pivot.fillna(0).to_numpy(dtype=np.int64), present
+    
+    def get_similar_countries(self, metric='net', method='pearson', k=5, countries=None):
+        #* neighbour tables are built once per dataset version and metric, k only slices them
+        column = METRIC_COLUMNS.get(metric, 'Net_Migration')
+        
+        def build():
+            panel = self._dense_panel(column, None)
+            if panel is None:
+                return None
+            names, _, values, present = panel
+            return SimilarityIndex(names, values, present)
+        
+        index = self._per_version(('similarity', column), build)
+        if index is None:
+            return None
+        return index.nearest(method, k, countries)
+    
+    def get_correlation_analysis(self, countries=None, start_year=None, end_year=None, by_country=False):
+        #* Pearson matrix merged from per-country, per-year sufficient statistics
+        ranges = self.data_service.ranges
+        if ranges is not None:
+            return self._correlation_from_ranges(ranges, countries, start_year, end_year, by_country)
+        
+        df = self.data_service.filter_data(countries, start_year, end_year)
+        
+        if df.empty:
+            return None
+        
+        if by_country:
+            return {
+                country: group[list(METRICS)].corr().to_dict()
+                for country, group in df.groupby('Country')
+            }
+        
+        correlation = df[list(METRICS)].corr()
+        
+        return correlation.to_dict()
+    
+    def _correlation_from_ranges(self, ranges, countries, start_year, end_year, by_country):
+        ids = ranges.country_ids(countries)
+        if ids is None:
+            ids = np.arange(len(ranges.countries))
+        lo, hi = ranges.year_bounds(start_year, end_year)
+        
+        counts = ranges.range_sums('count', ids, lo, hi)
+        present = counts > 0
+        if not present.any():
+            return None
+        ids = ids[present]
+        
+        names = ['count', *METRICS, *(f'{c}_sq' for c in METRICS), *(f'{a}*{b}' for a, b in PAIRS)]
+        # object arrays keep the moment arithmetic in exact integers
+        stats = {name: ranges.range_sums(name, ids, lo, hi).astype(object) for name in names}
+        
+        if not by_country:
+            stats = {name: np.array([values.sum()], dtype=object) for name, values in stats.items()}
+            return self._pearson(stats)[0]
+        
+        return dict(zip(ranges.countries[ids].tolist(), self._pearson(stats)))
+    
+    @staticmethod
+    def _pearson(stats):
+        #* one matrix per row of the moment arrays, in the DataFrame.corr().to_dict() layout
+        n = stats['count']
+        centered = {c: n * stats[f'{c}_sq'] - stats[c] * stats[c] for c in METRICS}
+        
+        matrices = [{c: {} for c in METRICS} for _ in range(len(n))]
+        for a in METRICS:
+            for b in METRICS:
+                if a == b:
+                    valid = (n > 1) & (centered[a] > 0)
+                    r = np.where(valid.astype(bool), 1.0, np.nan)
+                else:
+                    key = f'{a}*{b}' if f'{a}*{b}' in stats else f'{b}*{a}'
+                    cov = (n * stats[key] - stats[a] * stats[b]).astype(np.float64)
+                    scale = np.sqrt(centered[a].astype(np.float64)) * np.sqrt(centered[b].astype(np.float64))
+                    with np.errstate(divide='ignore', invalid='ignore'):
+                        r = np.clip(cov / scale, -1.0, 1.0)
+                    r = np.where((n > 1).astype(bool) & (scale > 0), r, np.nan)
+                for matrix, value in zip(matrices, r.tolist()):
+                    matrix[b][a] = value
+        return matrices
+    
+    def get_distribution_stats(self, metric='net', countries=None, start_year=None, end_year=None, bins=None):
+        column = METRIC_COLUMNS.get(metric, 'Net_Migration')
+        
+        if not countries and not start_year and not end_year:
+            return self._per_version(
+                ('distribution', column, bins),
+                lambda: describe(self.data_service.get_all_data()[column].to_numpy(), bins)
+            )
+        
+        ranges = self.data_service.ranges
+        if ranges is not None and self.data_service.count(countries, start_year, end_year) >= SKETCH_MIN_ROWS:
+            stats = self._distribution_from_sketches(ranges, column, countries, start_year, end_year, bins)
+            if stats is not None:
+                return stats
+        
+        df = self.data_service.filter_data(countries, start_year, end_year)
+        return describe(df[column].to_numpy(), bins)
+    
+    def _distribution_from_sketches(self, ranges, column, countries, start_year, end_year, bins):
+        #* only filters that select whole countries or whole years map onto the sketches
+        ids = ranges.country_ids(countries)
+        lo, hi = ranges.year_bounds(start_year, end_year)
+        
+        if ids is not None and (lo, hi) == (0, ranges.span):
+            sketches = self._per_version(('country_sketches', column), lambda: self._sketches(column, 'country'))
+            groups = ids
+        elif ids is None:
+            sketches = self._per_version(('year_sketches', column), lambda: self._sketches(column, 'year'))
+            groups = ranges.years(lo, hi)
+        else:
+            return None
+        
+        count = int(ranges.range_sums('count', ids, lo, hi).sum())
+        total = int(ranges.range_sums(column, ids, lo, hi).sum())
+        total_sq = int(ranges.range_sums(f'{column}_sq', ids, lo, hi).sum())
+        return sketches.describe(groups, count, total, total_sq, bins)
+    
+    def _sketches(self, column, by):
+        data_service = self.data_service
+        values = data_service.get_all_data()[column].to_numpy(dtype=np.int64)
+        if by == 'country':
+            groups = data_service.index.keys >> YEAR_BITS
+        else:
+            groups = data_service.index.keys & YEAR_MASK
+        return GroupSketches(values, groups)
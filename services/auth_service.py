@@ -1,18 +1,28 @@
 from datetime import datetime, timedelta
 from firebase_admin import auth, firestore
-from db.firebase_config import get_firestore_client
+from db.firebase_config import get_firebase_app, get_firestore_client, get_async_firestore_client
+from config import Config
+from utils.ttl_cache import TTLCache
 import uuid
 
-db = get_firestore_client()
+DEFAULT_TIER = 'default'
+
+# user document fields reset when their api key expires
+CLEARED_API_KEY = {'api_key': None, 'api_key_expiry': None}
 
 class AuthService:
+    _valid_keys = TTLCache(maxsize=Config.API_KEY_CACHE_SIZE)
+    _invalid_keys = TTLCache(maxsize=Config.API_KEY_CACHE_SIZE)
+    
     @staticmethod
     def create_user(email, password):
         try:
+            db = get_firestore_client()
             user = auth.create_user(
                 email=email,
                 password=password,
-                email_verified=False
+                email_verified=False,
+                app=get_firebase_app()
             )
             
             db.collection('users').document(user.uid).set({
@@ -22,7 +32,7 @@ class AuthService:
                 'api_key_expiry': None
             })
             
-            link = auth.generate_email_verification_link(email)
+            link = auth.generate_email_verification_link(email, app=get_firebase_app())
             return {'uid': user.uid, 'verification_link': link}
         except Exception as e:
             raise Exception(f"Error creating user: {str(e)}")
@@ -30,7 +40,7 @@ class AuthService:
     @staticmethod
     def verify_email(uid):
         try:
-            auth.update_user(uid, email_verified=True)
+            auth.update_user(uid, email_verified=True, app=get_firebase_app())
             return True
         except Exception as e:
             return False
@@ -38,11 +48,12 @@ class AuthService:
     @staticmethod
     def generate_api_key(uid):
         try:
+            db = get_firestore_client()
             user_doc_ref = db.collection('users').document(uid)
             user_doc = user_doc_ref.get()
             
             if not user_doc.exists:
-                user = auth.get_user(uid)
+                user = auth.get_user(uid, app=get_firebase_app())
                 user_doc_ref.set({
                     'email': user.email,
                     'created_at': firestore.SERVER_TIMESTAMP,
@@ -72,40 +83,122 @@ class AuthService:
                 'expires_at': expiry_date
             })
             
+            if user_data.get('api_key'):
+                AuthService.invalidate_api_key(user_data['api_key'])
+            AuthService.invalidate_api_key(api_key)
+            
             return {'api_key': api_key, 'expires_at': expiry_date.isoformat()}
         except Exception as e:
             raise Exception(f"Error generating API key: {str(e)}")
     
     @staticmethod
     def validate_api_key(api_key):
+        cached = AuthService._cached_result(api_key)
+        if cached is not None:
+            return cached
+        
         try:
-            key_doc = db.collection('api_keys').document(api_key).get()
-            if not key_doc.exists:
-                return False
-            
-            key_data = key_doc.to_dict()
-            expiry = key_data.get('expires_at')
-            
-            if expiry and expiry < datetime.now():
-                db.collection('api_keys').document(api_key).delete()
-                db.collection('users').document(key_data['user_id']).update({
-                    'api_key': None,
-                    'api_key_expiry': None
-                })
-                return False
-            
-            return True
+            db = get_firestore_client()
+            key_ref = db.collection('api_keys').document(api_key)
+            valid, expired_user = AuthService._check_key_document(api_key, key_ref.get())
+            if expired_user:
+                key_ref.delete()
+                db.collection('users').document(expired_user).update(CLEARED_API_KEY)
+            return valid
+        except Exception as e:
+            return False
+    
+    @staticmethod
+    async def validate_api_key_async(api_key):
+        #* validate_api_key on the async Firestore client
+        cached = AuthService._cached_result(api_key)
+        if cached is not None:
+            return cached
+        
+        try:
+            db = get_async_firestore_client()
+            key_ref = db.collection('api_keys').document(api_key)
+            valid, expired_user = AuthService._check_key_document(api_key, await key_ref.get())
+            if expired_user:
+                await key_ref.delete()
+                await db.collection('users').document(expired_user).update(CLEARED_API_KEY)
+            return valid
         except Exception as e:
             return False
     
+    @staticmethod
+    def _check_key_document(api_key, key_doc):
+        #* the rules both validate paths share: existence and expiry of the key document, cached
+        #* returns (valid, user id of an expired key whose documents the caller has to clean up)
+        if not key_doc.exists:
+            AuthService._remember_invalid(api_key)
+            return False, None
+        
+        key_data = key_doc.to_dict()
+        expiry = key_data.get('expires_at')
+        
+        if expiry and expiry < datetime.now():
+            AuthService._remember_invalid(api_key)
+            return False, key_data['user_id']
+        
+        AuthService._remember_valid(api_key, expiry, key_data.get('tier'))
+        return True, None
+    
+    @staticmethod
+    def _cached_result(api_key):
+        #* True / False from the caches, None when Firestore has to be asked
+        if AuthService._valid_keys.get(api_key):
+            return True
+        if AuthService._invalid_keys.get(api_key):
+            return False
+        return None
+    
+    @staticmethod
+    def _remember_valid(api_key, expiry, tier=None):
+        #* never cache a key past its own expiry, the cached value is the key's rate limit tier
+        ttl = Config.API_KEY_CACHE_TTL
+        if expiry:
+            ttl = min(ttl, AuthService._seconds_until(expiry))
+        AuthService._valid_keys.set(api_key, tier or DEFAULT_TIER, ttl)
+    
+    @staticmethod
+    def _remember_invalid(api_key):
+        AuthService._invalid_keys.set(api_key, True, Config.API_KEY_NEGATIVE_CACHE_TTL)
+    
+    @staticmethod
+    def get_api_key_tier(api_key):
+        #* rate limit tier from the key's Firestore document ('tier' field), None for invalid keys
+        if not AuthService.validate_api_key(api_key):
+            return None
+        return AuthService._valid_keys.get(api_key) or DEFAULT_TIER
+    
+    @staticmethod
+    def invalidate_api_key(api_key):
+        #* drop cached validation results, call whenever a key is rotated or revoked
+        AuthService._valid_keys.delete(api_key)
+        AuthService._invalid_keys.delete(api_key)
+    
+    @staticmethod
+    def api_key_cache_stats():
+        return {
+            'valid': AuthService._valid_keys.stats(),
+            'invalid': AuthService._invalid_keys.stats()
+        }
+    
+    @staticmethod
+    def _seconds_until(expiry):
+        now = datetime.now(expiry.tzinfo) if expiry.tzinfo else datetime.now()
+        return (expiry - now).total_seconds()
+    
     @staticmethod
     def get_user_profile(uid):
         try:
+            db = get_firestore_client()
             user_doc_ref = db.collection('users').document(uid)
             user_doc = user_doc_ref.get()
             
             if not user_doc.exists:
-                user = auth.get_user(uid)
+                user = auth.get_user(uid, app=get_firebase_app())
                 user_doc_ref.set({
                     'email': user.email,
                     'created_at': firestore.SERVER_TIMESTAMP,
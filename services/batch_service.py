@@ -0,0 +1,139 @@
+from marshmallow import ValidationError
+from services.rolling_window import MAX_WINDOW
+from services.distribution import MAX_BINS
+from services.similarity import MAX_K
+from utils.validators import BatchSubQuerySchema
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class MemoizedDataService:
+    #* per-batch view of a DataService, each distinct filter is resolved once
+    
+    def __init__(self, data_service):
+        self._data_service = data_service
+        self._filtered = {}
+    
+    def __getattr__(self, name):
+        return getattr(self._data_service, name)
+    
+    def filter_data(self, countries=None, start_year=None, end_year=None, year=None):
+        key = filter_key(countries, start_year, end_year, year)
+        if key not in self._filtered:
+            self._filtered[key] = self._data_service.filter_data(countries, start_year, end_year, year)
+        return self._filtered[key]
+
+
+def filter_key(countries=None, start_year=None, end_year=None, year=None):
+    return (tuple(sorted(set(countries or ()))), start_year, end_year, year)
+
+
+class BatchService:
+    
+    def __init__(self, analytics):
+        #* the snapshot's AnalyticsService, only its data service is wrapped for this batch
+        self.analytics = analytics.with_data_service(MemoizedDataService(analytics.data_service))
+    
+    def run(self, queries):
+        #* sub-queries sharing a filter run back to back, results keep the request order
+        parsed = [self._parse(query) for query in queries]
+        order = sorted(range(len(parsed)), key=lambda i: repr(parsed[i][1]))
+        
+        results = [None] * len(parsed)
+        for i in order:
+            params, _ = parsed[i]
+            results[i] = self._execute(params, queries[i])
+        return results
+    
+    def _parse(self, query):
+        try:
+            params = BatchSubQuerySchema().load(query)
+        except ValidationError as e:
+            return e, None
+        
+        if params['type'] in ('top', 'growth', 'rolling', 'similarity'):
+            return params, None
+        return params, filter_key(params['country_codes'], params['start_year'], params['end_year'])
+    
+    def _execute(self, params, query):
+        query_id = query.get('id') if isinstance(query, dict) else None
+        
+        if isinstance(params, ValidationError):
+            return {'id': query_id, 'status': 400, 'error': 'Validation failed', 'details': params.messages}
+        
+        try:
+            status, data = self._dispatch(params)
+        except Exception as e:
+            logger.error(f"Batch query {params['type']} failed: {str(e)}")
+            return {'id': query_id, 'type': params['type'], 'status': 500, 'error': f"Failed to fetch {params['type']}"}
+        
+        result = {'id': query_id, 'type': params['type'], 'status': status}
+        result['data' if status == 200 else 'error'] = data
+        return result
+    
+    def _dispatch(self, params):
+        #* same semantics and payload shape as the matching GET /api/analytics/<type>
+        analytics = self.analytics
+        countries = params['country_codes']
+        kind = params['type']
+        
+        if kind == 'trends':
+            trends = analytics.get_trend_analysis(countries, params['start_year'], params['end_year'])
+            return (200, {'trends': trends}) if trends else (404, 'No data found')
+        
+        if kind == 'comparison':
+            if not countries:
+                return 400, 'Country codes required'
+            comparison = analytics.get_country_comparison(countries, params['start_year'], params['end_year'])
+            return (200, {'comparison': comparison}) if comparison else (404, 'No data found')
+        
+        if kind == 'top':
+            limit = min(params['limit'], 50)
+            top = analytics.get_top_countries(
+                params['metric'], limit, params['year'], params['order'], params['offset']
+            )
+            return 200, {
+                'top_countries': top,
+                'metric': params['metric'],
+                'limit': limit,
+                'order': params['order'],
+                'offset': params['offset']
+            }
+        
+        if kind == 'balance':
+            balance = analytics.get_migration_balance(countries, params['start_year'], params['end_year'])
+            return (200, balance) if balance else (404, 'No data found')
+        
+        if kind == 'growth':
+            if params['by_country']:
+                return 200, {'growth': analytics.get_growth_by_country(countries)}
+            return 200, {'growth': analytics.get_yearly_growth(params['country_code'])}
+        
+        if kind == 'rolling':
+            window = min(params['window'], MAX_WINDOW)
+            rolling = analytics.get_rolling_stats(
+                countries, params['start_year'], params['end_year'], params['metric'], window, params['span']
+            )
+            if not rolling:
+                return 404, 'No data found'
+            return 200, {'rolling': rolling, 'metric': params['metric'], 'window': window, 'span': params['span'] or window}
+        
+        if kind == 'similarity':
+            k = min(params['k'], MAX_K)
+            similarity = analytics.get_similar_countries(params['metric'], params['method'], k, countries)
+            if not similarity:
+                return 404, 'No data found'
+            return 200, {'similarity': similarity, 'metric': params['metric'], 'method': params['method'], 'k': k}
+        
+        if kind == 'correlation':
+            correlation = analytics.get_correlation_analysis(
+                countries, params['start_year'], params['end_year'], params['by_country']
+            )
+            return (200, {'correlation': correlation}) if correlation else (404, 'No data found')
+        
+        bins = min(params['bins'], MAX_BINS) if params['bins'] else None
+        stats = analytics.get_distribution_stats(
+            params['metric'], countries, params['start_year'], params['end_year'], bins
+        )
+        return (200, {'distribution': stats, 'metric': params['metric']}) if stats else (404, 'No data found')
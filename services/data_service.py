@@ -1,23 +1,117 @@
 import os
+import hashlib
+import numpy as np
 import pandas as pd
 from config import Config
+from services.filter_index import FilterIndex
+from services.aggregate_cube import AggregateCube
+from services.range_index import RangeIndex
+from services import dataset_store
+from services.ingest_service import IngestService, file_stamp, ingest_lock, merge_sources
+from utils.ttl_cache import TTLCache
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# superseded rows the append-only processed CSV may carry, relative to its live rows, before a rewrite
+CSV_COMPACT_RATIO = 0.25
+
 class DataService:
     
-    def __init__(self):
+    def __init__(self, df=None):
         self.df = None
-        self._load_or_prepare_data()
+        self.index = None
+        self.cube = None
+        self.ranges = None
+        self.version = None
+        self._digests = None
+        self._processed_stamp = None
+        self._counts = TTLCache(maxsize=1024)
+        
+        if df is not None:
+            self._set_data(df)
+        else:
+            self._load_or_prepare_data()
+    
+    @staticmethod
+    def _stamp_processed():
+        return file_stamp(Config.DATASET_PROCESSED) if os.path.exists(Config.DATASET_PROCESSED) else None
     
     def _load_or_prepare_data(self):
+        # taken before reading, a write that lands meanwhile makes the next ingest reload
+        self._processed_stamp = self._stamp_processed()
+        if dataset_store.is_fresh(Config.DATASET_BINARY, Config.DATASET_PROCESSED):
+            logger.info("Loading binary dataset")
+            self._set_data(dataset_store.read_columns(Config.DATASET_BINARY))
+            return
+        
         if os.path.exists(Config.DATASET_PROCESSED):
             logger.info("Loading processed dataset")
-            self.df = self._read_csv(Config.DATASET_PROCESSED)
+            df = self._read_csv(Config.DATASET_PROCESSED)
+            df = df.drop_duplicates(subset=['Country', 'Year'], keep='last')
         else:
             logger.info("Preparing dataset from source files")
-            self.df = self._prepare_migration_data()
+            df = self._prepare_migration_data()
+        
+        self._set_data(df)
+        self._write_binary()
+    
+    def _write_binary(self):
+        #* the binary store is an optimisation, the CSV stays the source of truth
+        #* self.df is already sorted and the index holds its Country dictionary encoding
+        try:
+            dataset_store.write_columns(
+                self.df, Config.DATASET_BINARY, Config.DATASET_PROCESSED,
+                dictionaries={'Country': (self.index.country_codes(), self.index.countries)}
+            )
+        except Exception as e:
+            logger.warning(f"Could not write binary dataset: {str(e)}")
+    
+    def _set_data(self, df):
+        #* sort once so every filter is a set of contiguous (Country, Year) ranges
+        #* already sorted frames (e.g. the memory-mapped store) are used as is
+        if not self._is_sorted(df):
+            df = df.sort_values(['Country', 'Year'], kind='mergesort').reset_index(drop=True)
+        elif not isinstance(df.index, pd.RangeIndex) or df.index.start != 0:
+            df = df.reset_index(drop=True)
+        self.index = FilterIndex(df)
+        self.cube = AggregateCube(df)
+        self.ranges = RangeIndex.build(df, self.index)
+        self._digests = self._country_digests(df, self.index, self.index.countries)
+        self.version = self._content_hash(self._digests, df.columns)
+        self.df = df
+    
+    @staticmethod
+    def _is_sorted(df):
+        countries = df['Country'].to_numpy()
+        years = df['Year'].to_numpy()
+        same_country = countries[1:] == countries[:-1]
+        return bool(np.all((countries[1:] > countries[:-1]) | (same_country & (years[1:] >= years[:-1]))))
+    
+    @staticmethod
+    def _country_digests(df, index, countries):
+        #* sha1 of each country's row hashes, so an ingest re-hashes only the countries it touched
+        countries = [c for c in countries if c in index.country_slices]
+        if not countries:
+            return {}
+        rows = df if len(countries) == len(index.countries) else df.iloc[index.resolve(countries=countries)]
+        row_hashes = pd.util.hash_pandas_object(rows, index=False).to_numpy()
+        
+        digests, start = {}, 0
+        for country in sorted(countries):
+            lo, hi = index.country_slices[country]
+            digests[country] = hashlib.sha1(row_hashes[start:start + hi - lo].tobytes()).digest()
+            start += hi - lo
+        return digests
+    
+    @staticmethod
+    def _content_hash(digests, columns):
+        #* stable across workers and restarts for identical data
+        digest = hashlib.sha1()
+        for country in sorted(digests):
+            digest.update(digests[country])
+        digest.update(','.join(columns).encode())
+        return digest.hexdigest()[:16]
     
     def _read_csv(self, file_path):
         try:
@@ -35,59 +129,11 @@ class DataService:
             df_immigration = self._read_csv(Config.DATASET_IMMIGRATION)
             df_emigration = self._read_csv(Config.DATASET_EMIGRATION)
             
-            # clean data
-            df_immigration = df_immigration.drop(columns=[
-                'DATAFLOW', 'LAST UPDATE', 'freq', 'citizen', 'agedef', 
-                'age', 'unit', 'sex', 'OBS_FLAG', 'CONF_STATUS'
-            ], errors='ignore')
-            df_immigration = df_immigration.rename(columns={
-                'geo': 'Country',
-                'TIME_PERIOD': 'Year',
-                'OBS_VALUE': 'Im_Value'
-            })
-            
-            df_emigration = df_emigration.drop(columns=[
-                'DATAFLOW', 'LAST UPDATE', 'freq', 'citizen', 'agedef',
-                'age', 'unit', 'sex', 'OBS_FLAG', 'CONF_STATUS'
-            ], errors='ignore')
-            df_emigration = df_emigration.rename(columns={
-                'geo': 'Country',
-                'TIME_PERIOD': 'Year',
-                'OBS_VALUE': 'Em_Value'
-            })
-            
-            # merge datasets
-            df_merged = pd.merge(
-                df_immigration, 
-                df_emigration, 
-                on=['Country', 'Year'], 
-                how='inner'
-            )
-            
-            #  net migration
-            df_merged['Net_Migration'] = df_merged['Im_Value'] - df_merged['Em_Value']
-            
-            #  duplicates and EU27_2020 
-            df_merged = df_merged.drop_duplicates(subset=['Country', 'Year'])
-            df_merged = df_merged[df_merged['Country'] != 'EU27_2020']
-            
-            # map to ISO-3166-1 alpha-3 codes
-            country_mapping = {
-                'AT': 'AUT', 'BE': 'BEL', 'BG': 'BGR', 'CH': 'CHE', 'CY': 'CYP',
-                'CZ': 'CZE', 'DE': 'DEU', 'DK': 'DNK', 'EE': 'EST', 'EL': 'GRC',
-                'ES': 'ESP', 'FI': 'FIN', 'FR': 'FRA', 'GE': 'GEO', 'HR': 'HRV',
-                'HU': 'HUN', 'IE': 'IRL', 'IS': 'ISL', 'IT': 'ITA', 'LI': 'LIE',
-                'LT': 'LTU', 'LU': 'LUX', 'LV': 'LVA', 'MD': 'MDA', 'ME': 'MNE',
-                'MK': 'MKD', 'MT': 'MLT', 'NL': 'NLD', 'NO': 'NOR', 'PL': 'POL',
-                'PT': 'PRT', 'RO': 'ROU', 'SE': 'SWE', 'SI': 'SVN', 'SK': 'SVK',
-                'TR': 'TUR', 'UK': 'GBR'
-            }
-            
-            df_merged['Country'] = df_merged['Country'].map(country_mapping)
-            df_merged = df_merged.dropna(subset=['Country'])
+            df_merged = merge_sources(df_immigration, df_emigration)
             
             # save processed data
             df_merged.to_csv(Config.DATASET_PROCESSED, index=False)
+            self._processed_stamp = self._stamp_processed()
             logger.info(f"Processed data saved to {Config.DATASET_PROCESSED}")
             
             return df_merged
@@ -96,74 +142,173 @@ class DataService:
             logger.error(f"Error preparing migration data: {str(e)}")
             raise
     
+    def ingest(self):
+        #* merge only new/changed raw rows into the processed store and derived aggregates
+        #* index and aggregate rebuilds are per affected country, I/O is O(history): both raw files are
+        #* re-read, the frame is spliced by copying every column and the binary store is rewritten
+        with ingest_lock():
+            if not np.array_equal(self._processed_stamp, self._stamp_processed()):
+                # another process ingested since this frame was loaded, the delta is against its manifest
+                logger.info(f"{Config.DATASET_PROCESSED} changed since it was loaded, reloading before ingest")
+                self._load_or_prepare_data()
+            return self._ingest(IngestService().compute_delta())
+    
+    def _ingest(self, delta):
+        if delta.is_empty:
+            if delta.manifest is not None:
+                # contents unchanged, the new stamps let the next ingest skip reading the files
+                delta.commit()
+            logger.info("Ingest: raw files unchanged")
+            return {'upserted': 0, 'removed': 0, 'countries': [], 'years': []}
+        
+        countries = set(delta.affected['Country']) | set(delta.upserts['Country'])
+        years = set(delta.affected['Year'].tolist()) | set(delta.upserts['Year'].tolist())
+        
+        if delta.full:
+            # first ingest without fingerprints, rebuild from the raw files
+            removed = superseded = 0
+            self._set_data(delta.upserts)
+        else:
+            removed, superseded = self._apply_delta(delta, sorted(countries), years)
+        
+        self._save_processed(delta, removed, superseded)
+        delta.commit()
+        
+        logger.info(f"Ingest: {len(delta.upserts)} rows upserted, {removed} removed")
+        return {
+            'upserted': len(delta.upserts),
+            'removed': removed,
+            'countries': sorted(countries),
+            'years': sorted(years)
+        }
+    
+    def _apply_delta(self, delta, countries, years):
+        #* only the runs of the affected countries are rebuilt and sorted, the other runs are copied
+        #* over unchanged; indexes, aggregates and the version are updated for those countries only
+        #* returns (removed, superseded) row counts
+        old, index = self.df, self.index
+        current = old.iloc[index.resolve(countries=countries)] if countries else old.iloc[0:0]
+        
+        keys = pd.MultiIndex.from_frame(current[['Country', 'Year']])
+        dropped = keys.isin(pd.MultiIndex.from_frame(delta.affected[['Country', 'Year']]))
+        upserted = keys.isin(pd.MultiIndex.from_frame(delta.upserts[['Country', 'Year']]))
+        block = pd.concat([current[~dropped], delta.upserts[old.columns]], ignore_index=True)
+        block = block.sort_values(['Country', 'Year'], kind='mergesort').reset_index(drop=True)
+        
+        # one run per country, untouched ones point into old, rebuilt ones into block (after old)
+        affected = set(countries)
+        untouched = np.asarray([c for c in index.countries if c not in affected], dtype=object)
+        bounds = np.array([index.country_slices[c] for c in untouched], dtype=np.int64).reshape(-1, 2)
+        rebuilt, block_starts, block_lengths = np.unique(
+            block['Country'].to_numpy(), return_index=True, return_counts=True
+        )
+        names = np.concatenate([untouched, rebuilt])
+        starts = np.concatenate([bounds[:, 0], len(old) + block_starts])
+        lengths = np.concatenate([bounds[:, 1] - bounds[:, 0], block_lengths])
+        order = np.argsort(names, kind='stable')
+        names, starts, lengths = names[order], starts[order], lengths[order]
+        
+        positions = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+        df = pd.DataFrame({
+            column: np.concatenate([old[column].to_numpy(), block[column].to_numpy()])[positions]
+            for column in old.columns
+        })
+        
+        self.index = FilterIndex.from_runs(names, lengths, df['Year'].to_numpy())
+        if self.ranges is not None:
+            self.ranges = self.ranges.updated(df, self.index, countries)
+        else:
+            self.ranges = RangeIndex.build(df, self.index)
+        
+        present = [c for c in countries if c in self.index.country_ids]
+        country_rows = df.iloc[self.index.resolve(countries=present)] if present else df.iloc[0:0]
+        year_rows = df.iloc[self.index.resolve(start_year=min(years), end_year=max(years))]
+        year_rows = year_rows[year_rows['Year'].isin(years)]
+        self.cube = self.cube.updated(countries, years, country_rows, year_rows, len(df))
+        
+        self._digests = {c: d for c, d in self._digests.items() if c not in affected}
+        self._digests.update(self._country_digests(df, self.index, present))
+        self.version = self._content_hash(self._digests, df.columns)
+        self.df = df
+        return int((dropped & ~upserted).sum()), int((dropped & upserted).sum())
+    
+    def _save_processed(self, delta, removed, superseded):
+        #* upserts are appended to the CSV (duplicate keys resolve to the last row on load), the
+        #* file is rewritten when rows were removed or superseded rows pass CSV_COMPACT_RATIO
+        stale = delta.stale_rows + superseded
+        if (delta.full or removed or stale > len(self.df) * CSV_COMPACT_RATIO
+                or not os.path.exists(Config.DATASET_PROCESSED)):
+            self.df.to_csv(Config.DATASET_PROCESSED, index=False)
+            stale = 0
+        else:
+            delta.upserts[self.df.columns].to_csv(Config.DATASET_PROCESSED, mode='a', header=False, index=False)
+        self._processed_stamp = self._stamp_processed()
+        delta.stale_rows = stale
+        self._write_binary()
+    
     def get_all_data(self):
         if self.df is None or self.df.empty:
             raise ValueError("No data available")
         return self.df
     
+    def filter_positions(self, countries=None, start_year=None, end_year=None, year=None):
+        #* slice or read-only position array into self.df
+        return self.index.resolve(countries, start_year, end_year, year)
+    
     def filter_data(self, countries=None, start_year=None, end_year=None, year=None):
-        df = self.df.copy()
+        #! result may be a view of self.df, callers must not modify it in place
+        positions = self.filter_positions(countries, start_year, end_year, year)
+        return self.df.iloc[positions]
+    
+    def get_page_after(self, after_key=None, limit=100, **filters):
+        #* keyset page: rows strictly after the (Country, Year) key, plus the key to continue from
+        after = self.index.seek(*after_key) if after_key else 0
+        positions = self.index.resolve_page(after=after, limit=limit + 1, **filters)
+        page = self.df.iloc[positions]
         
-        if year:
-            df = df[df['Year'] == year]
-        else:
-            if start_year:
-                df = df[df['Year'] >= start_year]
-            if end_year:
-                df = df[df['Year'] <= end_year]
+        if len(page) <= limit:
+            return page, None
         
-        if countries:
-            df = df[df['Country'].isin(countries)]
+        page = page.iloc[:limit]
+        last = page.iloc[-1]
+        return page, [last['Country'], int(last['Year'])]
+    
+    def count(self, countries=None, start_year=None, end_year=None, year=None):
+        key = (self.version, tuple(sorted(set(countries or ()))), start_year, end_year, year)
+        total = self._counts.get(key)
+        if total is None:
+            total = self.index.count(countries, start_year, end_year, year)
+            self._counts.set(key, total, Config.CACHE_DEFAULT_TIMEOUT)
+        return total
+    
+    def iter_chunks(self, positions, chunk_size):
+        #* frames of at most chunk_size rows, the full selection is never materialized
+        df = self.df
+        if isinstance(positions, slice):
+            bounds = range(positions.start, positions.stop, chunk_size)
+            chunks = (df.iloc[start:min(start + chunk_size, positions.stop)] for start in bounds)
+        else:
+            bounds = range(0, len(positions), chunk_size)
+            chunks = (df.iloc[positions[start:start + chunk_size]] for start in bounds)
         
-        return df
+        if len(bounds) == 0:
+            yield df.iloc[0:0]
+        yield from chunks
     
     def get_country_summary(self, country_code):
-        df = self.df[self.df['Country'] == country_code]
-        
-        if df.empty:
-            return None
-        
-        return {
-            'country': country_code,
-            'years_available': [int(df['Year'].min()), int(df['Year'].max())],
-            'total_immigration': int(df['Im_Value'].sum()),
-            'total_emigration': int(df['Em_Value'].sum()),
-            'total_net_migration': int(df['Net_Migration'].sum()),
-            'avg_immigration': float(df['Im_Value'].mean()),
-            'avg_emigration': float(df['Em_Value'].mean()),
-            'avg_net_migration': float(df['Net_Migration'].mean())
-        }
+        return self.cube.country_summaries.get(country_code)
     
     def get_year_summary(self, year):
-        df = self.df[self.df['Year'] == year]
-        
-        if df.empty:
-            return None
-        
-        return {
-            'year': year,
-            'countries_count': len(df),
-            'total_immigration': int(df['Im_Value'].sum()),
-            'total_emigration': int(df['Em_Value'].sum()),
-            'total_net_migration': int(df['Net_Migration'].sum()),
-            'top_immigration': df.nlargest(5, 'Im_Value')[['Country', 'Im_Value']].to_dict('records'),
-            'top_emigration': df.nlargest(5, 'Em_Value')[['Country', 'Em_Value']].to_dict('records')
-        }
+        return self.cube.year_summaries.get(year)
     
     def get_available_countries(self):
-        return sorted(self.df['Country'].unique().tolist())
+        return self.index.countries.tolist()
     
     def get_available_years(self):
-        return sorted(self.df['Year'].unique().tolist())
+        return self.index.years.tolist()
+    
+    def get_year_range(self):
+        return int(self.index.years[0]), int(self.index.years[-1])
     
     def get_statistics(self):
-        return {
-            'total_records': len(self.df),
-            'countries_count': self.df['Country'].nunique(),
-            'years_range': [int(self.df['Year'].min()), int(self.df['Year'].max())],
-            'total_immigration': int(self.df['Im_Value'].sum()),
-            'total_emigration': int(self.df['Em_Value'].sum()),
-            'total_net_migration': int(self.df['Net_Migration'].sum())
-        }
-
-data_service = DataService()
\ No newline at end of file
+        return self.cube.statistics
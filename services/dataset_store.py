@@ -0,0 +1,95 @@
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+#* processed dataset as one .npy file per column, loaded with mmap_mode='r'
+#* string columns are dictionary encoded: <column>.codes.npy + <column>.values.npy
+
+FORMAT_VERSION = 1
+META_FILE = 'meta.json'
+
+
+def _source_stamp(source_path):
+    if not source_path or not os.path.exists(source_path):
+        return None
+    stat = os.stat(source_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def is_fresh(path, source_path=None):
+    #* usable when present, same format, and not older than the CSV it was built from
+    meta_path = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_path):
+        return False
+    
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    
+    if meta.get('format_version') != FORMAT_VERSION:
+        return False
+    
+    source = _source_stamp(source_path)
+    return source is None or meta.get('source') == source
+
+
+def write_columns(df, path, source_path=None, dictionaries=None):
+    #* written to a temp directory and renamed so readers never see a partial store
+    #* dictionaries: optional {column: (codes, sorted values)} the caller already has, skips factorizing
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    
+    dictionaries = dictionaries or {}
+    columns = []
+    for name in df.columns:
+        series = df[name]
+        if name in dictionaries:
+            codes, values = dictionaries[name]
+            np.save(os.path.join(tmp_path, f'{name}.codes.npy'), codes.astype(np.int32))
+            np.save(os.path.join(tmp_path, f'{name}.values.npy'), np.asarray(values).astype(str))
+            columns.append({'name': name, 'encoding': 'dictionary'})
+        elif series.dtype == object:
+            codes, values = pd.factorize(series, sort=True)
+            np.save(os.path.join(tmp_path, f'{name}.codes.npy'), codes.astype(np.int32))
+            np.save(os.path.join(tmp_path, f'{name}.values.npy'), values.to_numpy().astype(str))
+            columns.append({'name': name, 'encoding': 'dictionary'})
+        else:
+            np.save(os.path.join(tmp_path, f'{name}.npy'), series.to_numpy())
+            columns.append({'name': name, 'encoding': 'plain'})
+    
+    with open(os.path.join(tmp_path, META_FILE), 'w') as f:
+        json.dump({
+            'format_version': FORMAT_VERSION,
+            'rows': len(df),
+            'columns': columns,
+            'source': _source_stamp(source_path)
+        }, f)
+    
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    logger.info(f"Binary dataset written to {path}")
+
+
+def read_columns(path):
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    
+    data = {}
+    for column in meta['columns']:
+        name = column['name']
+        if column['encoding'] == 'dictionary':
+            codes = np.load(os.path.join(path, f'{name}.codes.npy'), mmap_mode='r')
+            values = np.load(os.path.join(path, f'{name}.values.npy')).astype(object)
+            data[name] = values[codes]
+        else:
+            data[name] = np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+    
+    return pd.DataFrame(data, copy=False)
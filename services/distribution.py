@@ -0,0 +1,137 @@
+import numpy as np
+
+QUANTILES = {'q25': 0.25, 'q75': 0.75}
+
+# points kept per group sketch, groups up to this size are stored exactly
+SKETCH_SIZE = 256
+
+MAX_BINS = 1000
+
+# filtered selections at least this large are answered from the sketches
+SKETCH_MIN_ROWS = 250_000
+
+
+def lerp(a, b, t):
+    #* numpy's linear interpolation, so quantiles match Series.quantile bit for bit
+    diff = b - a
+    return b - diff * (1 - t) if t >= 0.5 else a + diff * t
+
+
+def sorted_quantile(sorted_values, q):
+    index = q * (len(sorted_values) - 1)
+    below = int(np.floor(index))
+    above = min(below + 1, len(sorted_values) - 1)
+    return float(lerp(float(sorted_values[below]), float(sorted_values[above]), index - below))
+
+
+def histogram(sorted_values, low, high, bins):
+    #* same bins as np.histogram(values, bins, (low, high)), counted by binary search on the sorted values
+    edges = np.linspace(low, high, bins + 1)
+    cuts = np.searchsorted(sorted_values, edges[1:-1], side='left')
+    counts = np.diff(np.concatenate(([0], cuts, [len(sorted_values)])))
+    return {'edges': edges.tolist(), 'counts': counts.tolist()}
+
+
+def describe(values, bins=None):
+    #* every statistic from one sort of the selection, None when it is empty
+    if len(values) == 0:
+        return None
+
+    n = len(values)
+    ordered = np.sort(values)
+    floats = values.astype(np.float64)
+
+    # same accumulation order as pandas nanmean / nanvar
+    mean = floats.sum(dtype=np.float64) / n
+    std = np.sqrt(((mean - floats) ** 2).sum(dtype=np.float64) / (n - 1)) if n > 1 else np.nan
+
+    middle = n // 2
+    if n % 2:
+        median = float(ordered[middle])
+    else:
+        median = float(np.mean(ordered[middle - 1:middle + 1].astype(np.float64)))
+
+    stats = {
+        'count': n,
+        'mean': float(mean),
+        'median': median,
+        'std': float(std),
+        'min': float(ordered[0]),
+        'max': float(ordered[-1]),
+        **{name: sorted_quantile(ordered, q) for name, q in QUANTILES.items()},
+        'approximate': False
+    }
+    if bins:
+        stats['histogram'] = histogram(ordered, stats['min'], stats['max'], bins)
+    return stats
+
+
+class GroupSketches:
+    #* mergeable equi-depth sketch per group (country or year)
+    #* each group keeps at most SKETCH_SIZE order statistics, each standing for n / size rows
+
+    def __init__(self, values, groups, size=SKETCH_SIZE):
+        order = np.lexsort((values, groups))
+        self.groups, starts, lengths = np.unique(groups[order], return_index=True, return_counts=True)
+
+        kept = np.minimum(lengths, size)
+        offsets = np.cumsum(kept) - kept
+        rank = np.arange(int(kept.sum())) - np.repeat(offsets, kept)
+        # evenly spaced ranks, first and last always kept so min and max stay exact
+        step = np.repeat((lengths - 1) / np.maximum(kept - 1, 1), kept)
+        picks = np.repeat(starts, kept) + np.rint(rank * step).astype(np.int64)
+
+        self.points = values[order][picks]
+        self.weights = np.repeat(lengths / kept, kept)
+        self.offsets = np.append(offsets, len(self.points))
+
+    def _select(self, groups):
+        #* positions in self.groups of the requested groups that have rows
+        ids = np.searchsorted(self.groups, groups)
+        found = ids < len(self.groups)
+        found[found] = self.groups[ids[found]] == np.asarray(groups)[found]
+        return ids[found]
+
+    def merge(self, ids):
+        #* (sorted points, weights) for the union of the selected groups
+        lengths = self.offsets[ids + 1] - self.offsets[ids]
+        starts = np.repeat(self.offsets[ids] - (np.cumsum(lengths) - lengths), lengths)
+        positions = starts + np.arange(int(lengths.sum()))
+
+        points, weights = self.points[positions], self.weights[positions]
+        order = np.argsort(points, kind='stable')
+        return points[order], weights[order]
+
+    @staticmethod
+    def quantile(points, weights, q):
+        #* weighted linear interpolation, exact when every weight is 1
+        centers = np.cumsum(weights) - (weights + 1) / 2
+        return float(np.interp(q * (weights.sum() - 1), centers, points))
+
+    def describe(self, groups, count, total, total_sq, bins=None):
+        #* count / sums come from exact prefix sums, order statistics from the sketches
+        #* None when the sketches would not be much smaller than the rows themselves
+        ids = self._select(groups)
+        if count == 0 or len(ids) == 0:
+            return None
+        if (self.offsets[ids + 1] - self.offsets[ids]).sum() * 4 > count:
+            return None
+
+        points, weights = self.merge(ids)
+        # exact integer variance, (n * sum(x^2) - sum(x)^2) / (n * (n - 1))
+        variance = (count * total_sq - total * total) / (count * (count - 1)) if count > 1 else np.nan
+
+        stats = {
+            'count': count,
+            'mean': total / count,
+            'median': self.quantile(points, weights, 0.5),
+            'std': float(np.sqrt(variance)),
+            'min': float(points[0]),
+            'max': float(points[-1]),
+            **{name: self.quantile(points, weights, q) for name, q in QUANTILES.items()},
+            'approximate': not bool((weights == 1).all())
+        }
+        if bins:
+            counts, edges = np.histogram(points, bins, (stats['min'], stats['max']), weights=weights)
+            stats['histogram'] = {'edges': edges.tolist(), 'counts': np.rint(counts).astype(np.int64).tolist()}
+        return stats
@@ -0,0 +1,105 @@
+import numpy as np
+
+YEAR_BITS = 16
+YEAR_MASK = (1 << YEAR_BITS) - 1
+
+
+class FilterIndex:
+    #* row-position index over a frame sorted by (Country, Year)
+    #* a filter resolves to a slice or a position array, never a frame copy
+
+    def __init__(self, df):
+        countries, starts = np.unique(df['Country'].to_numpy(), return_index=True)
+        self._build(countries, starts, df['Year'].to_numpy(dtype=np.int64))
+
+    @classmethod
+    def from_runs(cls, countries, lengths, years):
+        #* index of a frame already laid out as one run per sorted country, skips the string unique
+        index = cls.__new__(cls)
+        index._build(countries, np.cumsum(lengths) - lengths, np.asarray(years, dtype=np.int64))
+        return index
+
+    def _build(self, countries, starts, years):
+        self.size = len(years)
+        self.countries = countries
+        stops = np.append(starts[1:], self.size)
+        self.country_ids = {c: i for i, c in enumerate(self.countries)}
+        self.country_slices = {
+            c: (int(s), int(e)) for c, s, e in zip(self.countries, starts, stops)
+        }
+
+        # composite key is globally sorted because the frame is sorted by (Country, Year)
+        country_idx = np.repeat(np.arange(len(self.countries), dtype=np.int64), stops - starts)
+        self.keys = (country_idx << YEAR_BITS) | years
+        self.keys.flags.writeable = False
+
+        self.years = np.unique(years)
+
+    def country_codes(self):
+        #* per-row position of the row's country in self.countries, a ready-made dictionary encoding
+        return self.keys >> YEAR_BITS
+
+    def resolve(self, countries=None, start_year=None, end_year=None, year=None):
+        lo, hi = self._ranges(countries, start_year, end_year, year)
+        return self._ranges_to_positions(lo, hi)
+
+    def resolve_page(self, countries=None, start_year=None, end_year=None, year=None, after=0, limit=100):
+        #* first `limit` matches at or after global position `after`, cost independent of page depth
+        lo, hi = self._ranges(countries, start_year, end_year, year)
+        lo = np.maximum(lo, after)
+        hi = np.maximum(hi, lo)
+
+        lengths = hi - lo
+        taken = np.minimum(lengths, np.maximum(limit - (np.cumsum(lengths) - lengths), 0))
+        return self._ranges_to_positions(lo, lo + taken)
+
+    def count(self, countries=None, start_year=None, end_year=None, year=None):
+        lo, hi = self._ranges(countries, start_year, end_year, year)
+        return int((hi - lo).sum())
+
+    def seek(self, country, year):
+        #* first global position strictly after the (country, year) key, stable across reloads
+        cid = int(np.searchsorted(self.countries, country, side='left'))
+        if cid < len(self.countries) and self.countries[cid] == country:
+            year = min(max(int(year), 0), YEAR_MASK)
+            return int(np.searchsorted(self.keys, (cid << YEAR_BITS) | year, side='right'))
+        return int(np.searchsorted(self.keys, cid << YEAR_BITS, side='left'))
+
+    def _ranges(self, countries, start_year, end_year, year):
+        #* one [lo, hi) position range per selected country
+        if year:
+            start_year = end_year = year
+
+        if countries:
+            ids = sorted({self.country_ids[c] for c in countries if c in self.country_ids})
+            ids = np.asarray(ids, dtype=np.int64)
+        else:
+            if not start_year and not end_year:
+                return np.array([0], dtype=np.int64), np.array([self.size], dtype=np.int64)
+            ids = np.arange(len(self.countries), dtype=np.int64)
+
+        lo_year = min(max(start_year, 0), YEAR_MASK) if start_year else 0
+        hi_year = min(max(end_year, 0), YEAR_MASK) if end_year else YEAR_MASK
+
+        lo = np.searchsorted(self.keys, (ids << YEAR_BITS) | lo_year, side='left')
+        hi = np.searchsorted(self.keys, (ids << YEAR_BITS) | hi_year, side='right')
+        return lo, np.maximum(hi, lo)
+
+    @staticmethod
+    def _ranges_to_positions(lo, hi):
+        lengths = hi - lo
+        keep = lengths > 0
+        lo, lengths = lo[keep], lengths[keep]
+
+        if len(lo) == 0:
+            return slice(0, 0)
+
+        # adjacent ranges collapse into one slice (e.g. consecutive countries, no year bounds)
+        if len(lo) == 1 or np.array_equal(lo[1:], lo[:-1] + lengths[:-1]):
+            return slice(int(lo[0]), int(lo[-1] + lengths[-1]))
+
+        total = int(lengths.sum())
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.repeat(lo - offsets, lengths) + np.arange(total, dtype=np.int64)
+        positions.flags.writeable = False
+        return positions
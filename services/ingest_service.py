@@ -0,0 +1,185 @@
+import fcntl
+import os
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from config import Config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+RAW_KEY = ['geo', 'TIME_PERIOD']
+
+DROP_COLUMNS = [
+    'DATAFLOW', 'LAST UPDATE', 'freq', 'citizen', 'agedef',
+    'age', 'unit', 'sex', 'OBS_FLAG', 'CONF_STATUS'
+]
+
+# ISO-3166-1 alpha-3 codes
+COUNTRY_MAPPING = {
+    'AT': 'AUT', 'BE': 'BEL', 'BG': 'BGR', 'CH': 'CHE', 'CY': 'CYP',
+    'CZ': 'CZE', 'DE': 'DEU', 'DK': 'DNK', 'EE': 'EST', 'EL': 'GRC',
+    'ES': 'ESP', 'FI': 'FIN', 'FR': 'FRA', 'GE': 'GEO', 'HR': 'HRV',
+    'HU': 'HUN', 'IE': 'IRL', 'IS': 'ISL', 'IT': 'ITA', 'LI': 'LIE',
+    'LT': 'LTU', 'LU': 'LUX', 'LV': 'LVA', 'MD': 'MDA', 'ME': 'MNE',
+    'MK': 'MKD', 'MT': 'MLT', 'NL': 'NLD', 'NO': 'NOR', 'PL': 'POL',
+    'PT': 'PRT', 'RO': 'ROU', 'SE': 'SWE', 'SI': 'SVN', 'SK': 'SVK',
+    'TR': 'TUR', 'UK': 'GBR'
+}
+
+
+def clean_source(df, value_column):
+    df = df.drop(columns=DROP_COLUMNS, errors='ignore')
+    return df.rename(columns={
+        'geo': 'Country',
+        'TIME_PERIOD': 'Year',
+        'OBS_VALUE': value_column
+    })
+
+
+def merge_sources(df_immigration, df_emigration):
+    #* raw Eurostat immigration + emigration rows -> processed (Country, Year) rows
+    df_merged = pd.merge(
+        clean_source(df_immigration, 'Im_Value'),
+        clean_source(df_emigration, 'Em_Value'),
+        on=['Country', 'Year'],
+        how='inner'
+    )
+    
+    #  net migration
+    df_merged['Net_Migration'] = df_merged['Im_Value'] - df_merged['Em_Value']
+    
+    #  duplicates and EU27_2020 
+    df_merged = df_merged.drop_duplicates(subset=['Country', 'Year'])
+    df_merged = df_merged[df_merged['Country'] != 'EU27_2020']
+    
+    df_merged['Country'] = df_merged['Country'].map(COUNTRY_MAPPING)
+    return df_merged.dropna(subset=['Country'])
+
+
+def file_stamp(path):
+    #* (size, mtime_ns), an unchanged stamp means the file was not rewritten since the last ingest
+    stat = os.stat(path)
+    return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+@contextmanager
+def ingest_lock(path=None):
+    #* exclusive across processes (workers, flask ingest), held from compute_delta until the manifest is committed
+    path = path or f'{Config.DATASET_PROCESSED}.lock'
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def fingerprint(raw):
+    #* per-row content hash, LAST UPDATE is ignored because Eurostat bumps it on every release
+    columns = [c for c in raw.columns if c != 'LAST UPDATE']
+    return pd.util.hash_pandas_object(raw[columns], index=False).to_numpy()
+
+
+class IngestDelta:
+    
+    #* affected: processed (Country, Year) keys to drop, upserts: rows to add back
+    #* manifest is None when the raw files were not read, there is nothing to commit then
+    
+    def __init__(self, upserts, affected, manifest, full):
+        self.upserts = upserts
+        self.affected = affected
+        self.manifest = manifest
+        self.full = full
+    
+    @property
+    def is_empty(self):
+        return self.upserts.empty and self.affected.empty
+    
+    @property
+    def stale_rows(self):
+        #* superseded rows left in the append-only processed CSV by earlier ingests
+        return int(self.manifest.get('processed_stale', 0))
+    
+    @stale_rows.setter
+    def stale_rows(self, count):
+        self.manifest['processed_stale'] = np.int64(count)
+    
+    def commit(self, path=None):
+        #* persist fingerprints only after the processed store has been written
+        path = path or Config.DATASET_MANIFEST
+        tmp_path = f'{path}.tmp-{os.getpid()}.npz'
+        np.savez(tmp_path, **self.manifest)
+        os.replace(tmp_path, path)
+
+
+class IngestService:
+    #* diffs the raw Eurostat files against the fingerprints of the last ingest
+    
+    def __init__(self, sources=None, manifest_path=None):
+        self.sources = sources or {
+            'immigration': Config.DATASET_IMMIGRATION,
+            'emigration': Config.DATASET_EMIGRATION
+        }
+        self.manifest_path = manifest_path or Config.DATASET_MANIFEST
+    
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return None
+        with np.load(self.manifest_path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+    
+    def compute_delta(self):
+        #* raw files are full snapshots, so once either changed both are parsed and hashed in full;
+        #* when both still carry the stamp of the last ingest nothing is read
+        previous = self._load_manifest()
+        stamps = {name: file_stamp(path) for name, path in self.sources.items()}
+        
+        if previous is not None and all(
+            np.array_equal(previous.get(f'{name}_stamp'), stamp) for name, stamp in stamps.items()
+        ):
+            logger.info("Ingest delta: raw files untouched since the last ingest")
+            return IngestDelta(pd.DataFrame(), pd.DataFrame(columns=['Country', 'Year']), None, False)
+        
+        raws, changed = {}, []
+        manifest = {'processed_stale': previous.get('processed_stale', np.int64(0)) if previous else np.int64(0)}
+        
+        for name, path in self.sources.items():
+            raw = pd.read_csv(path).drop_duplicates(subset=RAW_KEY)
+            current = pd.DataFrame({
+                'geo': raw['geo'].astype(str).to_numpy(),
+                'TIME_PERIOD': raw['TIME_PERIOD'].to_numpy(dtype=np.int64),
+                'hash': fingerprint(raw)
+            })
+            
+            if previous is not None and f'{name}_hash' in previous:
+                stored = pd.DataFrame({
+                    'geo': previous[f'{name}_geo'],
+                    'TIME_PERIOD': previous[f'{name}_period'],
+                    'hash': previous[f'{name}_hash']
+                })
+                diff = current.merge(stored, on=RAW_KEY, how='outer', suffixes=('', '_stored'), indicator=True)
+                changed.append(diff.loc[
+                    (diff['_merge'] != 'both') | (diff['hash'] != diff['hash_stored']), RAW_KEY
+                ])
+            else:
+                changed.append(current[RAW_KEY])
+            
+            raws[name] = raw
+            manifest[f'{name}_geo'] = current['geo'].to_numpy().astype(str)
+            manifest[f'{name}_period'] = current['TIME_PERIOD'].to_numpy()
+            manifest[f'{name}_hash'] = current['hash'].to_numpy()
+            manifest[f'{name}_stamp'] = stamps[name]
+        
+        affected = pd.concat(changed).drop_duplicates()
+        upserts = merge_sources(*(
+            raw.merge(affected, on=RAW_KEY, how='inner') for raw in raws.values()
+        ))
+        
+        affected_keys = pd.DataFrame({
+            'Country': affected['geo'].map(COUNTRY_MAPPING),
+            'Year': affected['TIME_PERIOD'].astype(np.int64)
+        }).dropna(subset=['Country'])
+        
+        logger.info(f"Ingest delta: {len(affected)} raw keys changed, {len(upserts)} processed rows")
+        return IngestDelta(upserts.reset_index(drop=True), affected_keys, manifest, previous is None)
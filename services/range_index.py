@@ -0,0 +1,179 @@
+import numpy as np
+
+METRICS = ('Im_Value', 'Em_Value', 'Net_Migration')
+
+# pairs whose cross-product prefixes back the correlation analysis
+PAIRS = tuple((a, b) for i, a in enumerate(METRICS) for b in METRICS[i + 1:])
+
+# int64 panels per country x year cell while building: count and METRICS, the derived panels
+# (signed net, squares, PAIRS products) and the prefix sums of both
+DENSE_PANELS = 1 + len(METRICS)
+DERIVED_PANELS = 4 + len(METRICS) + len(PAIRS)
+BYTES_PER_CELL = 8 * 2 * (DENSE_PANELS + DERIVED_PANELS)
+
+# peak memory one index may take per worker, larger panels are left to the pandas fallback
+MAX_BYTES = 256 * 1024 * 1024
+MAX_CELLS = MAX_BYTES // BYTES_PER_CELL
+
+
+class RangeIndex:
+    #* per-country prefix sums over years, any year range is hi - lo per country
+
+    def __init__(self, df, countries, country_positions):
+        years = df['Year'].to_numpy(dtype=np.int64)
+
+        self.countries = countries
+        self.country_positions = country_positions
+        self.first_year = int(years.min())
+        self.last_year = int(years.max())
+        self.span = self.last_year - self.first_year + 1
+
+        rows = np.searchsorted(countries, df['Country'].to_numpy())
+        self.values, self.prefix = self._panels(df, rows, len(countries))
+        self.year_totals = {name: matrix.sum(axis=0) for name, matrix in self.values.items()}
+
+    @classmethod
+    def build(cls, df, filter_index):
+        #* None when the panel cannot be represented densely (duplicate keys, too large)
+        if not cls._fits(df, filter_index):
+            return None
+        return cls(df, filter_index.countries, filter_index.country_ids)
+
+    def updated(self, df, filter_index, changed):
+        #* copy with the rows of the `changed` countries rebuilt from df, every other row is
+        #* copied over (shifted when the year span moved), readers of self are untouched
+        if not self._fits(df, filter_index):
+            return None
+
+        ranges = RangeIndex.__new__(RangeIndex)
+        ranges.countries = filter_index.countries
+        ranges.country_positions = filter_index.country_ids
+        ranges.first_year = int(filter_index.years[0])
+        ranges.last_year = int(filter_index.years[-1])
+        ranges.span = ranges.last_year - ranges.first_year + 1
+
+        # np.isin / setdiff1d fall back to pairwise comparison on object arrays, sets stay linear
+        changed = set(changed)
+        kept = np.asarray([c for c in self.countries if c not in changed], dtype=object)
+        changed = np.asarray(sorted(c for c in changed if c in ranges.country_positions), dtype=object)
+
+        if ranges.first_year == self.first_year and ranges.span == self.span and \
+                np.array_equal(ranges.countries, self.countries):
+            # same layout (no country or year came or went), plain copies
+            ranges.values = {name: matrix.copy() for name, matrix in self.values.items()}
+            ranges.prefix = {name: matrix.copy() for name, matrix in self.prefix.items()}
+        else:
+            ranges._moved_from(self, kept)
+
+        if len(changed):
+            rows = df.iloc[filter_index.resolve(countries=changed.tolist())]
+            values, prefix = ranges._panels(rows, np.searchsorted(changed, rows['Country'].to_numpy()), len(changed))
+            target = np.searchsorted(ranges.countries, changed)
+            for name, matrix in values.items():
+                ranges.values[name][target] = matrix
+            for name, matrix in prefix.items():
+                ranges.prefix[name][target] = matrix
+
+        ranges.year_totals = {name: matrix.sum(axis=0) for name, matrix in ranges.values.items()}
+        return ranges
+
+    def _moved_from(self, old, kept):
+        #* copy the kept countries' rows of `old` into this layout
+        #* new column j is old column j + offset, kept countries have no data outside either span
+        old_rows = np.searchsorted(old.countries, kept)
+        new_rows = np.searchsorted(self.countries, kept)
+        offset = self.first_year - old.first_year
+        source = np.arange(self.span + 1) + offset
+        value_cols = np.flatnonzero((source[:-1] >= 0) & (source[:-1] < old.span))
+        prefix_cols = np.clip(source, 0, old.span)
+
+        shape = (len(self.countries), self.span)
+        self.values = {}
+        for name, matrix in old.values.items():
+            values = np.zeros(shape, dtype=np.int64)
+            values[np.ix_(new_rows, value_cols)] = matrix[np.ix_(old_rows, value_cols + offset)]
+            self.values[name] = values
+        self.prefix = {}
+        for name, matrix in old.prefix.items():
+            prefix = np.zeros((shape[0], shape[1] + 1), dtype=np.int64)
+            prefix[new_rows] = matrix[np.ix_(old_rows, prefix_cols)]
+            self.prefix[name] = prefix
+
+    @staticmethod
+    def _fits(df, filter_index):
+        if df.empty or np.any(np.diff(filter_index.keys) == 0):
+            return False
+        span = int(filter_index.years[-1]) - int(filter_index.years[0]) + 1
+        return len(filter_index.countries) * span <= MAX_CELLS
+
+    def _panels(self, df, rows, n_rows):
+        #* dense value panels and their prefix sums for `n_rows` countries, df rows mapped by `rows`
+        cols = df['Year'].to_numpy(dtype=np.int64) - self.first_year
+        shape = (n_rows, self.span)
+
+        values = {'count': self._dense(shape, rows, cols, 1)}
+        for column in METRICS:
+            values[column] = self._dense(shape, rows, cols, df[column].to_numpy(dtype=np.int64))
+
+        net = values['Net_Migration']
+        derived = {
+            'pos_net': np.where(net > 0, net, 0),
+            'pos_count': (net > 0).astype(np.int64),
+            'neg_net': np.where(net < 0, net, 0),
+            'neg_count': (net < 0).astype(np.int64)
+        }
+        for column in METRICS:
+            derived[f'{column}_sq'] = values[column] ** 2
+        for a, b in PAIRS:
+            derived[f'{a}*{b}'] = values[a] * values[b]
+
+        prefix = {
+            name: self._cumulative(matrix)
+            for name, matrix in {**values, **derived}.items()
+        }
+        return values, prefix
+
+    @staticmethod
+    def _dense(shape, rows, cols, values):
+        matrix = np.zeros(shape, dtype=np.int64)
+        matrix[rows, cols] = values
+        return matrix
+
+    @staticmethod
+    def _cumulative(matrix):
+        out = np.zeros((matrix.shape[0], matrix.shape[1] + 1), dtype=np.int64)
+        np.cumsum(matrix, axis=1, out=out[:, 1:])
+        return out
+
+    def country_ids(self, countries=None):
+        #* None selects every country
+        if not countries:
+            return None
+        return np.asarray(
+            sorted({self.country_positions[c] for c in countries if c in self.country_positions}),
+            dtype=np.int64
+        )
+
+    def year_bounds(self, start_year=None, end_year=None):
+        #* half-open column range [lo, hi) clipped to the panel
+        lo = (start_year - self.first_year) if start_year else 0
+        hi = (end_year - self.first_year + 1) if end_year else self.span
+        lo = min(max(lo, 0), self.span)
+        hi = min(max(hi, lo), self.span)
+        return lo, hi
+
+    def range_sums(self, name, ids, lo, hi):
+        #* per-country sums over the year range, two lookups and a subtraction each
+        prefix = self.prefix[name]
+        if ids is None:
+            return prefix[:, hi] - prefix[:, lo]
+        return prefix[ids, hi] - prefix[ids, lo]
+
+    def per_year_sums(self, name, ids, lo, hi):
+        #* per-year sums over the selected countries
+        if ids is None:
+            return self.year_totals[name][lo:hi]
+        return self.values[name][ids, lo:hi].sum(axis=0)
+
+    def years(self, lo, hi):
+        return np.arange(self.first_year + lo, self.first_year + hi, dtype=np.int64)
@@ -0,0 +1,28 @@
+import numpy as np
+
+
+class RankTable:
+    #* positions ordered by (group, value), any rank window within a group is a slice
+    #* ties keep row order, like nlargest / nsmallest with keep='first'
+    
+    def __init__(self, values, groups=None, ascending=False):
+        if groups is None:
+            groups = np.zeros(len(values), dtype=np.int64)
+        
+        key = values if ascending else -values
+        self.order = np.lexsort((key, groups))
+        self.order.flags.writeable = False
+        
+        self.groups, starts = np.unique(groups[self.order], return_index=True)
+        self.starts = starts
+        self.stops = np.append(starts[1:], len(values))
+    
+    def window(self, group=None, offset=0, limit=10):
+        #* positions of ranks [offset, offset + limit) within the group
+        i = int(np.searchsorted(self.groups, 0 if group is None else group))
+        if i >= len(self.groups) or self.groups[i] != (0 if group is None else group):
+            return self.order[:0]
+        
+        start = min(int(self.starts[i]) + max(offset, 0), int(self.stops[i]))
+        stop = min(start + max(limit, 0), int(self.stops[i]))
+        return self.order[start:stop]
@@ -0,0 +1,65 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+MAX_WINDOW = 50
+
+
+class RollingWindow:
+    #* rolling sum / mean / std and EWMA along the year axis of a dense country x year panel
+    #* every statistic is computed for all countries at once, windows span calendar years
+
+    def __init__(self, values, present, window, min_periods=None, span=None):
+        self.values = np.where(present, values, 0).astype(np.int64)
+        self.present = present
+        self.window = window
+        self.min_periods = min(min_periods or window, window)
+        self.span = span or window
+
+    def _window_sums(self, matrix):
+        #* prefix differences, column t covers years [t - window + 1, t]
+        prefix = np.zeros((matrix.shape[0], matrix.shape[1] + 1), dtype=matrix.dtype)
+        np.cumsum(matrix, axis=1, out=prefix[:, 1:])
+        stop = np.arange(1, matrix.shape[1] + 1)
+        start = np.maximum(stop - self.window, 0)
+        return prefix[:, stop] - prefix[:, start]
+
+    def compute(self):
+        counts = self._window_sums(self.present.astype(np.int64))
+        sums = self._window_sums(self.values)
+        valid = counts >= self.min_periods
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = sums / counts
+
+            # two-pass sample std over a strided view, no per-country loop
+            padded = np.full((self.values.shape[0], self.values.shape[1] + self.window - 1), np.nan)
+            padded[:, self.window - 1:] = np.where(self.present, self.values, np.nan)
+            windows = sliding_window_view(padded, self.window, axis=1)
+            deviations = windows - means[:, :, None]
+            stds = np.sqrt(np.nansum(deviations * deviations, axis=2) / (counts - 1))
+
+        stds[counts < 2] = np.nan
+
+        return {
+            'sum': np.where(valid, sums, np.nan),
+            'mean': np.where(valid, means, np.nan),
+            'std': np.where(valid, stds, np.nan),
+            'ewm': self._ewm()
+        }
+
+    def _ewm(self):
+        #* adjusted EWMA (pandas ewm(span=..., adjust=True)), missing years decay the weights
+        decay = 1 - 2 / (self.span + 1)
+        values = self.values.astype(np.float64)
+        weights = self.present.astype(np.float64)
+
+        numerator = np.zeros(values.shape[0])
+        denominator = np.zeros(values.shape[0])
+        out = np.empty_like(values)
+        # recursion runs along years only, each step is vectorized over countries
+        for t in range(values.shape[1]):
+            numerator = numerator * decay + values[:, t]
+            denominator = denominator * decay + weights[:, t]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                out[:, t] = numerator / denominator
+        return out
@@ -0,0 +1,91 @@
+import numpy as np
+
+METHODS = ('pearson', 'euclidean')
+
+MAX_K = 50
+
+# rows of the Gram matrix computed per block, bounds memory at BLOCK_ROWS x countries
+BLOCK_ROWS = 1024
+
+
+class SimilarityIndex:
+    #* k nearest countries by year-series shape, from blocks of one Gram matrix of z-scored series
+    #* missing years are imputed with the country mean (z = 0) so every series spans the same years
+
+    def __init__(self, countries, values, present, max_k=MAX_K):
+        self.countries = countries
+        counts = present.sum(axis=1)
+        values = np.where(present, values, 0).astype(np.float64)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = values.sum(axis=1) / counts
+            centered = np.where(present, values - means[:, None], 0.0)
+            stds = np.sqrt((centered * centered).sum(axis=1) / counts)
+            z = centered / stds[:, None]
+
+        # constant or single-year series have no shape to compare
+        self.valid = (counts > 1) & (stds > 0)
+        z[~self.valid] = 0.0
+        self.z = z
+        self.norms = (z * z).sum(axis=1)
+        self.k = min(max_k, max(int(self.valid.sum()) - 1, 0))
+        self._neighbours = {}
+
+    def _nearest(self, method):
+        #* (positions, scores) of the k best matches per country, best first
+        n, k = len(self.z), self.k
+        positions = np.zeros((n, k), dtype=np.int64)
+        scores = np.full((n, k), np.nan)
+        if k == 0:
+            return positions, scores
+
+        for start in range(0, n, BLOCK_ROWS):
+            stop = min(start + BLOCK_ROWS, n)
+            gram = self.z[start:stop] @ self.z.T
+
+            if method == 'pearson':
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    score = gram / np.sqrt(np.outer(self.norms[start:stop], self.norms))
+                rank = -score
+            else:
+                score = np.sqrt(np.maximum(self.norms[start:stop, None] + self.norms[None, :] - 2 * gram, 0))
+                rank = score
+
+            rank[:, ~self.valid] = np.inf
+            rank[np.arange(stop - start), np.arange(start, stop)] = np.inf
+
+            top = np.argpartition(rank, k - 1, axis=1)[:, :k]
+            # argpartition picks arbitrarily among candidates tied with the k-th, those rows are redone
+            # with a stable sort so ties are broken by country order and results are stable across runs
+            kth = np.take_along_axis(rank, top, axis=1).max(axis=1, keepdims=True)
+            ambiguous = (rank == kth).sum(axis=1) > (np.take_along_axis(rank, top, axis=1) == kth).sum(axis=1)
+            if ambiguous.any():
+                top[ambiguous] = np.argsort(rank[ambiguous], axis=1, kind='stable')[:, :k]
+            order = np.lexsort((top, np.take_along_axis(rank, top, axis=1)), axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+
+            positions[start:stop] = top
+            scores[start:stop] = np.take_along_axis(score, top, axis=1)
+
+        return positions, scores
+
+    def nearest(self, method, k, countries=None):
+        #* {country: [{'Country', score_name: score}, ...]} for valid countries
+        if method not in self._neighbours:
+            self._neighbours[method] = self._nearest(method)
+        positions, scores = self._neighbours[method]
+        k = min(k, self.k)
+        score_name = 'correlation' if method == 'pearson' else 'distance'
+
+        rows = np.flatnonzero(self.valid)
+        if countries is not None:
+            rows = rows[np.isin(self.countries[rows], countries)]
+
+        names = self.countries.tolist()
+        return {
+            names[row]: [
+                {'Country': names[position], score_name: score}
+                for position, score in zip(positions[row, :k].tolist(), scores[row, :k].tolist())
+            ]
+            for row in rows.tolist()
+        }
@@ -1,2 +1,37 @@
+import os
+import uuid
+import pytest
 
-#TODO dont forget to write tests 
\ No newline at end of file
+# app.py and asgi.py build their app from FLASK_ENV at import time
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+from app import create_app
+from benchmarks.common import make_panel
+from benchmarks.fake_firestore import install
+
+
+@pytest.fixture(scope='session')
+def panel():
+    #* 40 countries over 30 years with every fifth row dropped, so series have gaps and late starts
+    df = make_panel(40, 30)
+    return df[df.index % 5 != 0].reset_index(drop=True)
+
+
+@pytest.fixture
+def firestore():
+    #* in-process Firestore for both the sync and async clients, reads are counted
+    return install()
+
+
+@pytest.fixture
+def api_key(firestore):
+    # a fresh key per test, validation results are cached process-wide
+    key = f'test-{uuid.uuid4().hex}'
+    firestore.add_api_key(key)
+    return key
+
+
+@pytest.fixture
+def app(firestore):
+    #* pytest-flask builds `client` on it and pushes a request context around each test
+    return create_app('testing')
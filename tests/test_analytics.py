@@ -1,2 +1,193 @@
+import numpy as np
+import pandas as pd
+import pytest
+from services import range_index
+from services.analytics_service import AnalyticsService
+from services.data_service import DataService
+from utils.serializers import ColumnarJSONProvider, DataFrameJSONProvider
 
-#TODO dont forget to write tests 
\ No newline at end of file
+RANGE_FILTERS = [
+    {},
+    {'countries': ['C00003', 'C00017', 'missing']},
+    {'start_year': 1960},
+    {'end_year': 1955},
+    {'start_year': 1960, 'end_year': 1970, 'countries': ['C00000', 'C00024', 'C00039']},
+    {'start_year': 1900, 'end_year': 2100},
+    {'start_year': 2000}
+]
+
+
+@pytest.fixture
+def indexed(panel):
+    service = DataService(panel.copy())
+    assert service.ranges is not None
+    return AnalyticsService(service)
+
+
+@pytest.fixture
+def unindexed(panel, monkeypatch):
+    #* the pandas groupby path, taken when the panel exceeds the range index memory budget
+    monkeypatch.setattr(range_index, 'MAX_CELLS', 0)
+    service = DataService(panel.copy())
+    assert service.ranges is None
+    return AnalyticsService(service)
+
+
+def assert_same_records(result, expected):
+    if expected is None:
+        assert result is None
+        return
+    pd.testing.assert_frame_equal(pd.DataFrame(result), pd.DataFrame(expected), check_dtype=False)
+
+
+@pytest.mark.parametrize('filters', RANGE_FILTERS)
+def test_trends_from_the_range_index_match_pandas(indexed, unindexed, filters):
+    assert_same_records(indexed.get_trend_analysis(**filters), unindexed.get_trend_analysis(**filters))
+
+
+@pytest.mark.parametrize('filters', RANGE_FILTERS)
+def test_comparison_from_the_range_index_matches_pandas(indexed, unindexed, filters):
+    filters = {'countries': None, **filters}
+    assert_same_records(indexed.get_country_comparison(**filters), unindexed.get_country_comparison(**filters))
+
+
+@pytest.mark.parametrize('filters', RANGE_FILTERS)
+def test_balance_from_the_range_index_matches_pandas(indexed, unindexed, filters):
+    assert indexed.get_migration_balance(**filters) == unindexed.get_migration_balance(**filters)
+
+
+def response_body(provider, payload):
+    # compact as in production, the testing app is in debug mode and would indent
+    provider.compact = True
+    return provider.response(payload).get_data()
+
+
+def assert_same_json(app, payload):
+    #* the columnar provider must write byte for byte what to_dict('records') + json.dumps writes
+    assert response_body(ColumnarJSONProvider(app), payload) == response_body(DataFrameJSONProvider(app), payload)
+
+
+def test_columnar_json_matches_records_json(app):
+    frame = pd.DataFrame({
+        'Country': ['AUT', 'Ö"\\', None],
+        'Year': np.array([2010, 2011, 2012], dtype=np.int32),
+        'Growth': [np.nan, -0.0, 1 / 3],
+        'Ratio': [np.inf, -np.inf, 1e-300],
+        'Positive': [True, False, True],
+        'Rate %': [1.5, 2.5, np.nan]
+    })
+
+    assert_same_json(app, {'data': {'items': frame, 'count': np.int64(3)}, 'message': 'ok'})
+    assert_same_json(app, [frame.iloc[:0], frame[['Country']], frame])
+
+
+def test_columnar_json_matches_records_json_for_growth(app, panel):
+    # growth is NaN for every country's first year and after a zero
+    frame = AnalyticsService(DataService(panel.copy())).yearly_growth_frame()
+    assert frame['Net_Growth'].isna().any()
+
+    assert_same_json(app, {'data': frame})
+
+
+def post_batch(client, api_key, queries):
+    return client.post('/api/analytics/batch', json={'queries': queries}, headers={'X-API-KEY': api_key})
+
+
+def test_batch_reports_errors_per_sub_query(client, api_key, monkeypatch):
+    def broken(self, *args, **kwargs):
+        raise RuntimeError('sketch unavailable')
+    monkeypatch.setattr(AnalyticsService, 'get_distribution_stats', broken)
+
+    response = post_batch(client, api_key, [
+        {'id': 'ok', 'type': 'trends', 'country_codes': ['AUT']},
+        {'id': 'unknown type', 'type': 'median'},
+        {'id': 'bad year', 'type': 'balance', 'start_year': 1066},
+        {'id': 'no countries', 'type': 'comparison'},
+        {'id': 'no data', 'type': 'trends', 'country_codes': ['XXX']},
+        {'id': 'broken', 'type': 'distribution'},
+        {'type': 'balance', 'country_codes': ['AUT']}
+    ])
+
+    assert response.status_code == 200
+    results = response.get_json()['data']['results']
+    assert [(r['id'], r['status']) for r in results] == [
+        ('ok', 200), ('unknown type', 400), ('bad year', 400), ('no countries', 400),
+        ('no data', 404), ('broken', 500), (None, 200)
+    ]
+    assert set(results[1]['details']) == {'type'}
+    assert set(results[2]['details']) == {'start_year'}
+    assert results[3]['error'] == 'Country codes required'
+    assert results[5]['error'] == 'Failed to fetch distribution'
+
+
+def test_batch_results_match_the_get_endpoints(client, api_key):
+    headers = {'X-API-KEY': api_key}
+    results = post_batch(client, api_key, [
+        {'type': 'trends', 'country_codes': ['FRA', 'AUT'], 'start_year': 2014},
+        {'type': 'top', 'metric': 'immigration', 'limit': 5},
+        {'type': 'balance', 'country_codes': ['AUT', 'FRA']}
+    ]).get_json()['data']['results']
+
+    for result, url in zip(results, [
+        '/api/analytics/trends?country_codes=FRA&country_codes=AUT&start_year=2014',
+        '/api/analytics/top?metric=immigration&limit=5',
+        '/api/analytics/balance?country_codes=AUT&country_codes=FRA'
+    ]):
+        assert result['data'] == client.get(url, headers=headers).get_json()['data']
+
+
+@pytest.mark.parametrize('body', [{}, {'queries': []}, {'queries': [{'type': 'trends'}] * 21}, {'queries': 'trends'}])
+def test_malformed_batches_get_400(client, api_key, body):
+    response = client.post('/api/analytics/batch', json=body, headers={'X-API-KEY': api_key})
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Validation failed'
+
+
+def pandas_top(df, column, limit, year, order, offset):
+    #* what /top did before rank tables: nlargest / nsmallest over the year or the country totals
+    if year:
+        df = df[df['Year'] == year]
+    else:
+        df = df.groupby('Country')[['Im_Value', 'Em_Value', 'Net_Migration']].sum().reset_index()
+    pick = df.nlargest if order == 'desc' else df.nsmallest
+    return pick(offset + limit, column).iloc[offset:]
+
+
+@pytest.mark.parametrize('metric, column', [('net', 'Net_Migration'), ('immigration', 'Im_Value')])
+@pytest.mark.parametrize('year', [None, 1965, 2100])
+@pytest.mark.parametrize('order', ['desc', 'asc'])
+@pytest.mark.parametrize('limit, offset', [(10, 0), (5, 7), (10, 1000)])
+def test_top_from_rank_tables_matches_nlargest(panel, metric, column, year, order, limit, offset):
+    df = panel.copy()
+    # coarse values, so ranks are full of ties
+    df[column] = df[column] // 100_000
+    service = DataService(df)
+
+    result = AnalyticsService(service).top_countries_frame(metric, limit, year, order, offset)
+
+    expected = pandas_top(service.get_all_data(), column, limit, year, order, offset)
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False)
+
+
+@pytest.mark.parametrize('filters', RANGE_FILTERS + [{'start_year': 1979}, {'countries': ['C00005']}])
+@pytest.mark.parametrize('by_country', [False, True])
+def test_correlation_from_sufficient_statistics_matches_pandas(panel, monkeypatch, filters, by_country):
+    df = panel.copy()
+    # a constant series and single-row ranges (start_year 1979) have no correlation, NaN in both
+    df.loc[df['Country'] == 'C00005', 'Im_Value'] = 500
+    indexed = AnalyticsService(DataService(df.copy()))
+    monkeypatch.setattr(range_index, 'MAX_CELLS', 0)
+    unindexed = AnalyticsService(DataService(df.copy()))
+
+    result = indexed.get_correlation_analysis(**filters, by_country=by_country)
+    expected = unindexed.get_correlation_analysis(**filters, by_country=by_country)
+
+    if expected is None:
+        assert result is None
+        return
+    if not by_country:
+        result, expected = {'all': result}, {'all': expected}
+    assert result.keys() == expected.keys()
+    for key in expected:
+        pd.testing.assert_frame_equal(pd.DataFrame(result[key]), pd.DataFrame(expected[key]), rtol=1e-9)
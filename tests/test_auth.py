@@ -1,2 +1,162 @@
+import asyncio
+import json
+import multiprocessing
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from middleware.rate_limit_storage import SQLiteStorage
+from middleware.request_cost import ENDPOINT_WEIGHTS, cost_for_rows
 
-#TODO dont forget to write tests 
\ No newline at end of file
+
+@pytest.fixture
+def application(firestore):
+    from asgi import application
+    return application
+
+
+def asgi_get(application, path, headers=()):
+    #* one GET through the ASGI stack, returns (status, headers, body)
+    scope = {
+        'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'root_path': '',
+        'http_version': '1.1', 'scheme': 'http', 'server': ('testserver', 80), 'client': ('127.0.0.1', 50000),
+        'headers': [(name.encode('latin1'), value.encode('latin1')) for name, value in headers]
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    start, body = messages[0], b''.join(message.get('body', b'') for message in messages[1:])
+    return start['status'], dict(start['headers']), body
+
+
+def test_asgi_validates_the_key_once_on_the_event_loop(application, firestore, api_key):
+    status, _, body = asgi_get(application, '/api/migration/years', [('x-api-key', api_key)])
+
+    assert status == 200
+    assert json.loads(body)['data']
+    # the async client read the key, require_api_key trusted it instead of reading again
+    assert firestore.reads == 1
+
+
+def test_asgi_rejects_an_unknown_key_before_the_pool(application, firestore):
+    status, _, body = asgi_get(application, '/api/migration/years', [('x-api-key', 'unknown')])
+
+    assert status == 401
+    assert json.loads(body) == {'error': 'Invalid or expired API key'}
+
+
+def test_asgi_sheds_requests_beyond_max_pending(application, monkeypatch):
+    bridge = application.app
+    monkeypatch.setattr(bridge, 'pending', bridge.max_pending)
+
+    status, headers, body = asgi_get(application, '/ping')
+
+    assert status == 503
+    assert headers[b'retry-after'] == b'1'
+    assert json.loads(body) == {'error': 'Server busy'}
+    assert bridge.pending == bridge.max_pending
+
+
+def increment(uri, times):
+    storage = SQLiteStorage(uri)
+    return [storage.incr('counter', 60) for _ in range(times)]
+
+
+def acquire(uri, attempts, limit):
+    storage = SQLiteStorage(uri)
+    return sum(storage.acquire_sliding_window_entry('window', limit, 3600, amount=3) for _ in range(attempts))
+
+
+def test_sqlite_counters_add_up_across_workers_and_threads(tmp_path):
+    uri = f'sqlite:///{tmp_path}/ratelimit.db'
+    with multiprocessing.get_context('fork').Pool(4) as pool:
+        processes = pool.starmap(increment, [(uri, 50)] * 4)
+    with ThreadPoolExecutor(4) as executor:
+        threads = list(executor.map(lambda _: increment(uri, 50), range(4)))
+
+    seen = sorted(value for values in processes + threads for value in values)
+    # every increment saw a distinct running total, none was lost
+    assert seen == list(range(1, 401))
+    assert SQLiteStorage(uri).get('counter') == 400
+
+
+def test_sqlite_sliding_window_never_admits_past_the_limit(tmp_path):
+    uri = f'sqlite:///{tmp_path}/ratelimit.db'
+    with multiprocessing.get_context('fork').Pool(4) as pool:
+        admitted = sum(pool.starmap(acquire, [(uri, 40, 100)] * 4))
+
+    # 160 requests of cost 3 against 100 units, 33 fit
+    assert admitted == 33
+    assert SQLiteStorage(uri).get_sliding_window('window', 3600)[2] == 99
+
+
+def cost_of(response):
+    return int(response.headers['X-RateLimit-Cost'])
+
+
+def test_request_cost_follows_the_selected_rows(app, client, api_key):
+    headers = {'X-API-KEY': api_key}
+    rows = app.extensions['services'].snapshot.data.count()
+
+    everything = client.get('/api/analytics/correlation', headers=headers)
+    one_country = client.get('/api/analytics/correlation?country_codes=AUT', headers=headers)
+
+    assert cost_of(everything) == cost_for_rows(rows, ENDPOINT_WEIGHTS['analytics.get_correlation']) > 1
+    assert 1 < cost_of(one_country) < cost_of(everything)
+    remaining = int(everything.headers['X-RateLimit-Remaining']) - int(one_country.headers['X-RateLimit-Remaining'])
+    assert remaining == cost_of(one_country)
+
+
+def test_cache_hits_and_304s_cost_one(client, api_key):
+    headers = {'X-API-KEY': api_key}
+    first = client.get('/api/analytics/distribution', headers=headers)
+    cached = client.get('/api/analytics/distribution', headers=headers)
+    revalidated = client.get('/api/analytics/distribution', headers={**headers, 'If-None-Match': first.headers['ETag']})
+
+    assert cost_of(first) > 1
+    assert cost_of(cached) == 1
+    assert revalidated.status_code == 304
+    assert cost_of(revalidated) == 1
+
+
+def test_batches_cost_the_sum_of_their_queries(client, api_key):
+    headers = {'X-API-KEY': api_key}
+    trends = client.get('/api/analytics/trends?country_codes=AUT', headers=headers)
+    correlation = client.get('/api/analytics/correlation', headers=headers)
+
+    batch = client.post('/api/analytics/batch', headers=headers, json={'queries': [
+        {'type': 'trends', 'country_codes': ['AUT']}, {'type': 'correlation'}, {'type': 'median'}, {'type': 'top'}
+    ]})
+
+    assert cost_of(batch) == cost_of(trends) + cost_of(correlation) + 1 + 1
+
+
+def test_unauthenticated_requests_cost_one_without_a_lookup(client, firestore):
+    # unknown keys are remembered process-wide, this one is new to the cache
+    rejected = client.get('/api/analytics/correlation', headers={'X-API-KEY': f'unknown-{uuid.uuid4().hex}'})
+    ping = client.get('/ping', headers={'X-API-KEY': 'anything'})
+
+    assert rejected.status_code == 401
+    assert cost_of(rejected) == 1
+    assert ping.status_code == 200
+    assert cost_of(ping) == 1
+    # only require_api_key on the analytics route read the key document
+    assert firestore.reads == 1
+
+
+def test_requests_beyond_the_unit_budget_get_429(app, client, api_key, monkeypatch):
+    headers = {'X-API-KEY': api_key}
+    correlation = client.get('/api/analytics/correlation', headers=headers)
+    budget = cost_of(correlation) + 1
+    monkeypatch.setitem(app.config['RATE_LIMIT_TIERS'], 'default', f'{budget} per hour')
+
+    allowed = client.get('/api/analytics/correlation?country_codes=AUT&country_codes=FRA', headers=headers)
+    refused = client.get('/api/analytics/distribution', headers=headers)
+
+    assert allowed.status_code == 200
+    assert refused.status_code == 429
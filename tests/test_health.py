@@ -1,2 +1,29 @@
+import pytest
 
-#TODO dont forget to write tests 
\ No newline at end of file
+
+def test_health_reports_the_snapshot_but_no_key_cache(client):
+    data = client.get('/health').get_json()['data']
+
+    assert data['status'] == 'healthy'
+    assert data['snapshot']['version']
+    assert 'api_key_cache' not in data
+
+
+@pytest.mark.parametrize('password', ['', 'admin123', 'secure-password'])
+def test_admin_is_disabled_without_a_real_password(app, client, password):
+    app.config['ADMIN_PASSWORD'] = password
+
+    response = client.get('/api/admin/dataset', auth=(app.config['ADMIN_USERNAME'], password))
+
+    assert response.status_code == 503
+
+
+def test_admin_dataset_shows_the_key_cache_to_admins_only(app, client):
+    app.config['ADMIN_PASSWORD'] = 'a-real-password'
+    username = app.config['ADMIN_USERNAME']
+
+    assert client.get('/api/admin/dataset').status_code == 401
+    assert client.get('/api/admin/dataset', auth=(username, 'wrong')).status_code == 401
+    response = client.get('/api/admin/dataset', auth=(username, 'a-real-password'))
+    assert response.status_code == 200
+    assert set(response.get_json()['data']['api_key_cache']) >= {'invalid'}
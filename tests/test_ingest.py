@@ -0,0 +1,214 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+from config import Config
+from services.data_service import DataService
+from services.ingest_service import IngestService, fingerprint, ingest_lock, merge_sources
+
+RAW_COLUMNS = [
+    'DATAFLOW', 'LAST UPDATE', 'freq', 'citizen', 'agedef', 'age', 'unit', 'sex',
+    'geo', 'TIME_PERIOD', 'OBS_VALUE', 'OBS_FLAG', 'CONF_STATUS'
+]
+
+
+def raw_frame(values, last_update='01/01/24 23:00:00'):
+    #* raw Eurostat rows from {(geo, year): value}
+    return pd.DataFrame([
+        ['ESTAT:TPS00176(1.0)', last_update, 'A', 'TOTAL', 'COMPLET', 'TOTAL', 'NR', 'T', geo, year, value, '', '']
+        for (geo, year), value in values.items()
+    ], columns=RAW_COLUMNS)
+
+
+def base_values():
+    return {(geo, year): 1000 * i + year - 2000 for i, geo in enumerate(['AT', 'DE', 'FR']) for year in range(2010, 2016)}
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    #* processed, binary store and manifest paths in tmp_path, raw files written by the returned function
+    paths = {
+        'DATASET_IMMIGRATION': str(tmp_path / 'immigration.csv'),
+        'DATASET_EMIGRATION': str(tmp_path / 'emigration.csv'),
+        'DATASET_PROCESSED': str(tmp_path / 'processed.csv'),
+        'DATASET_BINARY': str(tmp_path / 'store'),
+        'DATASET_MANIFEST': str(tmp_path / 'manifest.npz')
+    }
+    for name, path in paths.items():
+        monkeypatch.setattr(Config, name, path)
+
+    def write(immigration, emigration):
+        for path, values in ((paths['DATASET_IMMIGRATION'], immigration), (paths['DATASET_EMIGRATION'], emigration)):
+            raw_frame(values).to_csv(path, index=False)
+            # a rewrite within the same mtime tick must still change the stamp
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    return write
+
+
+def fresh_service():
+    return DataService(merge_sources(pd.read_csv(Config.DATASET_IMMIGRATION), pd.read_csv(Config.DATASET_EMIGRATION)))
+
+
+def assert_same_as_fresh(service):
+    fresh = fresh_service()
+    pd.testing.assert_frame_equal(service.df, fresh.df, check_dtype=False)
+    assert service.version == fresh.version
+    assert service.cube.country_summaries == fresh.cube.country_summaries
+    assert service.cube.year_summaries == fresh.cube.year_summaries
+    assert service.cube.statistics == fresh.cube.statistics
+    for name, prefix in fresh.ranges.prefix.items():
+        assert np.array_equal(service.ranges.prefix[name], prefix)
+
+
+def test_fingerprint_ignores_last_update():
+    values = base_values()
+    assert np.array_equal(
+        fingerprint(raw_frame(values, '01/01/24 23:00:00')),
+        fingerprint(raw_frame(values, '02/02/25 11:00:00'))
+    )
+
+
+def test_fingerprint_changes_with_value():
+    values = base_values()
+    changed = {**values, ('DE', 2012): 1}
+    hashes, changed_hashes = fingerprint(raw_frame(values)), fingerprint(raw_frame(changed))
+    differs = raw_frame(values)[hashes != changed_hashes]
+    assert differs[['geo', 'TIME_PERIOD']].values.tolist() == [['DE', 2012]]
+
+
+def test_first_delta_is_full(dataset):
+    dataset(base_values(), base_values())
+    delta = IngestService().compute_delta()
+    assert delta.full
+    assert len(delta.upserts) == 18
+
+
+def test_untouched_files_give_empty_delta(dataset):
+    dataset(base_values(), base_values())
+    IngestService().compute_delta().commit()
+    delta = IngestService().compute_delta()
+    assert delta.is_empty and delta.manifest is None
+
+
+def test_rewritten_identical_files_give_empty_delta(dataset):
+    dataset(base_values(), base_values())
+    IngestService().compute_delta().commit()
+    dataset(base_values(), base_values())
+    delta = IngestService().compute_delta()
+    assert delta.is_empty and not delta.full
+
+
+def test_delta_holds_changed_and_added_keys(dataset):
+    dataset(base_values(), base_values())
+    IngestService().compute_delta().commit()
+
+    immigration = {**base_values(), ('DE', 2012): 5, ('FR', 2016): 7}
+    dataset(immigration, {**base_values(), ('FR', 2016): 3})
+    delta = IngestService().compute_delta()
+
+    assert sorted(map(tuple, delta.affected[['Country', 'Year']].values.tolist())) == [('DEU', 2012), ('FRA', 2016)]
+    upserts = delta.upserts.set_index(['Country', 'Year'])
+    assert upserts.loc[('DEU', 2012), 'Im_Value'] == 5
+    assert upserts.loc[('FRA', 2016), 'Net_Migration'] == 4
+
+
+def test_delta_marks_removed_keys_without_upsert(dataset):
+    dataset(base_values(), base_values())
+    IngestService().compute_delta().commit()
+
+    values = base_values()
+    del values[('AT', 2011)]
+    dataset(values, base_values())
+    delta = IngestService().compute_delta()
+
+    assert delta.affected[['Country', 'Year']].values.tolist() == [['AUT', 2011]]
+    assert delta.upserts.empty
+
+
+def test_ingest_matches_fresh_load(dataset):
+    dataset(base_values(), base_values())
+    service = DataService()
+    service.ingest()
+
+    immigration = {**base_values(), ('DE', 2012): 5, ('FR', 2016): 7, ('FR', 2008): 9}
+    emigration = {**base_values(), ('FR', 2016): 3, ('FR', 2008): 1}
+    dataset(immigration, emigration)
+    summary = service.ingest()
+
+    assert summary['upserted'] == 3 and summary['removed'] == 0
+    assert summary['countries'] == ['DEU', 'FRA']
+    assert_same_as_fresh(service)
+
+
+def test_ingest_removes_rows_and_countries(dataset):
+    dataset(base_values(), base_values())
+    service = DataService()
+    service.ingest()
+
+    values = {key: value for key, value in base_values().items() if key[0] != 'AT' and key != ('DE', 2010)}
+    dataset(values, base_values())
+    summary = service.ingest()
+
+    assert summary['removed'] == 7
+    assert 'AUT' not in service.get_available_countries()
+    assert_same_as_fresh(service)
+
+    # what a restarted worker loads from the rewritten CSV
+    reloaded = pd.read_csv(Config.DATASET_PROCESSED)
+    assert len(reloaded) == len(service.df)
+    assert not ((reloaded['Country'] == 'DEU') & (reloaded['Year'] == 2010)).any()
+
+
+def test_ingest_appends_then_compacts_superseded_rows(dataset):
+    values = {(geo, year): 100 for geo in ['AT', 'DE', 'FR', 'IT'] for year in range(2010, 2020)}
+    dataset(values, values)
+    service = DataService()
+    service.ingest()
+    lines = len(pd.read_csv(Config.DATASET_PROCESSED))
+
+    # 2 changed rows out of 40 stay under the compaction ratio, they are appended
+    dataset({**values, ('DE', 2015): 1, ('DE', 2016): 1}, values)
+    service.ingest()
+    assert len(pd.read_csv(Config.DATASET_PROCESSED)) == lines + 2
+
+    # another 10 superseded rows pass it, the file is rewritten with live rows only
+    dataset({**values, ('DE', 2015): 1, ('DE', 2016): 1, **{('IT', year): 2 for year in range(2010, 2020)}}, values)
+    service.ingest()
+    assert len(pd.read_csv(Config.DATASET_PROCESSED)) == lines
+    assert_same_as_fresh(service)
+
+
+def test_ingest_reloads_a_frame_another_process_ingested_over(dataset):
+    dataset(base_values(), base_values())
+    first = DataService()
+    first.ingest()
+    second = DataService()
+
+    dataset({**base_values(), ('DE', 2012): 5}, base_values())
+    first.ingest()
+    dataset({**base_values(), ('DE', 2012): 5, ('FR', 2013): 6}, base_values())
+    summary = second.ingest()
+
+    # the delta is against the manifest first committed, second must not drop DE 2012
+    assert summary['countries'] == ['FRA']
+    assert_same_as_fresh(second)
+    # and a restarted worker loads the same from disk
+    assert DataService().version == second.version
+
+
+def test_ingest_waits_for_the_lock(dataset):
+    dataset(base_values(), base_values())
+    service = DataService()
+    dataset({**base_values(), ('DE', 2012): 5}, base_values())
+
+    with ingest_lock():
+        worker = threading.Thread(target=service.ingest)
+        worker.start()
+        worker.join(0.3)
+        assert worker.is_alive()
+    worker.join(10)
+    assert not worker.is_alive()
+    assert_same_as_fresh(service)
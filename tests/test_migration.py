@@ -1,2 +1,144 @@
+import pandas as pd
+import pytest
+from services.data_service import DataService
+from utils.helpers import encode_cursor
 
-#TODO dont forget to write tests 
\ No newline at end of file
+FILTERS = [
+    {},
+    {'countries': ['C00003', 'C00017']},
+    {'countries': ['C00017', 'C00003', 'C00017', 'missing']},
+    {'countries': ['missing']},
+    {'start_year': 1960},
+    {'end_year': 1955},
+    {'start_year': 1960, 'end_year': 1970, 'countries': ['C00000', 'C00024', 'C00039']},
+    {'start_year': 1970, 'end_year': 1960},
+    {'year': 1965},
+    {'year': 1965, 'countries': ['C00011']},
+    {'start_year': 1900, 'end_year': 2100}
+]
+
+
+def pandas_filter(df, countries=None, start_year=None, end_year=None, year=None):
+    #* what filter_data did before the index, boolean masks over the whole frame
+    if year:
+        start_year = end_year = year
+    mask = pd.Series(True, index=df.index)
+    if countries:
+        mask &= df['Country'].isin(countries)
+    if start_year:
+        mask &= df['Year'] >= start_year
+    if end_year:
+        mask &= df['Year'] <= end_year
+    return df[mask].sort_values(['Country', 'Year']).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_filter_data_matches_pandas_masks(panel, filters):
+    result = DataService(panel.copy()).filter_data(**filters)
+
+    pd.testing.assert_frame_equal(
+        result.reset_index(drop=True), pandas_filter(panel, **filters), check_dtype=False
+    )
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_count_matches_pandas_masks(panel, filters):
+    assert DataService(panel.copy()).count(**filters) == len(pandas_filter(panel, **filters))
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_keyset_pages_cover_the_filter_exactly_once(panel, filters):
+    service = DataService(panel.copy())
+    pages, after = [], None
+    while True:
+        page, after = service.get_page_after(after, 7, **filters)
+        pages.append(page)
+        if after is None:
+            break
+
+    pd.testing.assert_frame_equal(
+        pd.concat(pages).reset_index(drop=True), service.filter_data(**filters).reset_index(drop=True)
+    )
+
+
+def test_cursor_pages_follow_next_cursor_to_the_end(client, api_key):
+    headers = {'X-API-KEY': api_key}
+    first = client.get('/api/migration/data?pagination=cursor&per_page=50&country_codes=AUT&country_codes=FRA',
+                       headers=headers).get_json()['data']
+    rows, cursor = first['items'], first['pagination']['next_cursor']
+    while cursor:
+        page = client.get(f'/api/migration/data?cursor={cursor}&per_page=50', headers=headers).get_json()['data']
+        rows += page['items']
+        cursor = page['pagination']['next_cursor']
+
+    offset = client.get('/api/migration/data?per_page=1000&country_codes=AUT&country_codes=FRA',
+                        headers=headers).get_json()['data']
+    assert rows == offset['items']
+
+
+@pytest.mark.parametrize('cursor', [
+    'not-a-cursor',
+    encode_cursor(['AUT', 2015]),
+    encode_cursor({'filters': {}, 'after': ['AUT']}),
+    encode_cursor({'filters': {'year': '2015'}, 'after': ['AUT', 2015]}),
+    encode_cursor({'filters': {'start_year': True}, 'after': ['AUT', 2015]}),
+    encode_cursor({'filters': {'countries': 'AUT'}, 'after': ['AUT', 2015]}),
+    encode_cursor({'filters': {'region': 'EU'}, 'after': ['AUT', 2015]}),
+    encode_cursor({'filters': {}, 'after': ['AUT', 2015.5]})
+])
+def test_data_rejects_cursors_it_did_not_issue(client, api_key, cursor):
+    response = client.get(f'/api/migration/data?cursor={cursor}', headers={'X-API-KEY': api_key})
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid cursor'
+
+
+@pytest.mark.parametrize('query', ['per_page=0', 'per_page=-5', 'per_page=0&pagination=cursor'])
+def test_data_rejects_per_page_below_one(client, api_key, query):
+    response = client.get(f'/api/migration/data?{query}', headers={'X-API-KEY': api_key})
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'per_page must be at least 1'
+
+
+def test_cached_routes_send_a_strong_etag_and_vary_on_the_key(client, api_key):
+    response = client.get('/api/migration/data?country_codes=AUT&per_page=10', headers={'X-API-KEY': api_key})
+
+    assert response.status_code == 200
+    etag, weak = response.get_etag()
+    assert etag and not weak
+    assert 'X-API-KEY' in response.vary
+    assert response.cache_control.must_revalidate
+
+
+def test_equivalent_queries_share_an_etag(client, api_key):
+    headers = {'X-API-KEY': api_key}
+    first = client.get('/api/migration/data?country_codes=AUT&country_codes=FRA', headers=headers)
+    reordered = client.get('/api/migration/data?country_codes=FRA&country_codes=AUT&per_page=100', headers=headers)
+    other = client.get('/api/migration/data?country_codes=AUT', headers=headers)
+
+    assert first.headers['ETag'] == reordered.headers['ETag'] != other.headers['ETag']
+    assert first.get_data() == reordered.get_data()
+
+
+def test_matching_if_none_match_gets_304(client, api_key):
+    headers = {'X-API-KEY': api_key}
+    etag = client.get('/api/migration/year/2015', headers=headers).headers['ETag']
+
+    for if_none_match in (etag, f'W/{etag}', f'"other", {etag}'):
+        response = client.get('/api/migration/year/2015', headers={**headers, 'If-None-Match': if_none_match})
+        assert response.status_code == 304
+        assert response.get_data() == b''
+        assert response.headers['ETag'] == etag
+        assert 'X-API-KEY' in response.vary
+
+    stale = client.get('/api/migration/year/2015', headers={**headers, 'If-None-Match': '"other"'})
+    assert stale.status_code == 200
+
+
+def test_304_needs_a_valid_key(client, api_key):
+    etag = client.get('/api/migration/countries', headers={'X-API-KEY': api_key}).headers['ETag']
+
+    response = client.get('/api/migration/countries', headers={'X-API-KEY': 'unknown', 'If-None-Match': etag})
+
+    assert response.status_code == 401
@@ -1,11 +1,19 @@
-from flask import jsonify
+import base64
+import json
+from flask import jsonify, Response
+from flask.globals import request_ctx
+
+STREAM_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
 
 def paginate_data(data, page=1, per_page=100):
     if hasattr(data, 'iloc'):
         total = len(data)
         start = (page - 1) * per_page
         end = start + per_page
-        items = data.iloc[start:end].to_dict(orient='records')
+        items = data.iloc[start:end]
     else:
         total = len(data)
         start = (page - 1) * per_page
@@ -22,6 +30,67 @@ def paginate_data(data, page=1, per_page=100):
         }
     }
 
+def request_memos():
+    #* values computed once per request, kept on the request context like flask-limiter's own state
+    #! not on g: g belongs to the app context, which spans several requests when a test or a script
+    #! pushed one first (pytest-flask does for every test using the app fixture)
+    ctx = request_ctx._get_current_object()
+    if not hasattr(ctx, 'memos'):
+        ctx.memos = {}
+    return ctx.memos
+
+CURSOR_FILTERS = {'countries', 'start_year', 'end_year', 'year'}
+
+def encode_cursor(state):
+    raw = json.dumps(state, separators=(',', ':'), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    #! raises ValueError for anything that is not a cursor we issued
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        state = json.loads(raw)
+    except Exception:
+        raise ValueError('Invalid cursor')
+    
+    if not isinstance(state, dict) or not isinstance(state.get('filters'), dict):
+        raise ValueError('Invalid cursor')
+    if set(state['filters']) - CURSOR_FILTERS:
+        raise ValueError('Invalid cursor')
+    
+    filters = state['filters']
+    countries = filters.get('countries')
+    if countries is not None and not (isinstance(countries, list) and all(isinstance(c, str) for c in countries)):
+        raise ValueError('Invalid cursor')
+    for name in ('start_year', 'end_year', 'year'):
+        if filters.get(name) is not None and not _is_int(filters[name]):
+            raise ValueError('Invalid cursor')
+    
+    after = state.get('after')
+    if not (isinstance(after, list) and len(after) == 2
+            and isinstance(after[0], str) and _is_int(after[1])):
+        raise ValueError('Invalid cursor')
+    return state
+
+def _is_int(value):
+    #* json true/false decode to bool, which isinstance(..., int) would accept
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def stream_records(chunks, export_format, filename='migration_data'):
+    #* one encoded chunk per frame, so memory is bounded by the chunk size
+    def generate():
+        header = True
+        for chunk in chunks:
+            if export_format == 'csv':
+                yield chunk.to_csv(index=False, header=header, lineterminator='\n')
+                header = False
+            elif not chunk.empty:
+                yield chunk.to_json(orient='records', lines=True)
+    
+    response = Response(generate(), mimetype=STREAM_MIMETYPES[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}.{export_format}'
+    return response
+
 def format_response(data=None, message=None, error=None, status_code=200):
     response = {}
     
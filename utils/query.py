@@ -0,0 +1,59 @@
+#* request argument normalizers, shared by cache keys so equivalent queries hit one entry
+#* each normalizer is called as normalizer(args, name, data_service)
+
+
+def country_list(args, name, data_service):
+    return tuple(sorted(set(args.getlist(name))))
+
+
+def start_year(args, name, data_service):
+    #* missing or out-of-range lower bound selects the same rows as the first year
+    first, last = data_service.get_year_range()
+    value = args.get(name, type=int)
+    return first if not value or value < first else value
+
+
+def end_year(args, name, data_service):
+    first, last = data_service.get_year_range()
+    value = args.get(name, type=int)
+    return last if not value or value > last else value
+
+
+def integer(default=None):
+    def normalize(args, name, data_service):
+        return args.get(name, default, type=int)
+    return normalize
+
+
+def string(default=None):
+    def normalize(args, name, data_service):
+        return args.get(name, default)
+    return normalize
+
+
+def parse_bool(value):
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def boolean(default=False):
+    def normalize(args, name, data_service):
+        return args.get(name, default, type=parse_bool)
+    return normalize
+
+
+def clamped_int(default, upper):
+    def normalize(args, name, data_service):
+        value = args.get(name, default, type=int)
+        return min(value, upper)
+    return normalize
+
+
+def bounded_int(default, lower, upper):
+    def normalize(args, name, data_service):
+        value = args.get(name, default, type=int)
+        return min(max(value, lower), upper)
+    return normalize
+
+
+def normalize_query(spec, args, data_service):
+    return tuple((name, normalizer(args, name, data_service)) for name, normalizer in sorted(spec.items()))
@@ -0,0 +1,110 @@
+import json
+import uuid
+import numpy as np
+import pandas as pd
+from flask.json.provider import DefaultJSONProvider
+
+#* JSON providers for app.json, every jsonify/format_response goes through the configured one
+#* routes may put DataFrames anywhere in a payload, they serialize as a list of records
+#* services keep returning plain lists and dicts, frames only exist between a route and the provider
+
+
+def _to_builtin(o):
+    if isinstance(o, pd.DataFrame):
+        return o.to_dict(orient='records')
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    raise TypeError
+
+
+def _column_tokens(series):
+    #* JSON text for every value of a column, identical to what json.dumps writes
+    values = series.to_numpy()
+    kind = values.dtype.kind
+    
+    if kind in 'iu':
+        return list(map(str, values.tolist()))
+    
+    if kind == 'f':
+        tokens = list(map(float.__repr__, values.tolist()))
+        for position in np.flatnonzero(~np.isfinite(values)).tolist():
+            value = values[position]
+            tokens[position] = 'NaN' if np.isnan(value) else ('Infinity' if value > 0 else '-Infinity')
+        return tokens
+    
+    if kind == 'b':
+        return ['true' if v else 'false' for v in values.tolist()]
+    
+    # strings and other objects: encode each distinct value once
+    # factorize folds None and NaN into one missing value, those are encoded one by one (null vs NaN)
+    codes, uniques = pd.factorize(series)
+    encoded = np.array([json.dumps(_native(v)) for v in uniques] + [None], dtype=object)
+    tokens = encoded[codes]
+    for position in np.flatnonzero(codes < 0).tolist():
+        tokens[position] = json.dumps(_native(values[position]))
+    return tokens.tolist()
+
+
+def _native(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def encode_records(df):
+    #* compact records JSON built column by column, no per-row dicts
+    columns = sorted(df.columns)
+    if len(df) == 0:
+        return '[]'
+    if not columns:
+        return '[' + ','.join(['{}'] * len(df)) + ']'
+    
+    row = '{' + ','.join(json.dumps(c).replace('%', '%%') + ':%s' for c in columns) + '}'
+    tokens = [_column_tokens(df[c]) for c in columns]
+    return '[' + ','.join([row % values for values in zip(*tokens)]) + ']'
+
+
+class DataFrameJSONProvider(DefaultJSONProvider):
+    #* previous behaviour, frames go through to_dict('records')
+    
+    @staticmethod
+    def default(o):
+        try:
+            return _to_builtin(o)
+        except TypeError:
+            return DefaultJSONProvider.default(o)
+
+
+class ColumnarJSONProvider(DataFrameJSONProvider):
+    #* compact responses encode frames straight from their columns
+    #* indented (debug) responses fall back to the to_dict path
+    
+    def dumps(self, obj, **kwargs):
+        if kwargs.get('indent') is not None or 'default' in kwargs:
+            return super().dumps(obj, **kwargs)
+        
+        frames = {}
+        prefix = uuid.uuid4().hex
+        
+        def default(o):
+            if isinstance(o, pd.DataFrame) and all(isinstance(c, str) for c in o.columns):
+                token = f'__frame_{prefix}_{len(frames)}__'
+                frames[f'"{token}"'] = o
+                return token
+            return DataFrameJSONProvider.default(o)
+        
+        text = super().dumps(obj, default=default, **kwargs)
+        for token, frame in frames.items():
+            text = text.replace(token, encode_records(frame), 1)
+        return text
+
+
+SERIALIZERS = {
+    'default': DataFrameJSONProvider,
+    'columnar': ColumnarJSONProvider
+}
+
+
+def setup_serializer(app):
+    app.json = SERIALIZERS[app.config['JSON_SERIALIZER']](app)
+    return app.json
@@ -54,3 +54,29 @@ class AnalyticsQuerySchema(Schema):
     start_year = fields.Int(validate=validate.Range(min=1900, max=2100), missing=None)
     end_year = fields.Int(validate=validate.Range(min=1900, max=2100), missing=None)
     metric = fields.Str(validate=validate.OneOf(['immigration', 'emigration', 'net']), missing='net')
+
+BATCH_QUERY_TYPES = [
+    'trends', 'comparison', 'top', 'balance', 'growth', 'rolling', 'similarity', 'correlation', 'distribution'
+]
+
+class BatchRequestSchema(Schema):
+    queries = fields.List(fields.Dict(), required=True, validate=validate.Length(min=1, max=20))
+
+class BatchSubQuerySchema(Schema):
+    id = fields.Str(missing=None)
+    type = fields.Str(required=True, validate=validate.OneOf(BATCH_QUERY_TYPES))
+    country_codes = fields.List(fields.Str(), missing=None)
+    country_code = fields.Str(missing=None)
+    start_year = fields.Int(validate=validate.Range(min=1900, max=2100), missing=None)
+    end_year = fields.Int(validate=validate.Range(min=1900, max=2100), missing=None)
+    year = fields.Int(validate=validate.Range(min=1900, max=2100), missing=None)
+    metric = fields.Str(validate=validate.OneOf(['immigration', 'emigration', 'net']), missing='net')
+    limit = fields.Int(validate=validate.Range(min=1), missing=10)
+    by_country = fields.Bool(missing=False)
+    order = fields.Str(validate=validate.OneOf(['desc', 'asc']), missing='desc')
+    offset = fields.Int(validate=validate.Range(min=0), missing=0)
+    bins = fields.Int(validate=validate.Range(min=0), missing=None)
+    method = fields.Str(validate=validate.OneOf(['pearson', 'euclidean']), missing='pearson')
+    k = fields.Int(validate=validate.Range(min=1), missing=5)
+    window = fields.Int(validate=validate.Range(min=1), missing=3)
+    span = fields.Int(validate=validate.Range(min=1), missing=None)